@@ -0,0 +1,196 @@
+from batch_evaluator import evaluate_batch
+from evaluator import card_to_int
+from itertools import combinations
+from math import comb, sqrt
+from solo_probability import read_card
+from statistics import NormalDist
+from typing import Iterator, Optional
+import numpy as np
+import time
+
+INTERVAL = 0.005
+BLOCK_RUNOUTS = 16
+
+class Progress:
+    """Represents an estimate of the player's chance of winning or tying
+    part way through the runouts, as post_flop gives it when done.
+
+    Attributes:
+        probability: Estimated percent chance the player wins or ties
+            against every opponent.
+        std_error: Standard error of the probability as a percent.
+        low: Lower end of the confidence interval as a percent.
+        high: Upper end of the confidence interval as a percent.
+        runouts: Number of runouts scored so far.
+        total: Number of runouts of the board.
+        exact: True once every runout is scored.
+        seconds: Time since the computation started.
+    """
+    def __init__(self, probability: float, std_error: float, low: float,
+                 high: float, runouts: int, total: int, seconds: float):
+        self.probability = probability
+        self.std_error = std_error
+        self.low = low
+        self.high = high
+        self.runouts = runouts
+        self.total = total
+        self.exact = runouts == total
+        self.seconds = seconds
+
+    def __repr__(self):
+        return '%.3f%% (%.3f%% - %.3f%%, %d of %d runouts)' % (
+            self.probability, self.low, self.high, self.runouts, self.total)
+
+def _strata(runouts: np.ndarray, board: list[int],
+            player: list[int]) -> np.ndarray:
+    """Groups runouts by how many of their cards share a rank with the
+    board or the player and how many share a suit with the player, which
+    is most of what decides whether the player wins on them.
+
+    Returns the stratum number of each runout.
+    """
+    ranks = np.isin(runouts >> 2, [card >> 2 for card in board + player])
+    suits = np.isin(runouts & 3, [card & 3 for card in player])
+
+    return ranks.sum(axis=1) * (runouts.shape[1] + 1) + suits.sum(axis=1)
+
+def stratified_order(runouts: np.ndarray, board: list[int],
+                     player: list[int],
+                     rng: np.random.Generator) -> np.ndarray:
+    """Orders runouts so every prefix is a random sample with each stratum
+    in proportion to its size.
+
+    Each stratum is shuffled and its runouts are spread evenly through the
+    order, with a random offset.
+
+    Returns the order as indexes into runouts.
+    """
+    strata = _strata(runouts, board, player)
+    positions = np.empty(len(runouts))
+
+    for stratum in np.unique(strata):
+        members = rng.permutation(np.flatnonzero(strata == stratum))
+        positions[members] = ((np.arange(len(members)) + rng.random()) /
+                              len(members))
+
+    return np.argsort(positions, kind='stable')
+
+def anytime_wins_ties(
+        deck: list[int],
+        board: list[int],
+        player: list[int],
+        num_opponents: int,
+        interval: float = INTERVAL,
+        seconds: Optional[float] = None,
+        seed: Optional[int] = None,
+        confidence: float = 0.95) -> Iterator[Progress]:
+    """Streams the player's chance of winning or tying against unknown
+    opponents after the flop, turn or river.
+
+    Runouts are scored in a stratified random order, BLOCK_RUNOUTS at a
+    time with every opponent hand in one batch evaluation, and a Progress
+    is yielded every interval seconds and once at the end. Proportional
+    strata make the running mean an unbiased estimate, and its error bar
+    uses the variance within strata and shrinks to 0 as the runouts run
+    out. The caller can stop at any time, and with seconds the stream
+    stops by itself once that time is spent. The last Progress of a full
+    run is exact and equal to post_flop's answer.
+    """
+    start = time.perf_counter()
+    needed = 5 - len(board)
+    runouts = np.array(list(combinations(deck, needed)), dtype=np.int8)
+    runouts = runouts.reshape(comb(len(deck), needed), needed)
+    order = stratified_order(runouts, board, player,
+                             np.random.default_rng(seed))
+    strata = _strata(runouts, board, player)[order]
+    runouts = runouts[order]
+    sizes = np.bincount(strata)
+
+    # Opponent hands are every pair of the deck, less those that share a
+    # card with the runout.
+    pairs = np.array(list(combinations(deck, 2)), dtype=np.int8)
+    pair_masks = (np.left_shift(np.int64(1), pairs[:, 0].astype(np.int64)) |
+                  np.left_shift(np.int64(1), pairs[:, 1].astype(np.int64)))
+    opponents = (len(deck) - needed) * (len(deck) - needed - 1) // 2
+
+    values = np.empty(len(runouts))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    done = 0
+    last = start
+
+    while done < len(runouts):
+        block = runouts[done:done + BLOCK_RUNOUTS]
+        hands = np.empty((len(block), len(pairs) + 1, 7), dtype=np.int8)
+        hands[:, :, :len(board)] = board
+        hands[:, :, len(board):5] = block[:, None, :]
+        hands[:, 0, 5:] = player
+        hands[:, 1:, 5:] = pairs
+        runout_masks = np.bitwise_or.reduce(
+            np.left_shift(np.int64(1), block.astype(np.int64)), axis=1)
+        valid = (pair_masks[None, :] & runout_masks[:, None]) == 0
+        player_ranks = evaluate_batch(hands[:, 0])
+        ranks = np.full(valid.shape, np.iinfo(np.int16).max, dtype=np.int16)
+        ranks[valid] = evaluate_batch(hands[:, 1:][valid])
+        values[done:done + len(block)] = ((ranks <= player_ranks[:, None])
+                                          .sum(axis=1) / opponents)
+        done += len(block)
+
+        now = time.perf_counter()
+        timed_out = seconds is not None and now - start >= seconds
+
+        if now - last >= interval or done == len(runouts) or timed_out:
+            last = now
+            yield _progress(values[:done], strata[:done], sizes,
+                            num_opponents, z, now - start)
+
+        if timed_out:
+            return
+
+def _progress(values: np.ndarray, strata: np.ndarray, sizes: np.ndarray,
+              num_opponents: int, z: float, seconds: float) -> Progress:
+    """Turns the heads up chances of the runouts scored so far into a
+    Progress for num_opponents opponents."""
+    done = len(values)
+    total = int(sizes.sum())
+    mean = values.mean()
+
+    # Stratified variance of the mean, with the finite population
+    # correction of each stratum. Strata with fewer than two runouts so
+    # far use the variance of all of them.
+    overall = values.var(ddof=1) if done > 1 else 0.0
+    variance = 0.0
+
+    for stratum in np.unique(strata):
+        scored = values[strata == stratum]
+        size = sizes[stratum]
+        spread = scored.var(ddof=1) if len(scored) > 1 else overall
+        variance += ((size / total) ** 2 * spread / len(scored) *
+                     (1 - len(scored) / size))
+
+    # The chance against several opponents is the heads up chance to the
+    # power of their number, so its error follows from the derivative.
+    std_error = sqrt(max(variance, 0.0))
+    probability = mean ** num_opponents
+    error = num_opponents * mean ** (num_opponents - 1) * std_error
+
+    return Progress(probability * 100, error * 100,
+                    max(probability - z * error, 0) * 100,
+                    min(probability + z * error, 1) * 100, done, total,
+                    seconds)
+
+def main():
+    """Main function that streams the probability of the player winning
+    after the flop."""
+    player = [card_to_int(read_card(f'Enter card {i} dealt to you: '))
+              for i in range(1, 3)]
+    board = [card_to_int(read_card(f'Enter card {i} from the flop: '))
+             for i in range(1, 4)]
+    num_opponents = int(input('Enter number of opponents left in the hand: '))
+    deck = [card for card in range(52) if card not in player + board]
+
+    for progress in anytime_wins_ties(deck, board, player, num_opponents,
+                                      interval=0.05):
+        print(progress)
+
+if __name__ == '__main__':
+    main()
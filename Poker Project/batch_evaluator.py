@@ -0,0 +1,173 @@
+from evaluator import (_FLUSH_TABLE, _RANK_TABLE, evaluate, hierarchy_rank,
+                       int_to_card)
+from itertools import combinations_with_replacement
+from poker_basics import Hand, hand_hierarchy
+from typing import Optional
+import numpy as np
+
+BLOCK_SIZE = 1 << 14
+
+# Ranks 2-8 and 9-A are counted as two base 5 numbers packed into the low
+# 32 bits of a key, with a 4-bit counter per suit above them, so a hand's
+# key is a sum over its cards. Each half of the ranks is numbered densely,
+# and the pair of numbers indexes a table of every rank multiset.
+_LOW_RANKS = 7
+_HIGH_SHIFT = 17
+_LOW_MASK = (1 << _HIGH_SHIFT) - 1
+
+def _half_ids(num_ranks: int) -> tuple:
+    """Numbers the rank multisets of up to 7 cards over some ranks.
+
+    Returns an array from base 5 key to number, and the count of numbers.
+    """
+    ids = np.full(5 ** num_ranks, -1, dtype=np.int32)
+    count = 0
+
+    for size in range(8):
+        for ranks in combinations_with_replacement(range(num_ranks), size):
+            if all(ranks.count(rank) <= 4 for rank in ranks):
+                ids[sum(5 ** rank for rank in ranks)] = count
+                count += 1
+
+    return ids, count
+
+def _build_tables() -> tuple:
+    """Builds the card keys and the numbering of rank multisets that
+    evaluate_batch's tables are indexed by.
+
+    Returns the key of each card, the number of each half's base 5 keys
+    and the size of a rank table.
+    """
+    low_ids, _ = _half_ids(_LOW_RANKS)
+    high_ids, high_count = _half_ids(13 - _LOW_RANKS)
+    low_ids[low_ids >= 0] *= high_count
+
+    card_key = np.zeros(52, dtype=np.int64)
+
+    for code in range(52):
+        rank = code >> 2
+
+        if rank < _LOW_RANKS:
+            card_key[code] = 5 ** rank
+        else:
+            card_key[code] = 5 ** (rank - _LOW_RANKS) << _HIGH_SHIFT
+
+        card_key[code] += 1 << (32 + 4 * (code & 3))
+
+    return card_key, low_ids, high_ids, int(low_ids.max()) + high_count
+
+_CARD_KEY, _LOW_IDS, _HIGH_IDS, _TABLE_SIZE = _build_tables()
+
+def batch_tables(rank_table: dict, flush_table: list[int]) -> tuple:
+    """Lays out lookup tables like evaluator's (rank key, the sum of
+    1 << 3 * rank over the cards, to rank, and flush rank mask to rank) as
+    the arrays evaluate_batch indexes.
+
+    Returns the pair of arrays, to pass to evaluate_batch as tables.
+    """
+    ranks = np.zeros(_TABLE_SIZE, dtype=np.int16)
+
+    for key, rank in rank_table.items():
+        counts = [(key >> (3 * i)) & 7 for i in range(13)]
+        low = sum(count * 5 ** i for i, count in
+                  enumerate(counts[:_LOW_RANKS]))
+        high = sum(count * 5 ** i for i, count in
+                   enumerate(counts[_LOW_RANKS:]))
+        ranks[_LOW_IDS[low] + _HIGH_IDS[high]] = rank
+
+    return ranks, np.array(flush_table, dtype=np.int16)
+
+_TABLES = batch_tables(_RANK_TABLE, _FLUSH_TABLE)
+_CARD_RANK_BIT = np.array([1 << (code >> 2) for code in range(52)],
+                          dtype=np.int64)
+_FLUSH_SUITS = np.zeros(0x8889, dtype=np.int8)
+_FLUSH_SUITS[[0x8, 0x80, 0x800, 0x8000]] = [0, 1, 2, 3]
+
+def _evaluate_block(cards: np.ndarray, out: np.ndarray,
+                    tables: tuple) -> None:
+    """Scores one block of hands into out."""
+    rank_table, flush_table = tables
+
+    # Summing columns is much faster than summing along short rows.
+    columns = np.ascontiguousarray(cards.T)
+    key = _CARD_KEY[columns[0]]
+
+    for column in columns[1:]:
+        key += _CARD_KEY[column]
+
+    rank_key = key & 0xFFFFFFFF
+    out[:] = rank_table[_LOW_IDS[rank_key & _LOW_MASK] +
+                        _HIGH_IDS[rank_key >> _HIGH_SHIFT]]
+
+    # A suit counter of 5 or more carries into the top bit of its nibble.
+    flush = ((key >> 32) + 0x3333) & 0x8888
+    rows = np.flatnonzero(flush)
+
+    if len(rows):
+        suit = _FLUSH_SUITS[flush[rows]]
+        mask = np.zeros(len(rows), dtype=np.int64)
+
+        for column in columns[:, rows]:
+            mask |= np.where(column & 3 == suit, _CARD_RANK_BIT[column], 0)
+
+        out[rows] = flush_table[mask]
+
+def evaluate_batch(cards: np.ndarray,
+                   tables: Optional[tuple] = None) -> np.ndarray:
+    """Scores many hands of 5 to 7 cards at once.
+
+    cards is an (N, k) integer array of card codes with 5 <= k <= 7. Hands
+    are scored in blocks of BLOCK_SIZE rows so that the temporary arrays
+    stay in cache. tables are arrays from batch_tables to rank the hands
+    by instead of evaluate's.
+
+    Returns an (N,) int16 array of the same ranks as evaluate, or as
+    tables give them.
+    """
+    cards = np.asarray(cards)
+
+    if cards.ndim != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError('cards must be an (N, 5), (N, 6) or (N, 7) array')
+
+    ranks = np.empty(len(cards), dtype=np.int16)
+
+    for start in range(0, len(cards), BLOCK_SIZE):
+        _evaluate_block(cards[start:start + BLOCK_SIZE],
+                        ranks[start:start + BLOCK_SIZE],
+                        _TABLES if tables is None else tables)
+
+    return ranks
+
+def verify(samples: int = 100000, seed: int = 0) -> int:
+    """Checks evaluate_batch against evaluate on random hands of 5 to 7
+    cards, and 5 card hands against hand_hierarchy itself.
+
+    Returns the number of hands checked.
+    """
+    rng = np.random.default_rng(seed)
+
+    for size in (5, 6, 7):
+        cards = np.argsort(rng.random((samples, 52)), axis=1)[:, :size]
+        ranks = evaluate_batch(cards)
+
+        for hand, rank in zip(cards.tolist(), ranks.tolist()):
+            if evaluate(hand) != rank:
+                raise AssertionError(f'evaluate_batch scores {hand} as '
+                                     f'{rank}, evaluate as {evaluate(hand)}')
+
+            if size == 5:
+                checked = Hand(*[int_to_card(card) for card in hand])
+                hand_hierarchy(checked)
+
+                if hierarchy_rank(checked.hierarchy) != rank:
+                    raise AssertionError(f'evaluate_batch scores {hand} '
+                                         f'unlike hand_hierarchy')
+
+    return 3 * samples
+
+def main():
+    """Main function that verifies evaluate_batch against evaluate."""
+    print(f'{verify()} hands agree')
+
+if __name__ == '__main__':
+    main()
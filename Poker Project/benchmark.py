@@ -0,0 +1,236 @@
+from evaluator import evaluate, int_to_card
+from hand_history import data_files, read_hands
+from itertools import combinations
+from pathlib import Path
+from poker_basics import Hand, hand_hierarchy
+from solo_probability import post_flop, post_river, post_turn
+from total_probability import equities
+from typing import Callable, Optional
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+SEED = 2011
+TOLERANCE = 0.25
+
+# Fixed spots as card codes: hole cards, then the board.
+SOLO_SPOT = ([48, 45], [32, 36, 0])
+MULTIWAY_SPOT = ({1: [48, 45], 2: [32, 36], 3: [20, 21], 4: [44, 41]},
+                 [47, 38, 9])
+
+class Case:
+    """Represents one benchmark.
+
+    Attributes:
+        name: Name of the benchmark in the results.
+        setup: Function that prepares the inputs and returns the function
+            to time and the number of items it handles per run.
+        repeats: Number of timed runs; the fastest one is reported.
+    """
+    def __init__(self, name: str, setup: Callable, repeats: int = 3):
+        self.name = name
+        self.setup = setup
+        self.repeats = repeats
+
+def _random_hands(size: int, count: int) -> list[list[int]]:
+    """Returns count seeded random hands of size distinct cards."""
+    rng = random.Random(SEED)
+
+    return [rng.sample(range(52), size) for _ in range(count)]
+
+def _hand_hierarchy_setup() -> tuple:
+    """Times hand_hierarchy on 5 card Hand objects."""
+    hands = [Hand(*[int_to_card(card) for card in cards])
+             for cards in _random_hands(5, 20000)]
+
+    def run() -> int:
+        for hand in hands:
+            hand_hierarchy(hand)
+
+        return sum(hand.hierarchy[1] for hand in hands)
+
+    return run, len(hands)
+
+def _best_of_21_setup() -> tuple:
+    """Times picking the best of the 21 Hands in 7 cards with
+    hand_hierarchy, as the equity code used to."""
+    sevens = [[int_to_card(card) for card in cards]
+              for cards in _random_hands(7, 1000)]
+
+    def run() -> int:
+        total = 0
+
+        for cards in sevens:
+            hands = [Hand(*five) for five in combinations(cards, 5)]
+
+            for hand in hands:
+                hand_hierarchy(hand)
+
+            total += max(hands).hierarchy[1]
+
+        return total
+
+    return run, len(sevens)
+
+def _evaluate_setup() -> tuple:
+    """Times evaluate on 7 card hands."""
+    sevens = _random_hands(7, 100000)
+
+    def run() -> int:
+        return sum(evaluate(cards) for cards in sevens)
+
+    return run, len(sevens)
+
+def _solo_setup(street: str) -> Callable:
+    """Returns the setup of a post_flop, post_turn or post_river run."""
+    def setup() -> tuple:
+        player, board = SOLO_SPOT
+        extra = {'flop': 0, 'turn': 1, 'river': 2}[street]
+        deck = [card for card in range(52) if card not in player + board]
+        board = board + deck[:extra]
+        deck = deck[extra:]
+        function = {'flop': post_flop, 'turn': post_turn,
+                    'river': post_river}[street]
+        args = ([int_to_card(card) for card in deck],
+                [int_to_card(card) for card in board],
+                [int_to_card(card) for card in player], 2)
+
+        return lambda: function(*args), 1
+
+    return setup
+
+def _multiway_setup() -> tuple:
+    """Times total_probability's equities for four players on the flop."""
+    player_cards, board = MULTIWAY_SPOT
+
+    def run() -> dict:
+        return equities(player_cards, board, workers=1).equity
+
+    return run, 1
+
+def _parsing_setup() -> tuple:
+    """Times parsing the first four hand history files."""
+    paths = data_files()[:4]
+
+    def run() -> int:
+        return sum(1 for path in paths for _ in read_hands(path))
+
+    return run, run()
+
+CASES = [
+    Case('hand_hierarchy', _hand_hierarchy_setup),
+    Case('best_of_21', _best_of_21_setup),
+    Case('evaluate_7', _evaluate_setup),
+    Case('post_flop', _solo_setup('flop'), 1),
+    Case('post_turn', _solo_setup('turn')),
+    Case('post_river', _solo_setup('river')),
+    Case('total_probability_multiway', _multiway_setup),
+    Case('parse_corpus', _parsing_setup, 1),
+]
+
+def run_case(case: Case) -> dict:
+    """Runs one benchmark.
+
+    Returns its fastest time in seconds, the time per item in
+    microseconds, the items per second and a check value computed from
+    its results, so that a change in results shows up next to a change in
+    speed.
+    """
+    function, items = case.setup()
+    best = None
+    check = None
+
+    for _ in range(case.repeats):
+        start = time.perf_counter()
+        check = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    return {'seconds': best, 'items': items,
+            'per_item_us': best / items * 1e6,
+            'items_per_second': items / best,
+            'check': repr(check)}
+
+def run(names: Optional[list[str]] = None) -> dict:
+    """Runs the benchmarks, all of them by default.
+
+    Returns the machine readable results.
+    """
+    results = {}
+
+    for case in CASES:
+        if names is None or case.name in names:
+            results[case.name] = run_case(case)
+
+    return {'python': sys.version.split()[0], 'machine': platform.machine(),
+            'seed': SEED, 'results': results}
+
+def compare(results: dict, baseline: dict,
+            tolerance: float = TOLERANCE) -> list[str]:
+    """Compares results against a baseline.
+
+    Returns a message for every benchmark that got more than tolerance
+    slower or whose check value changed.
+    """
+    regressions = []
+
+    for name, result in results['results'].items():
+        old = baseline['results'].get(name)
+
+        if old is None:
+            continue
+
+        ratio = result['seconds'] / old['seconds']
+
+        if ratio > 1 + tolerance:
+            regressions.append(f'{name}: {ratio:.2f}x slower '
+                               f'({old["seconds"]:.4g}s -> '
+                               f'{result["seconds"]:.4g}s)')
+
+        if result['check'] != old['check']:
+            regressions.append(f'{name}: results changed '
+                               f'({old["check"]} -> {result["check"]})')
+
+    return regressions
+
+def main():
+    """Main function that runs the benchmarks and checks for regressions."""
+    parser = argparse.ArgumentParser(description='Run the benchmarks.')
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run, all of them by default')
+    parser.add_argument('--output', type=Path, default=None,
+                        help='write the JSON results to this file')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.names or None)
+    text = json.dumps(results, indent=2)
+
+    if args.output is not None:
+        args.output.write_text(text + '\n')
+    else:
+        print(text)
+
+    if args.save_baseline:
+        args.baseline.write_text(text + '\n')
+        return
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.tolerance)
+
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
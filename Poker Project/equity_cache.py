@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from itertools import permutations
+from pathlib import Path
+from typing import Optional, Sequence
+import json
+import sqlite3
+
+CACHE_PATH = Path(__file__).with_name('equity_cache.sqlite3')
+
+_SUIT_PERMUTATIONS = list(permutations(range(4)))
+
+def canonical_key(player: list[int], board: list[int]) -> str:
+    """Maps hole cards and a board to a key shared by all suit relabelings.
+
+    Returns the key as a string such as '44 48|32 36 40'.
+    """
+    return canonical_spot([player], board)
+
+def canonical_spot(
+        hands: list[list[int]],
+        board: list[int],
+        dead: Sequence[int] = ()) -> str:
+    """Maps several hands, a board and dead cards to a canonical key.
+
+    Spots that only differ by a permutation of the suits have the same
+    equity, so each is relabeled with every permutation and the smallest
+    result is kept. The order of the hands is kept, since results are
+    given per hand, but the order of the cards within each hand, on the
+    board and among the dead cards is ignored.
+
+    Returns the key as a string such as '44 48;17 21|32 36 40'.
+    """
+    return canonical_permutation(hands, board, dead)[0]
+
+def canonical_permutation(
+        hands: list[list[int]],
+        board: list[int],
+        dead: Sequence[int] = ()) -> tuple:
+    """Finds the canonical key of a spot, as canonical_spot does, and the
+    suit permutation that relabels the spot to it.
+
+    Returns the key and the permutation, a tuple of the new suit of each
+    suit, so card & ~3 | perm[card & 3] is a card's canonical label.
+    """
+    best = None
+    best_perm = None
+
+    for perm in _SUIT_PERMUTATIONS:
+        key = tuple(tuple(sorted(card & ~3 | perm[card & 3]
+                                 for card in cards))
+                    for cards in list(hands) + [board, dead])
+
+        if best is None or key < best:
+            best = key
+            best_perm = perm
+
+    text = (';'.join(' '.join(map(str, hand)) for hand in best[:-2]) + '|' +
+            ' '.join(map(str, best[-2])))
+
+    if best[-1]:
+        text += '|' + ' '.join(map(str, best[-1]))
+
+    return text, best_perm
+
+class EquityCache:
+    """Represents an LRU cache of equity results backed by a SQLite file.
+
+    Attributes:
+        path: Path of the SQLite file, or None to keep results in memory.
+        size: Maximum number of results kept in memory.
+        hits: Number of lookups served from memory or disk.
+        misses: Number of lookups that were not cached.
+    """
+    def __init__(self, path: Optional[Path] = CACHE_PATH, size: int = 100000):
+        self.path = path
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._db = None
+
+        if path is not None:
+            self._db = sqlite3.connect(str(path))
+            self._db.execute('CREATE TABLE IF NOT EXISTS equity '
+                             '(key TEXT PRIMARY KEY, value TEXT)')
+            self._db.commit()
+
+    def get(self, key: str):
+        """Returns the cached value for key, or None if it is not cached."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+
+            return self._memory[key]
+
+        if self._db is not None:
+            row = self._db.execute('SELECT value FROM equity WHERE key = ?',
+                                   (key,)).fetchone()
+
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value)
+                self.hits += 1
+
+                return value
+
+        self.misses += 1
+
+        return None
+
+    def put(self, key: str, value) -> None:
+        """Caches a JSON serializable value in memory and on disk."""
+        self._remember(key, value)
+
+        if self._db is not None:
+            self._db.execute('INSERT OR REPLACE INTO equity VALUES (?, ?)',
+                             (key, json.dumps(value)))
+            self._db.commit()
+
+    def _remember(self, key: str, value) -> None:
+        """Adds a value to memory, evicting the least recently used one."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+
+        if len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def close(self) -> None:
+        """Closes the SQLite file."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
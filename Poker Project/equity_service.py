@@ -0,0 +1,580 @@
+from concurrent.futures import ProcessPoolExecutor
+from equity_cache import EquityCache, canonical_key, canonical_spot
+from evaluator import evaluate
+from monte_carlo import sample, sample_players
+from solo_probability import wins_ties
+from total_probability import Equities, equities
+from typing import Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+HOST = '127.0.0.1'
+PORT = 8765
+CACHE_SIZE = 10000
+
+# Part of a request's deadline left for sampling when the exact answer
+# is not ready in time, and the part of that kept back for the reply, at
+# least REPLY_SECONDS.
+FALLBACK_SHARE = 0.3
+REPLY_SHARE = 0.2
+REPLY_SECONDS = 0.02
+
+# Sampling processes, one for each request expected to fall back at once.
+# Sampling jobs share the fallback pool's processes rather than queueing
+# for one, so each gets a fair part of the time left.
+FALLBACK_WORKERS = 8
+
+def _check_cards(*groups: list) -> None:
+    """Raises ValueError unless every card of the groups (hands, board,
+    dead cards) is a distinct integer code from 0 to 51."""
+    cards = [card for group in groups for card in group]
+
+    for card in cards:
+        if type(card) is not int or not 0 <= card < 52:
+            raise ValueError(f'{card!r} is not a card code from 0 to 51')
+
+    if len(set(cards)) != len(cards):
+        raise ValueError('a card is used more than once')
+
+def _left(until: float) -> float:
+    """Returns the seconds left until the time.time() until, at least 0.
+
+    Sampling jobs get an absolute end rather than a budget, since a job may
+    wait in the fallback pool behind others. A job whose end has passed
+    samples one trial and returns.
+    """
+    return max(until - time.time(), 0.0)
+
+def _warm() -> None:
+    """Loads the evaluator's lookup tables in a worker process before its
+    first job."""
+    evaluate(list(range(7)))
+
+def _solo_exact(deck: list[int], board: list[int],
+                player: list[int]) -> list:
+    """Counts the player's heads up wins or ties, for the workers."""
+    return list(wins_ties(deck, board, player))
+
+def _solo_sampled(deck: list[int], board: list[int], player: list[int],
+                  until: float) -> tuple:
+    """Estimates the chance the player wins or ties against one unknown
+    hand, sampling until the time.time() until.
+
+    Returns the estimate and its standard error, as fractions, and the
+    number of samples.
+    """
+    rng = random.Random()
+    needed = 5 - len(board)
+
+    def trial() -> list:
+        cards = rng.sample(deck, needed + 2)
+        runout = board + cards[:needed]
+        player_rank = evaluate(runout + player)
+
+        return [1.0 if player_rank >= evaluate(runout + cards[needed:])
+                else 0.0]
+
+    estimate = sample(trial, 1, seconds=_left(until))[0]
+
+    return estimate.equity / 100, estimate.std_error / 100, estimate.samples
+
+def _total_exact(player_cards: dict, board: list[int]) -> Equities:
+    """Computes the Equities of players 1 to n of a spot, for the workers."""
+    live = [player for player in player_cards if player > 0]
+
+    return equities(player_cards, board, live, workers=1)
+
+def _total_sampled(deck: list[int], board: list[int], player_cards: dict,
+                   until: float) -> dict:
+    """Estimates each player's equity, sampling until the time.time()
+    until."""
+    return sample_players(deck, board, player_cards, seconds=_left(until))
+
+def _sampling_end(start: float, deadline: float) -> float:
+    """Returns the time.time() at which a request's sampling job has to
+    stop, keeping part of the time left back for the reply."""
+    left = deadline - (time.perf_counter() - start)
+
+    return time.time() + max(left - max(left * REPLY_SHARE, REPLY_SECONDS),
+                             0.0)
+
+def _valid_id(request_id) -> bool:
+    """Returns whether a request id is a string or an integer."""
+    return type(request_id) in (str, int)
+
+def _renumbered(result: Equities, players: list[int]) -> dict:
+    """Converts Equities of players 1 to n to a JSON reply for the player
+    numbers of the request."""
+    number = lambda i: players[i - 1] if i else 0
+
+    return {'win': {number(i): value for i, value in result.win.items()},
+            'split': [[[number(i) for i in key], value]
+                      for key, value in result.split.items()],
+            'equity': {number(i): value
+                       for i, value in result.equity.items()},
+            'runouts': result.runouts, 'exact': True}
+
+class EquityService:
+    """Represents the equity service, which answers JSON requests with a
+    warm pool of worker processes.
+
+    Requests whose spots are the same up to suits share one computation
+    while it runs, and its result is kept in an LRU cache. A request with
+    a deadline that the exact computation cannot meet gets a sampled
+    answer instead, from a separate pool so that it does not wait behind
+    exact work.
+
+    Attributes:
+        workers: Number of worker processes for exact work.
+        fallback_workers: Number of worker processes for sampling.
+        cache: EquityCache of exact results, in memory.
+        counts: Dict of 'requests', 'coalesced', 'cached', 'sampled' and
+            'cancelled' to how many requests went that way.
+    """
+    def __init__(self, workers: Optional[int] = None,
+                 fallback_workers: int = FALLBACK_WORKERS,
+                 cache_size: int = CACHE_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.fallback_workers = fallback_workers
+        self.cache = EquityCache(None, cache_size)
+        self.counts = dict.fromkeys(['requests', 'coalesced', 'cached',
+                                     'sampled', 'cancelled'], 0)
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_warm)
+        self._fallback = ProcessPoolExecutor(fallback_workers,
+                                             initializer=_warm)
+        self._running = {}
+        self._server = None
+
+        # Submitting one job per worker starts them all now, so the first
+        # requests do not pay for starting processes and building tables.
+        self._warming = [pool.submit(_warm)
+                         for pool, count in [(self._pool, self.workers),
+                                             (self._fallback,
+                                              fallback_workers)]
+                         for _ in range(count)]
+
+    async def ready(self) -> None:
+        """Waits until the worker processes have started."""
+        await asyncio.gather(*map(asyncio.wrap_future, self._warming))
+
+    async def _shared(self, key: str, timeout: Optional[float], function,
+                      *args):
+        """Runs function(*args) in the pool once per key at a time.
+
+        Every request waiting on a key shares its result. If the last of
+        them stops waiting, the job is cancelled if it has not started, and
+        otherwise left to finish and fill the cache.
+        Raises asyncio.TimeoutError if the result is not ready in timeout
+        seconds.
+        """
+        cached = self.cache.get(key)
+
+        if cached is not None:
+            self.counts['cached'] += 1
+            return cached
+
+        if key in self._running:
+            self.counts['coalesced'] += 1
+
+        else:
+            job = self._pool.submit(function, *args)
+            future = asyncio.wrap_future(job)
+            self._running[key] = [future, 0, job]
+
+            def done(future) -> None:
+                self._running.pop(key, None)
+
+                if not future.cancelled() and future.exception() is None:
+                    self.cache.put(key, future.result())
+
+            future.add_done_callback(done)
+
+        entry = self._running[key]
+        entry[1] += 1
+
+        # Only the wait times out. The job itself is shielded, so a job that
+        # has started runs on, fills the cache and is shared by later
+        # requests for the key, rather than being abandoned in a worker.
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry[0]), timeout)
+
+        finally:
+            entry[1] -= 1
+
+            if entry[1] == 0 and entry[2].cancel():
+                self._running.pop(key, None)
+
+    async def _sampled(self, function, *args):
+        """Runs a sampling job in the fallback pool."""
+        self.counts['sampled'] += 1
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._fallback, function, *args)
+
+    async def solo(self, player: list[int], board: list[int],
+                   opponents: int = 1,
+                   deadline: Optional[float] = None) -> dict:
+        """Returns the chance the player wins or ties against a number of
+        unknown hands after the flop, turn or river, as solo_probability
+        gives it."""
+        if len(board) not in (3, 4, 5) or len(player) != 2:
+            raise ValueError('solo needs 2 hole cards and 3 to 5 board cards')
+
+        _check_cards(player, board)
+        start = time.perf_counter()
+        used = set(board + player)
+        deck = [card for card in range(52) if card not in used]
+        key = 'solo:' + canonical_key(player, board)
+        timeout = None if deadline is None else deadline * (1 -
+                                                            FALLBACK_SHARE)
+
+        try:
+            player_wins_ties, heads_up = await self._shared(
+                key, timeout, _solo_exact, deck, board, player)
+
+        except asyncio.TimeoutError:
+            share, error, samples = await self._sampled(
+                _solo_sampled, deck, board, player,
+                _sampling_end(start, deadline))
+
+            return {'probability': share ** opponents * 100,
+                    'std_error': (opponents * share ** (opponents - 1) *
+                                  error * 100),
+                    'samples': samples, 'exact': False}
+
+        return {'probability': (player_wins_ties / heads_up) ** opponents *
+                               100, 'exact': True}
+
+    async def total(self, player_cards: dict, board: list[int],
+                    live: Optional[list[int]] = None,
+                    deadline: Optional[float] = None) -> dict:
+        """Returns each live player's chances of winning a spot with every
+        hand known, as total_probability's equities gives them."""
+        start = time.perf_counter()
+        player_cards = {int(player): cards
+                        for player, cards in player_cards.items()}
+        _check_cards(board, *player_cards.values())
+        live = list(player_cards) if live is None else [int(player)
+                                                        for player in live]
+        dead = [card for player, cards in player_cards.items()
+                if player not in live for card in cards]
+
+        # Live players become 1 to n and dead cards player 0, so spots that
+        # are the same up to player numbers and suits share a key.
+        spot = {i: player_cards[player] for i, player in enumerate(live, 1)}
+        key = 'total:' + canonical_spot(list(spot.values()), board, dead)
+
+        if dead:
+            spot[0] = dead
+
+        used = set(board).union(*player_cards.values())
+        deck = [card for card in range(52) if card not in used]
+        timeout = None if deadline is None else deadline * (1 -
+                                                            FALLBACK_SHARE)
+
+        try:
+            result = await self._shared(key, timeout, _total_exact, spot,
+                                        board)
+
+        except asyncio.TimeoutError:
+            estimates = await self._sampled(
+                _total_sampled, deck, board,
+                {player: player_cards[player] for player in live},
+                _sampling_end(start, deadline))
+
+            return {'equity': {player: estimate.equity
+                               for player, estimate in estimates.items()},
+                    'std_error': {player: estimate.std_error
+                                  for player, estimate in estimates.items()},
+                    'samples': min(estimate.samples
+                                   for estimate in estimates.values()),
+                    'exact': False}
+
+        return _renumbered(result, live)
+
+    async def call(self, request: dict) -> dict:
+        """Answers one request, a dict with 'method' ('solo' or 'total'),
+        'params' and optionally 'deadline' in seconds."""
+        self.counts['requests'] += 1
+        params = dict(request.get('params', {}))
+        params['deadline'] = request.get('deadline')
+
+        if request.get('method') == 'solo':
+            return await self.solo(**params)
+
+        if request.get('method') == 'total':
+            return await self.total(**params)
+
+        raise ValueError(f'unknown method {request.get("method")!r}')
+
+    async def _answer(self, request: dict, writer: asyncio.StreamWriter,
+                      tasks: dict) -> None:
+        """Answers a request of a connection and writes the reply."""
+        reply = {'id': request.get('id')}
+
+        try:
+            reply['result'] = await self.call(request)
+
+        except asyncio.CancelledError:
+            self.counts['cancelled'] += 1
+            reply['error'] = 'cancelled'
+
+        # Any other error, from the request or its job, is that request's
+        # reply, so the client is never left waiting.
+        except Exception as error:
+            reply['error'] = str(error) or type(error).__name__
+
+        finally:
+            tasks.pop(request.get('id'), None)
+
+        writer.write(json.dumps(reply).encode() + b'\n')
+        await writer.drain()
+
+    async def _connection(self, reader: asyncio.StreamReader,
+                          writer: asyncio.StreamWriter) -> None:
+        """Reads requests, one JSON object per line, and answers them
+        concurrently. {"method": "cancel", "params": {"id": ...}} cancels
+        an earlier request of the same connection.
+
+        Every request needs a string or integer id that no other request
+        in flight on the connection has. Lines that are not such requests
+        get an error reply and the connection carries on.
+        """
+        tasks = {}
+
+        def error(request_id, message: str) -> None:
+            writer.write(json.dumps({'id': request_id,
+                                     'error': message}).encode() + b'\n')
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+
+                except ValueError:
+                    error(None, 'bad JSON')
+                    continue
+
+                if not isinstance(request, dict):
+                    error(None, 'a request must be a JSON object')
+                    continue
+
+                if request.get('method') == 'cancel':
+                    params = request.get('params', {})
+
+                    if not isinstance(params, dict):
+                        error(None, 'cancel params must be a JSON object')
+                        continue
+
+                    if _valid_id(params.get('id')):
+                        task = tasks.get(params['id'])
+
+                        if task is not None:
+                            task.cancel()
+
+                    continue
+
+                request_id = request.get('id')
+
+                if not _valid_id(request_id):
+                    error(None, 'a request needs a string or integer id')
+
+                elif request_id in tasks:
+                    error(request_id, f'request {request_id!r} is already '
+                                      f'in flight')
+
+                else:
+                    tasks[request_id] = asyncio.create_task(
+                        self._answer(request, writer, tasks))
+
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+
+            writer.close()
+
+    async def start(self, host: str = HOST, port: int = PORT) -> int:
+        """Starts listening, and returns the port (useful with port 0)."""
+        self._server = await asyncio.start_server(self._connection, host,
+                                                  port)
+
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Answers connections until cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self) -> None:
+        """Stops listening and shuts down the worker pools."""
+        if self._server is not None:
+            self._server.close()
+
+        self._pool.shutdown(cancel_futures=True)
+        self._fallback.shutdown(cancel_futures=True)
+
+class Client:
+    """Represents a connection to the equity service that can have many
+    requests in flight at once.
+
+    Attributes:
+        reader: Stream the replies are read from.
+        writer: Stream the requests are written to.
+    """
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._replies = asyncio.create_task(self._read())
+
+    @classmethod
+    async def connect(cls, host: str = HOST, port: int = PORT) -> 'Client':
+        """Opens a connection to the service."""
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def _read(self) -> None:
+        """Hands each reply to the request waiting for it."""
+        while line := await self.reader.readline():
+            reply = json.loads(line)
+            future = self._waiting.pop(reply['id'], None)
+
+            if future is not None and not future.done():
+                future.set_result(reply)
+
+    async def request(self, method: str, params: dict,
+                      deadline: Optional[float] = None) -> dict:
+        """Sends a request and returns its result.
+
+        If the awaiting task is cancelled, the service is told to cancel
+        the request too. Raises RuntimeError if the service answered with
+        an error.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self.writer.write(json.dumps({'id': request_id, 'method': method,
+                                      'params': params,
+                                      'deadline': deadline}).encode() + b'\n')
+
+        try:
+            reply = await future
+
+        except asyncio.CancelledError:
+            self.writer.write(json.dumps({'method': 'cancel', 'params':
+                                          {'id': request_id}}).encode() +
+                              b'\n')
+            raise
+
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+
+        return reply['result']
+
+    async def close(self) -> None:
+        """Closes the connection."""
+        self.writer.close()
+        self._replies.cancel()
+        await self.writer.wait_closed()
+
+def query(method: str, params: dict, deadline: Optional[float] = None,
+          host: str = HOST, port: int = PORT) -> dict:
+    """Sends one request to a running service and returns its result."""
+    async def run() -> dict:
+        client = await Client.connect(host, port)
+
+        try:
+            return await client.request(method, params, deadline)
+
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+def check_deadlines(requests: int = 8, deadline: float = 0.5,
+                    seed: int = 0) -> list[float]:
+    """Sends a fresh service many concurrent total requests for different
+    preflop spots, too slow to answer exactly, all with the same deadline.
+
+    Returns the seconds each reply took.
+    Raises AssertionError if a reply missed its deadline.
+    """
+    rng = random.Random(seed)
+    spots = []
+
+    for _ in range(requests):
+        cards = rng.sample(range(52), 4)
+        spots.append({'player_cards': {1: cards[:2], 2: cards[2:]},
+                      'board': []})
+
+    async def run() -> list[float]:
+        service = EquityService()
+
+        try:
+            await service.ready()
+            client = await Client.connect(HOST, await service.start(HOST, 0))
+
+            async def timed(params: dict) -> float:
+                start = time.perf_counter()
+                await client.request('total', params, deadline)
+
+                return time.perf_counter() - start
+
+            try:
+                return await asyncio.gather(*map(timed, spots))
+
+            finally:
+                await client.close()
+
+        finally:
+            service.close()
+
+    seconds = asyncio.run(run())
+
+    for spot, took in zip(spots, seconds):
+        if took > deadline:
+            raise AssertionError(f'the reply for {spot} took {took:.3f} s, '
+                                 f'over its {deadline} s deadline')
+
+    return seconds
+
+def main():
+    """Main function that runs the equity service."""
+    parser = argparse.ArgumentParser(description='Run the equity service.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--fallback-workers', type=int,
+                        default=FALLBACK_WORKERS)
+    parser.add_argument('--check', action='store_true',
+                        help='check that concurrent requests meet their '
+                             'deadlines, then exit')
+    args = parser.parse_args()
+
+    if args.check:
+        seconds = check_deadlines()
+        print(f'{len(seconds)} replies within their deadlines, slowest '
+              f'{max(seconds):.3f} s')
+        return
+
+    async def run() -> None:
+        service = EquityService(args.workers, args.fallback_workers)
+
+        try:
+            port = await service.start(args.host, args.port)
+            print(f'Serving on {args.host}:{port}')
+            await service.serve_forever()
+
+        finally:
+            service.close()
+
+    asyncio.run(run())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+from itertools import combinations, combinations_with_replacement
+from poker_basics import SUITS, VALUES, Card, Hand, hand_hierarchy
+
+# Each rank gets a 3-bit counter in the rank key and each suit a 4-bit
+# counter in the suit key, so a hand's keys are just sums over its cards.
+_RANK_KEY = [1 << (3 * (code >> 2)) for code in range(52)]
+_RANK_BIT = [1 << (code >> 2) for code in range(52)]
+_SUIT_KEY = [1 << (4 * (code & 3)) for code in range(52)]
+_FLUSH_SUIT = {0x8: 0, 0x80: 1, 0x800: 2, 0x8000: 3}
+
+def card_to_int(card: Card) -> int:
+    """Converts a Card object to its integer code.
+
+    Returns the code 0-51, ordered 2S, 2D, 2C, 2H, 3S,... AH like the deck.
+    """
+    return card.code
+
+def int_to_card(code: int) -> Card:
+    """Converts an integer code to a Card object."""
+    return Card.from_code(code)
+
+def cards_to_ints(cards: list[Card]) -> list[int]:
+    """Converts a list of Card objects to a list of integer codes."""
+    return [card_to_int(card) for card in cards]
+
+def _five_card_hierarchy(ranks: tuple, flush: bool) -> tuple:
+    """Returns the hand_hierarchy category and value for a 5 card hand."""
+    suits = ['S'] * 5 if flush else ['S', 'D', 'C', 'H', 'S']
+    hand = Hand(*[Card(VALUES[rank], suit) for rank, suit in
+                  zip(ranks, suits)])
+    hand_hierarchy(hand)
+
+    return hand.hierarchy[1], hand.hierarchy[2], hand.hierarchy[0]
+
+def _rank_multisets(size: int):
+    """Yields every sorted tuple of ranks with at most four of each rank."""
+    for ranks in combinations_with_replacement(range(13), size):
+        if all(ranks.count(rank) <= 4 for rank in set(ranks)):
+            yield ranks
+
+def _build_tables() -> tuple:
+    """Builds the lookup tables used by evaluate.
+
+    Every 5 card hand is scored once with hand_hierarchy, and the distinct
+    hierarchies are numbered in order so that comparing the numbers gives
+    exactly the same result as comparing the hierarchies. 6 and 7 card
+    hands take the best of the hands with one card fewer.
+    """
+    five_rank = {}
+    five_flush = {}
+
+    for ranks in _rank_multisets(5):
+        key = sum(1 << (3 * rank) for rank in ranks)
+        five_rank[key] = _five_card_hierarchy(ranks, False)
+
+        if len(set(ranks)) == 5:
+            mask = sum(1 << rank for rank in ranks)
+            five_flush[mask] = _five_card_hierarchy(ranks, True)
+
+    hierarchies = sorted(set(five_rank.values()) | set(five_flush.values()))
+    ranks_of = {hierarchy[:2]: i for i, hierarchy in enumerate(hierarchies)}
+    names = [hierarchy[2] for hierarchy in hierarchies]
+    categories = [hierarchy[0] for hierarchy in hierarchies]
+
+    rank_table = {key: ranks_of[value[:2]]
+                  for key, value in five_rank.items()}
+    flush_table = [0] * (1 << 13)
+
+    for mask, value in five_flush.items():
+        flush_table[mask] = ranks_of[value[:2]]
+
+    for size in (6, 7):
+        for ranks in _rank_multisets(size):
+            key = sum(1 << (3 * rank) for rank in ranks)
+            rank_table[key] = max(rank_table[key - (1 << (3 * rank))]
+                                  for rank in set(ranks))
+
+        for ranks in combinations(range(13), size):
+            mask = sum(1 << rank for rank in ranks)
+            flush_table[mask] = max(flush_table[mask ^ (1 << rank)]
+                                    for rank in ranks)
+
+    return rank_table, flush_table, ranks_of, names, categories
+
+_RANK_TABLE, _FLUSH_TABLE, _HIERARCHY_RANKS, _NAMES, _CATEGORIES = \
+    _build_tables()
+
+NUM_RANKS = len(_NAMES)
+
+def evaluate(cards: list[int]) -> int:
+    """Scores the best 5 card hand that can be made from 5 to 7 cards.
+
+    Returns an integer rank where a higher rank is a better hand and equal
+    ranks are equal hands, in the same order as hand_hierarchy.
+    """
+    rank_key = 0
+    suit_key = 0
+
+    for card in cards:
+        rank_key += _RANK_KEY[card]
+        suit_key += _SUIT_KEY[card]
+
+    # A suit counter of 5 or more carries into the top bit of its nibble.
+    flush = (suit_key + 0x3333) & 0x8888
+
+    if flush:
+        suit = _FLUSH_SUIT[flush]
+        mask = 0
+
+        for card in cards:
+            if card & 3 == suit:
+                mask |= _RANK_BIT[card]
+
+        return _FLUSH_TABLE[mask]
+
+    return _RANK_TABLE[rank_key]
+
+def partial_hand(cards: list[int]) -> tuple:
+    """Summarises cards shared by many hands, such as the board.
+
+    Returns the rank key, suit key and per suit rank masks of the cards, to
+    be completed with evaluate_partial.
+    """
+    rank_key = 0
+    suit_key = 0
+    masks = [0, 0, 0, 0]
+
+    for card in cards:
+        rank_key += _RANK_KEY[card]
+        suit_key += _SUIT_KEY[card]
+        masks[card & 3] |= _RANK_BIT[card]
+
+    return rank_key, suit_key, tuple(masks)
+
+def evaluate_partial(partial: tuple, cards: tuple) -> int:
+    """Scores the cards of a partial_hand together with some more cards.
+
+    Returns the same rank as evaluate on all of the cards combined.
+    """
+    rank_key, suit_key, masks = partial
+
+    for card in cards:
+        rank_key += _RANK_KEY[card]
+        suit_key += _SUIT_KEY[card]
+
+    flush = (suit_key + 0x3333) & 0x8888
+
+    if flush:
+        suit = _FLUSH_SUIT[flush]
+        mask = masks[suit]
+
+        for card in cards:
+            if card & 3 == suit:
+                mask |= _RANK_BIT[card]
+
+        return _FLUSH_TABLE[mask]
+
+    return _RANK_TABLE[rank_key]
+
+def hierarchy_rank(hierarchy: list) -> int:
+    """Returns the evaluate rank matching a hand_hierarchy result."""
+    return _HIERARCHY_RANKS[(hierarchy[1], hierarchy[2])]
+
+def rank_category(rank: int) -> int:
+    """Returns the hand_hierarchy category (0 High Card - 9 Royal Flush)."""
+    return _CATEGORIES[rank]
+
+def rank_name(rank: int) -> str:
+    """Returns the hand_hierarchy name of a rank, e.g. 'Full House'."""
+    return _NAMES[rank]
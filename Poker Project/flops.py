@@ -0,0 +1,322 @@
+from batch_evaluator import evaluate_batch
+from equity_cache import canonical_permutation
+from evaluator import NUM_RANKS, int_to_card, rank_category
+from hand_index import TEXTURES, texture_flags
+from itertools import combinations, permutations
+from math import comb
+from outs import read_cards
+from pathlib import Path
+from poker_basics import HIERARCHY_NAMES
+from ranges import COMBO_MASKS, COMBOS, NUM_COMBOS, combo_index, mask_of
+from typing import Optional
+import argparse
+import mmap
+import numpy as np
+import struct
+
+TABLE_PATH = Path(__file__).with_name('flop_table.bin')
+NUM_FLOPS = 22100
+NUM_CLASSES = 1755
+NUM_CATEGORIES = len(HIERARCHY_NAMES)
+
+# Flop texture flags, one bit each in the order listed: the board textures
+# of hand_index.py, then two that only describe flops. A flop is connected
+# when two of its ranks are next to each other (the ace also plays low) and
+# broadway when two of its cards are ten or higher.
+FLOP_TEXTURES = TEXTURES + ['connected', 'broadway']
+
+# Header: magic, version, flops, classes, combos, categories. Then the
+# sections, widest values first so each stays aligned: by class, the
+# FLOP_TEXTURES bits, the count of live combos in each hand_hierarchy
+# category and the percentile of each combo in units of
+# 100 / PERCENTILE_SCALE percent, as uint16; by the colex rank of every
+# flop, its class as int16; by class, the canonical flop as 3 int8 codes
+# and the category of each combo as uint8; by the colex rank of every flop,
+# the index of the suit permutation to its canonical flop as uint8. Combos
+# that hold a card of the flop are BLOCKED.
+_HEADER = struct.Struct('<4sHHHHHxx')
+_MAGIC = b'FLOP'
+_VERSION = 1
+PERCENTILE_SCALE = 65534
+BLOCKED = -1
+
+# BLOCKED as stored in the uint16 percentiles.
+_BLOCKED_PERCENTILE = 0xFFFF
+
+_SUIT_PERMUTATIONS = list(permutations(range(4)))
+_CATEGORIES = np.array([rank_category(rank) for rank in range(NUM_RANKS)],
+                       dtype=np.int16)
+
+# _COMBO_LOOKUP[a, b] is the index of the combo of the cards a and b.
+_COMBO_LOOKUP = np.zeros((52, 52), dtype=np.intp)
+_COMBO_LOOKUP[COMBOS[:, 0], COMBOS[:, 1]] = np.arange(NUM_COMBOS)
+_COMBO_LOOKUP[COMBOS[:, 1], COMBOS[:, 0]] = np.arange(NUM_COMBOS)
+
+def flop_index(flop: list[int]) -> int:
+    """Returns the colex rank (0-22099) of 3 distinct card codes."""
+    low, middle, high = sorted(flop)
+
+    return comb(low, 1) + comb(middle, 2) + comb(high, 3)
+
+def _flop_indexes(flops: np.ndarray) -> np.ndarray:
+    """Returns the colex ranks of an (N, 3) array of flops."""
+    low, middle, high = np.sort(flops.astype(np.int64), axis=1).T
+
+    return low + middle * (middle - 1) // 2 + (high * (high - 1) *
+                                               (high - 2) // 6)
+
+def _combo_tables() -> np.ndarray:
+    """Maps every combo to its index once each suit permutation is applied.
+
+    Returns a (24, 1326) array.
+    """
+    cards = COMBOS.astype(np.intp)
+    tables = np.empty((len(_SUIT_PERMUTATIONS), NUM_COMBOS), dtype=np.int16)
+
+    for i, perm in enumerate(_SUIT_PERMUTATIONS):
+        relabeled = (cards & ~3) | np.array(perm)[cards & 3]
+        tables[i] = _COMBO_LOOKUP[relabeled[:, 0], relabeled[:, 1]]
+
+    return tables
+
+_COMBO_TABLES = _combo_tables()
+
+def flop_textures(flops: np.ndarray) -> np.ndarray:
+    """Classifies the texture of many flops at once.
+
+    Returns an (N,) uint16 array of FLOP_TEXTURES bits.
+    """
+    flops = np.asarray(flops, dtype=np.int16)
+    padded = np.full((len(flops), 5), -1, dtype=np.int16)
+    padded[:, :3] = flops
+    texture = texture_flags(padded).astype(np.uint16)
+
+    ranks = np.sort(flops >> 2, axis=1)
+    gaps = np.diff(ranks, axis=1)
+    wheel = (ranks[:, 0] == 0) & (ranks[:, 2] == 12)
+    connected = (gaps == 1).any(axis=1) | wheel
+    broadway = (ranks >= 8).sum(axis=1) >= 2
+    texture |= connected.astype(np.uint16) << len(TEXTURES)
+    texture |= broadway.astype(np.uint16) << len(TEXTURES) + 1
+
+    return texture
+
+def canonical_flops() -> tuple:
+    """Sorts every flop into its class of flops that only differ by suits.
+
+    Returns the canonical flops as a (1755, 3) array, and by the colex
+    rank of every flop its class and the index of the suit permutation
+    that relabels it to the canonical flop.
+    """
+    canonical = {}
+    classes = np.empty(NUM_FLOPS, dtype=np.int16)
+    perms = np.empty(NUM_FLOPS, dtype=np.uint8)
+
+    for flop in combinations(range(52), 3):
+        perm = canonical_permutation([], list(flop))[1]
+        cards = tuple(sorted(card & ~3 | perm[card & 3] for card in flop))
+        index = flop_index(flop)
+        classes[index] = canonical.setdefault(cards, len(canonical))
+        perms[index] = _SUIT_PERMUTATIONS.index(perm)
+
+    return np.array(list(canonical), dtype=np.int8), classes, perms
+
+def _flop_strength(flop: np.ndarray) -> tuple:
+    """Scores every combo on one flop.
+
+    Returns the hand_hierarchy category and the percentile of each combo,
+    BLOCKED for those holding a flop card. A combo's percentile is the
+    percent of the other live combos it beats, counting ties as half.
+    """
+    live = np.flatnonzero((COMBO_MASKS & mask_of(flop.tolist())) == 0)
+    hands = np.empty((len(live), 5), dtype=np.int8)
+    hands[:, :3] = flop
+    hands[:, 3:] = COMBOS[live]
+    ranks = evaluate_batch(hands)
+
+    ordered = np.sort(ranks)
+    below = np.searchsorted(ordered, ranks, 'left')
+    equal = np.searchsorted(ordered, ranks, 'right') - below
+    percentiles = (below + (equal - 1) / 2) / (len(live) - 1)
+
+    categories = np.full(NUM_COMBOS, BLOCKED, dtype=np.int16)
+    categories[live] = _CATEGORIES[ranks]
+    scaled = np.full(NUM_COMBOS, BLOCKED, dtype=np.int32)
+    scaled[live] = np.rint(percentiles * PERCENTILE_SCALE)
+
+    return categories, scaled
+
+def build() -> None:
+    """Scores every combo on every canonical flop and writes the table."""
+    flops, classes, perms = canonical_flops()
+    categories = np.empty((NUM_CLASSES, NUM_COMBOS), dtype=np.uint8)
+    percentiles = np.empty((NUM_CLASSES, NUM_COMBOS), dtype=np.uint16)
+    counts = np.empty((NUM_CLASSES, NUM_CATEGORIES), dtype=np.uint16)
+
+    for row, flop in enumerate(flops):
+        category, percentile = _flop_strength(flop)
+        categories[row] = category.astype(np.uint8)
+        percentiles[row] = percentile.astype(np.uint16)
+        counts[row] = np.bincount(category[category != BLOCKED],
+                                  minlength=NUM_CATEGORIES)
+
+    with open(TABLE_PATH, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, NUM_FLOPS, NUM_CLASSES,
+                                NUM_COMBOS, NUM_CATEGORIES))
+
+        for array in [flop_textures(flops), counts, percentiles, classes,
+                      flops, categories, perms]:
+            file.write(array.tobytes())
+
+def _load() -> Optional[dict]:
+    """Memory maps the flop table if it has been built.
+
+    Returns a dict of section name to array.
+    """
+    if not TABLE_PATH.exists():
+        return None
+
+    with open(TABLE_PATH, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, flops, classes, combos, categories = \
+        _HEADER.unpack_from(data)
+
+    if (magic != _MAGIC or version != _VERSION or flops != NUM_FLOPS or
+            classes != NUM_CLASSES or combos != NUM_COMBOS or
+            categories != NUM_CATEGORIES):
+        raise ValueError(f'{TABLE_PATH} is not a flop table for this '
+                         f'version, rebuild it with flops.py --build')
+
+    sections = [('textures', np.uint16, (NUM_CLASSES,)),
+                ('counts', np.uint16, (NUM_CLASSES, NUM_CATEGORIES)),
+                ('percentiles', np.uint16, (NUM_CLASSES, NUM_COMBOS)),
+                ('classes', np.int16, (NUM_FLOPS,)),
+                ('flops', np.int8, (NUM_CLASSES, 3)),
+                ('categories', np.uint8, (NUM_CLASSES, NUM_COMBOS)),
+                ('perms', np.uint8, (NUM_FLOPS,))]
+    table = {}
+    offset = _HEADER.size
+
+    for name, dtype, shape in sections:
+        count = int(np.prod(shape))
+        table[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                    offset=offset).reshape(shape)
+        offset += count * np.dtype(dtype).itemsize
+
+    return table
+
+_TABLE = _load()
+
+def _table() -> dict:
+    """Returns the flop table, or explains how to build it."""
+    if _TABLE is None:
+        raise FileNotFoundError(f'{TABLE_PATH} has not been built, run '
+                                f'flops.py --build to build it')
+
+    return _TABLE
+
+def flop_class(flop: list[int]) -> int:
+    """Returns the class (0-1754) of a flop, shared by every flop that
+    only differs from it by suits."""
+    return int(_table()['classes'][flop_index(flop)])
+
+def flop_texture(flop: list[int]) -> list[str]:
+    """Returns the FLOP_TEXTURES names of a flop."""
+    flags = int(_table()['textures'][flop_class(flop)])
+
+    return [name for bit, name in enumerate(FLOP_TEXTURES) if flags >> bit & 1]
+
+def category_counts(flop: list[int]) -> dict:
+    """Returns the number of the 1,176 live combos that make each
+    hand_hierarchy category on a flop, by category name."""
+    counts = _table()['counts'][flop_class(flop)]
+
+    return dict(zip(HIERARCHY_NAMES, counts.tolist()))
+
+def flop_percentiles(flop: list[int]) -> np.ndarray:
+    """Looks up the percentile of every combo on a flop.
+
+    Returns a (1326,) array of percents laid out as a range's weights,
+    NaN for the combos that hold a flop card.
+    """
+    table = _table()
+    index = flop_index(flop)
+    combos = _COMBO_TABLES[table['perms'][index]]
+    scaled = table['percentiles'][table['classes'][index]][combos]
+
+    return np.where(scaled == _BLOCKED_PERCENTILE, np.nan,
+                    scaled / PERCENTILE_SCALE * 100)
+
+def batch_strength(players: np.ndarray, flops: np.ndarray) -> tuple:
+    """Looks up the hand_hierarchy category and percentile of many hole
+    cards, each on its own flop.
+
+    players is an (N, 2) and flops an (N, 3) array of card codes. Hole
+    cards that share a card with their flop are not allowed.
+
+    Returns an (N,) array of categories and one of percents.
+    """
+    table = _table()
+    players = np.asarray(players, dtype=np.intp)
+    indexes = _flop_indexes(np.asarray(flops))
+    classes = table['classes'][indexes]
+    perms = table['perms'][indexes]
+    combos = _COMBO_TABLES[perms,
+                           _COMBO_LOOKUP[players[:, 0], players[:, 1]]]
+    scaled = table['percentiles'][classes, combos]
+
+    if (scaled == _BLOCKED_PERCENTILE).any():
+        raise ValueError('hole cards share a card with their flop')
+
+    return (table['categories'][classes, combos],
+            scaled / PERCENTILE_SCALE * 100)
+
+def percentile(player: list[int], flop: list[int]) -> float:
+    """Returns the percent of the other live combos that hole cards beat
+    on a flop, counting ties as half."""
+    value = flop_percentiles(flop)[combo_index(player)]
+
+    if np.isnan(value):
+        raise ValueError('hole cards share a card with the flop')
+
+    return float(value)
+
+def buckets(players: np.ndarray, flops: np.ndarray,
+            count: int = 10) -> np.ndarray:
+    """Buckets many hole cards, each on its own flop, into count equal
+    bands of percentile, 0 the weakest.
+
+    Returns an (N,) array of bucket numbers.
+    """
+    percentiles = batch_strength(players, flops)[1]
+
+    return np.minimum((percentiles * count / 100).astype(np.intp),
+                      count - 1)
+
+def main():
+    """Main function that builds the flop table and describes a flop."""
+    global _TABLE
+
+    parser = argparse.ArgumentParser(description='Build or use the flop '
+                                                 'table.')
+    parser.add_argument('--build', action='store_true',
+                        help='score every combo on every canonical flop')
+    args = parser.parse_args()
+
+    if args.build or _TABLE is None:
+        build()
+        _TABLE = _load()
+
+    flop = read_cards('Enter the flop (e.g. Q S, J D, 2 S): ')
+    print(f'Class {flop_class(flop)}:', ', '.join(flop_texture(flop)))
+
+    for name, count in category_counts(flop).items():
+        print(f'{name}: {count}')
+
+    player = [int(code) for code in COMBOS[np.nanargmax(
+        flop_percentiles(flop))]]
+    print('Best hand:', [int_to_card(card) for card in player])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from evaluator import SUITS, VALUES
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+import os
+import re
+
+DATA_DIR = Path(__file__).with_name('poker data')
+CHUNK_SIZE = 1 << 20
+STREETS = ['PREFLOP', 'FLOP', 'TURN', 'RIVER']
+
+_STAGE = re.compile(r'Stage #(\d+): (.*?) +\$([\d,.]+)'
+                    r'(?:, \$([\d,.]+) ante)?'
+                    r' - (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)')
+_TABLE = re.compile(r'Table: (.*) \(Real Money\) Seat #(\d+) is the '
+                    r'(?:dead )?dealer')
+_SEAT = re.compile(r'Seat (\d+) - (.+) \(\$([\d,.]+) in chips\)')
+_COLLECTS = re.compile(r'(.+) Collects \$([\d,.]+) from (?:main|side) pot')
+_POT = re.compile(r'Total Pot\(\$([\d,.]+)[^)]*\)'
+                  r'(?: \| Rake \(\$([\d,.]+)[^)]*\))?'
+                  r'(?: \| Jackpot Rake \(\$([\d,.]+))?')
+_CARDS = re.compile(r'\[([^\]]*)\]')
+_AMOUNTS = re.compile(r'\$([\d,.]+)')
+
+# Action text prefixes and the kind they are recorded as, longest first.
+_KINDS = [
+    ('All-In(Raise)', 'allin_raise'),
+    ('All-In', 'allin'),
+    ('Posts small blind', 'small_blind'),
+    ('Posts big blind', 'big_blind'),
+    ('Posts dead', 'post_dead'),
+    ('Posts', 'post'),
+    ('Ante returned', 'ante_returned'),
+    ('Ante', 'ante'),
+    ('returned', 'returned'),
+    ('Raises', 'raise'),
+    ('Folds', 'fold'),
+    ('Checks', 'check'),
+    ('Calls', 'call'),
+    ('Bets', 'bet'),
+    ('sitout', 'sitout'),
+    ('Shows', 'show'),
+    ('Does not show', 'no_show'),
+    ('Mucks', 'muck'),
+]
+ACTION_KINDS = [kind for _, kind in _KINDS] + ['other']
+
+class Action:
+    """Represents one action by a player.
+
+    Attributes:
+        player: Player who acted.
+        kind: Kind of action, e.g. 'fold', 'call', 'raise' or 'big_blind'.
+        amount: Dollar amount of the action, if any.
+        total: Total the player raised to, for raises.
+    """
+    def __init__(
+            self,
+            player: str,
+            kind: str,
+            amount: Optional[float] = None,
+            total: Optional[float] = None):
+        self.player = player
+        self.kind = kind
+        self.amount = amount
+        self.total = total
+
+    def __repr__(self):
+        return 'Action(%r, %r, %r, %r)' % (self.player, self.kind,
+                                           self.amount, self.total)
+
+class ParsedHand:
+    """Represents one hand from a hand history file.
+
+    Attributes:
+        hand_id: Stage number of the hand.
+        game: Game description, e.g. 'Holdem  No Limit'.
+        stakes: Big blind of the game in dollars.
+        ante: Ante in dollars, or None.
+        timestamp: Time the hand started (ET).
+        table: Table name.
+        dealer: Seat number of the dealer button.
+        seats: List of (seat, player, stack) tuples.
+        posts: Antes, blinds and other actions before the cards are dealt.
+        actions: Dict of street name to the list of Actions on it.
+        board: Board cards as integer codes.
+        shows: Dict of player to the hole cards they showed.
+        collected: Dict of player to the dollars they collected.
+        total_pot: Total pot in dollars.
+        rake: Rake in dollars, including the jackpot rake.
+        summary: Lines of the summary section.
+    """
+    def __init__(self, hand_id: int, game: str, stakes: float,
+                 ante: Optional[float], timestamp: datetime):
+        self.hand_id = hand_id
+        self.game = game
+        self.stakes = stakes
+        self.ante = ante
+        self.timestamp = timestamp
+        self.table = ''
+        self.dealer = 0
+        self.seats = []
+        self.posts = []
+        self.actions = {street: [] for street in STREETS}
+        self.board = []
+        self.shows = {}
+        self.collected = {}
+        self.total_pot = 0.0
+        self.rake = 0.0
+        self.summary = []
+
+    @property
+    def antes(self) -> dict:
+        """Dict of player to the ante they posted."""
+        return {action.player: action.amount for action in self.posts
+                if action.kind == 'ante'}
+
+    @property
+    def blinds(self) -> list[Action]:
+        """List of the blinds posted, in order."""
+        return [action for action in self.posts
+                if action.kind in ('small_blind', 'big_blind', 'post',
+                                   'post_dead')]
+
+    def __repr__(self):
+        return 'ParsedHand(%r, %r, %r)' % (self.hand_id, self.table,
+                                            self.timestamp)
+
+def parse_card(text: str) -> int:
+    """Converts a card such as 'Ah' or '10c' to its integer code."""
+    return VALUES.index(text[:-1]) * 4 + SUITS.index(text[-1].upper())
+
+def _money(text: str) -> float:
+    """Converts a dollar amount such as '1,515.50' to a float."""
+    return float(text.replace(',', ''))
+
+def _cards(text: str) -> list[int]:
+    """Returns the cards in the last [...] group of a line."""
+    groups = _CARDS.findall(text)
+
+    if not groups:
+        return []
+
+    return [parse_card(card) for card in groups[-1].split()
+            if card != '-']
+
+def parse_action(line: str) -> Optional[Action]:
+    """Parses a 'player - action' line.
+
+    Returns the Action, or None if the line is not a player action.
+    """
+    player, sep, text = line.partition(' - ')
+
+    if not sep:
+        return None
+
+    for prefix, kind in _KINDS:
+        if text.startswith(prefix):
+            amounts = [_money(amount) for amount in _AMOUNTS.findall(text)]
+
+            if kind in ('raise', 'allin_raise') and len(amounts) == 2:
+                return Action(player, kind, amounts[0], amounts[1])
+
+            if kind == 'post_dead':
+                return Action(player, kind, sum(amounts))
+
+            return Action(player, kind, amounts[0] if amounts else None)
+
+    return Action(player, 'other')
+
+def parse_hand(lines: list[str]) -> Optional[ParsedHand]:
+    """Parses the lines of one hand, starting with its 'Stage #' line.
+
+    Returns the ParsedHand, or None if the first line is not a hand header.
+    """
+    match = _STAGE.match(lines[0])
+
+    if match is None:
+        return None
+
+    hand = ParsedHand(int(match[1]), match[2], _money(match[3]),
+                      _money(match[4]) if match[4] else None,
+                      datetime.strptime(match[5], '%Y-%m-%d %H:%M:%S'))
+    section = None
+
+    for line in lines[1:]:
+        if line.startswith('*** '):
+            if line.startswith('*** POCKET CARDS'):
+                section = 'PREFLOP'
+
+            elif line.startswith('*** SHOW DOWN'):
+                section = 'SHOW DOWN'
+
+            elif line.startswith('*** SUMMARY'):
+                section = 'SUMMARY'
+
+            else:
+                section = line.split()[1]
+
+            continue
+
+        if section == 'SUMMARY':
+            hand.summary.append(line)
+
+            if line.startswith('Board '):
+                hand.board = _cards(line)
+
+            elif line.startswith('Total Pot'):
+                pot = _POT.match(line)
+
+                if pot is not None:
+                    hand.total_pot = _money(pot[1])
+                    hand.rake = sum(_money(amount) for amount in
+                                    pot.group(2, 3) if amount)
+
+        elif section is None:
+            if line.startswith('Table: '):
+                table = _TABLE.match(line)
+
+                if table is not None:
+                    hand.table = table[1]
+                    hand.dealer = int(table[2])
+
+            elif line.startswith('Seat '):
+                seat = _SEAT.match(line)
+
+                if seat is not None:
+                    hand.seats.append((int(seat[1]), seat[2],
+                                       _money(seat[3])))
+
+            else:
+                action = parse_action(line)
+
+                if action is not None:
+                    hand.posts.append(action)
+
+        else:
+            collects = _COLLECTS.match(line)
+
+            if collects is not None:
+                player = collects[1]
+                hand.collected[player] = (hand.collected.get(player, 0.0) +
+                                          _money(collects[2]))
+                continue
+
+            action = parse_action(line)
+
+            if action is None:
+                continue
+
+            if '[' in line and action.kind in ('show', 'fold'):
+                hand.shows[action.player] = _cards(line)
+
+            if section in hand.actions:
+                hand.actions[section].append(action)
+
+    return hand
+
+def _hand_starts(path: Path, start: int, end: Optional[int]) -> Iterator:
+    """Yields the lines of each hand that starts between start and end.
+
+    Byte offsets let several processes share one file: a hand belongs to
+    the chunk its 'Stage #' line starts in.
+    """
+    with open(path, 'rb') as file:
+        # Skip the rest of the line the previous chunk's last byte is in.
+        if start:
+            file.seek(start - 1)
+            file.readline()
+
+        lines = []
+        position = file.tell()
+
+        for raw in iter(file.readline, b''):
+            if raw.startswith(b'Stage #'):
+                if lines:
+                    yield lines
+
+                if end is not None and position >= end:
+                    return
+
+                lines = []
+
+            if lines or raw.startswith(b'Stage #'):
+                line = raw.decode('latin-1').rstrip('\r\n')
+
+                if line:
+                    lines.append(line)
+
+            position += len(raw)
+
+        if lines:
+            yield lines
+
+def read_hands(path: Path, start: int = 0,
+               end: Optional[int] = None) -> Iterator[ParsedHand]:
+    """Lazily parses the hands of a hand history file, one at a time."""
+    for lines in _hand_starts(path, start, end):
+        hand = parse_hand(lines)
+
+        if hand is not None:
+            yield hand
+
+def data_files(directory: Path = DATA_DIR) -> list[Path]:
+    """Returns the hand history files of a directory, in numeric order."""
+    def number(path: Path) -> int:
+        digits = re.findall(r'\d+', path.name)
+
+        return int(digits[0]) if digits else 0
+
+    return sorted(directory.glob('*.txt'), key=number)
+
+def chunks(paths: list[Path], chunk_size: int = CHUNK_SIZE) -> list[tuple]:
+    """Splits files into (path, start, end) byte ranges of about chunk_size."""
+    ranges = []
+
+    for path in paths:
+        size = os.path.getsize(path)
+
+        for start in range(0, max(size, 1), chunk_size):
+            ranges.append((path, start, min(start + chunk_size, size)))
+
+    return ranges
+
+def _parse_chunk(args: tuple) -> list[ParsedHand]:
+    """Parses every hand starting in one byte range of a file."""
+    return list(read_hands(*args))
+
+def _map_chunk(args: tuple):
+    """Applies a function to the hands of one byte range of a file."""
+    function, path, start, end = args
+
+    return function(read_hands(path, start, end))
+
+def parse_files(
+        paths: Optional[list[Path]] = None,
+        workers: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE,
+        window: int = 8) -> Iterator[ParsedHand]:
+    """Parses hand history files in parallel, yielding hands in file order.
+
+    Files are split into chunks that are parsed across processes. At most
+    window chunks per worker are in flight, so memory stays bounded no
+    matter how big the archive is. workers=1 parses in this process.
+    """
+    if paths is None:
+        paths = data_files()
+
+    if workers == 1:
+        for path in paths:
+            yield from read_hands(path)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        limit = window * (workers or os.cpu_count() or 1)
+        pending = deque()
+
+        for chunk in chunks(paths, chunk_size):
+            pending.append(executor.submit(_parse_chunk, chunk))
+
+            if len(pending) >= limit:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+def map_hands(
+        function: Callable,
+        paths: Optional[list[Path]] = None,
+        workers: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE) -> list:
+    """Streams each chunk's hands through a function in worker processes.
+
+    function takes an iterator of ParsedHands and must be picklable (a
+    module level function). Only its results come back to this process.
+
+    Returns the results of every chunk, in file order.
+    """
+    if paths is None:
+        paths = data_files()
+
+    jobs = [(function,) + chunk for chunk in chunks(paths, chunk_size)]
+
+    if workers == 1:
+        return [_map_chunk(job) for job in jobs]
+
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_map_chunk, jobs))
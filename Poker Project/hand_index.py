@@ -0,0 +1,337 @@
+from datetime import datetime
+from hand_history import ParsedHand
+from hand_store import STORE_DIR, HandStore
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+import argparse
+import json
+import numpy as np
+import os
+
+INDEX_DIR = STORE_DIR / 'index'
+
+# Board texture flags, one bit each in the order listed. The flop flags
+# describe the first three cards, the others every card dealt.
+TEXTURES = ['paired', 'trips', 'monotone', 'two_tone', 'rainbow',
+            'flush_possible', 'straight_possible']
+
+# Arrays of the index. Hands are numbered in store order, chunk by chunk.
+# Players and tables map to sorted hand numbers through offsets, as in a
+# CSR matrix, and times and stakes are kept sorted with their hand numbers.
+_ARRAYS = ['chunk_starts', 'player_offsets', 'player_hands',
+           'table_offsets', 'table_hands', 'time_values', 'time_hands',
+           'stakes_values', 'stakes_hands', 'texture']
+
+Date = Union[str, datetime, np.datetime64]
+
+def _end_time(end: Date) -> np.datetime64:
+    """Converts an inclusive end to the last second it covers, so that a
+    date such as '2009-07-01' includes the whole day (and a month the
+    whole month)."""
+    end = np.datetime64(end)
+
+    if np.datetime_data(end.dtype)[0] in ('Y', 'M', 'W', 'D', 'h', 'm'):
+        return (end + 1).astype('datetime64[s]') - 1
+
+    return end.astype('datetime64[s]')
+
+def texture_flags(boards: np.ndarray) -> np.ndarray:
+    """Classifies the texture of many boards at once.
+
+    boards is an (N, 5) array of card codes, padded with -1 when fewer
+    than five cards were dealt.
+
+    Returns an (N,) uint8 array of TEXTURES bits.
+    """
+    boards = np.asarray(boards, dtype=np.int16)
+    dealt = boards >= 0
+    ranks = np.where(dealt, boards >> 2, -1)
+    suits = np.where(dealt, boards & 3, -1)
+
+    rank_counts = (ranks[:, :, None] == np.arange(13)).sum(axis=1)
+    suit_counts = (suits[:, :, None] == np.arange(4)).sum(axis=1)
+    flop_suits = (suits[:, :3, None] == np.arange(4)).any(axis=1).sum(axis=1)
+    flop = dealt[:, 2]
+
+    # Three ranks within five in a row (the ace also plays low) make a
+    # straight possible.
+    present = np.concatenate([rank_counts[:, 12:] > 0, rank_counts > 0],
+                             axis=1).astype(np.int16)
+    windows = np.zeros((len(boards), present.shape[1] + 1), dtype=np.int16)
+    np.cumsum(present, axis=1, out=windows[:, 1:])
+    straight = (windows[:, 5:] - windows[:, :-5]).max(axis=1) >= 3
+
+    flags = [rank_counts.max(axis=1) >= 2, rank_counts.max(axis=1) >= 3,
+             flop & (flop_suits == 1), flop & (flop_suits == 2),
+             flop & (flop_suits == 3), suit_counts.max(axis=1) >= 3,
+             straight]
+    texture = np.zeros(len(boards), dtype=np.uint8)
+
+    for bit, flag in enumerate(flags):
+        texture |= flag.astype(np.uint8) << bit
+
+    return texture
+
+def board_texture(board: list[int]) -> list[str]:
+    """Returns the TEXTURES names of one board."""
+    padded = np.full((1, 5), -1)
+    padded[0, :len(board)] = board
+    flags = int(texture_flags(padded)[0])
+
+    return [name for bit, name in enumerate(TEXTURES) if flags >> bit & 1]
+
+def _grouped(keys: np.ndarray, hands: np.ndarray, size: int) -> tuple:
+    """Groups hand numbers by key, dropping repeated (key, hand) pairs.
+
+    Returns the offsets of each key's hands (size + 1 of them) and the
+    hand numbers, sorted within each key.
+    """
+    pairs = np.unique(keys.astype(np.int64) << 32 | hands.astype(np.int64))
+    offsets = np.searchsorted(pairs >> 32, np.arange(size + 1))
+
+    return offsets, (pairs & 0xFFFFFFFF).astype(np.int32)
+
+def _signature(store: HandStore) -> dict:
+    """Returns what the index must be rebuilt after a change of."""
+    return {name: [entry['chunk'], entry['size'], entry['mtime']]
+            for name, entry in store.manifest.items()}
+
+class HandIndex:
+    """Represents secondary indexes over a HandStore, and queries that
+    use them to decode only the hands they match.
+
+    The index is rebuilt from the store's columns (never the text) when
+    the store's manifest has changed since it was built.
+
+    Attributes:
+        store: The HandStore indexed.
+        path: Directory of the index.
+        arrays: Dict of index array name to array.
+    """
+    def __init__(self, store: Optional[HandStore] = None,
+                 path: Path = INDEX_DIR):
+        self.store = HandStore() if store is None else store
+        self.path = Path(path)
+        self.arrays = {}
+        self._players = {}
+        self._tables = {}
+
+        if self.current():
+            self.arrays = {name: np.load(self.path / f'{name}.npy',
+                                         mmap_mode='r')
+                           for name in _ARRAYS}
+            self._names()
+
+    def current(self) -> bool:
+        """True if the index on disk matches the store."""
+        if not (self.path / 'index.json').exists():
+            return False
+
+        with open(self.path / 'index.json') as file:
+            return json.load(file) == _signature(self.store)
+
+    def _names(self) -> None:
+        """Maps player and table names to their numbers in the store."""
+        self._players = {name: i for i, name in
+                         enumerate(self.store.strings['players'])}
+        self._tables = {name: i for i, name in
+                        enumerate(self.store.strings['tables'])}
+
+    def build(self) -> None:
+        """Builds every index from the store's columns and saves it."""
+        store = self.store
+        sizes = [len(store.chunk_column(chunk, 'hand_id'))
+                 for chunk in store.chunks]
+        chunk_starts = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=chunk_starts[1:])
+        numbers = np.arange(chunk_starts[-1], dtype=np.int32)
+
+        # A player is in a hand if they have a seat or an action in it.
+        player_keys = []
+        player_hands = []
+
+        for chunk, start in zip(store.chunks, chunk_starts):
+            for count, column in [('seat_count', 'seat_player'),
+                                  ('action_count', 'action_player')]:
+                counts = store.chunk_column(chunk, count)
+                player_keys.append(store.chunk_column(chunk, column))
+                player_hands.append(np.repeat(
+                    np.arange(start, start + len(counts)), counts))
+
+        arrays = {'chunk_starts': chunk_starts}
+        arrays['player_offsets'], arrays['player_hands'] = _grouped(
+            np.concatenate(player_keys or [np.empty(0)]),
+            np.concatenate(player_hands or [np.empty(0)]),
+            len(store.strings['players']))
+        arrays['table_offsets'], arrays['table_hands'] = _grouped(
+            store.column('table'), numbers, len(store.strings['tables']))
+
+        for name, column in [('time', 'timestamp'), ('stakes', 'stakes')]:
+            values = store.column(column)
+            order = np.argsort(values, kind='stable')
+            arrays[f'{name}_values'] = values[order]
+            arrays[f'{name}_hands'] = order.astype(np.int32)
+
+        board = store.column('board').reshape(-1, 5)
+        arrays['texture'] = texture_flags(board)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        for name, array in arrays.items():
+            np.save(self.path / f'{name}.npy', array)
+
+        temp = self.path / 'index.json.tmp'
+
+        with open(temp, 'w') as file:
+            json.dump(_signature(store), file)
+
+        os.replace(temp, self.path / 'index.json')
+        self.arrays = arrays
+        self._names()
+
+    def update(
+            self,
+            paths: Optional[list[Path]] = None,
+            workers: Optional[int] = None) -> int:
+        """Ingests new or changed files and rebuilds the index if needed.
+
+        Returns the number of files ingested.
+        """
+        count = self.store.ingest(paths, workers)
+
+        if count or not self.current():
+            self.build()
+
+        return count
+
+    def _ready(self) -> None:
+        """Raises an error if the index is missing or out of date."""
+        if not self.arrays:
+            raise FileNotFoundError(f'{self.path} is missing or out of date, '
+                                    f'run hand_index.py to build it')
+
+    def _sorted_range(self, name: str, low, high) -> np.ndarray:
+        """Returns the sorted numbers of the hands whose value of a sorted
+        index is between low and high, inclusive."""
+        values = self.arrays[f'{name}_values']
+        start = 0 if low is None else np.searchsorted(values, low, 'left')
+        end = (len(values) if high is None else
+               np.searchsorted(values, high, 'right'))
+
+        return np.sort(self.arrays[f'{name}_hands'][start:end])
+
+    def _grouped_hands(self, name: str, key: int) -> np.ndarray:
+        """Returns the sorted numbers of the hands of one player or table."""
+        offsets = self.arrays[f'{name}_offsets']
+
+        return self.arrays[f'{name}_hands'][offsets[key]:offsets[key + 1]]
+
+    def select(
+            self,
+            player: Optional[str] = None,
+            table: Optional[str] = None,
+            stakes: Union[None, float, tuple] = None,
+            start: Optional[Date] = None,
+            end: Optional[Date] = None,
+            texture: tuple = ()) -> np.ndarray:
+        """Finds the hands matching every given condition with the indexes
+        alone.
+
+        stakes is a big blind or a (low, high) range of them, start and end
+        bound the time the hand started (inclusive, so an end date covers
+        its whole day), and texture is names from TEXTURES that the board
+        must all have.
+
+        Returns the sorted numbers of the matching hands.
+        """
+        self._ready()
+        matches = []
+
+        if player is not None:
+            if player not in self._players:
+                return np.empty(0, dtype=np.int32)
+
+            matches.append(self._grouped_hands('player',
+                                               self._players[player]))
+
+        if table is not None:
+            if table not in self._tables:
+                return np.empty(0, dtype=np.int32)
+
+            matches.append(self._grouped_hands('table', self._tables[table]))
+
+        if stakes is not None:
+            low, high = stakes if isinstance(stakes, tuple) else (stakes,
+                                                                  stakes)
+            matches.append(self._sorted_range('stakes', low, high))
+
+        if start is not None or end is not None:
+            matches.append(self._sorted_range(
+                'time', None if start is None else np.datetime64(start, 's'),
+                None if end is None else _end_time(end)))
+
+        if texture:
+            bits = sum(1 << TEXTURES.index(name) for name in texture)
+            flags = self.arrays['texture']
+            matches.append(np.flatnonzero(flags & bits == bits))
+
+        if not matches:
+            return np.arange(self.arrays['chunk_starts'][-1], dtype=np.int32)
+
+        # Intersect the smallest lists first.
+        matches.sort(key=len)
+        result = matches[0]
+
+        for other in matches[1:]:
+            result = result[np.isin(result, other, assume_unique=True)]
+
+        return result
+
+    def read_hand(self, number: int) -> ParsedHand:
+        """Decodes one hand by its number in the index."""
+        starts = self.arrays['chunk_starts']
+        chunk = int(np.searchsorted(starts, number, 'right')) - 1
+
+        return self.store.read_hand(self.store.chunks[chunk],
+                                    int(number - starts[chunk]))
+
+    def query(
+            self,
+            where: Optional[Callable] = None,
+            **conditions) -> Iterator[ParsedHand]:
+        """Lazily decodes the hands matching some conditions.
+
+        conditions are the arguments of select. where is an optional
+        function of a ParsedHand for conditions the indexes cannot answer,
+        such as facing a river raise; only the hands select found are
+        decoded to check it.
+        """
+        for number in self.select(**conditions):
+            hand = self.read_hand(number)
+
+            if where is None or where(hand):
+                yield hand
+
+def main():
+    """Main function that updates the store and index and runs a query."""
+    parser = argparse.ArgumentParser(description='Query the hand store.')
+    parser.add_argument('--player')
+    parser.add_argument('--table')
+    parser.add_argument('--stakes', type=float)
+    parser.add_argument('--start', help='e.g. 2009-07-01')
+    parser.add_argument('--end', help='e.g. 2009-07-02T12:00')
+    parser.add_argument('--texture', nargs='*', default=(), choices=TEXTURES)
+    args = parser.parse_args()
+
+    index = HandIndex()
+    index.update()
+    numbers = index.select(args.player, args.table, args.stakes, args.start,
+                           args.end, tuple(args.texture))
+    print(f'{len(numbers)} hands')
+
+    for number in numbers[:10]:
+        hand = index.read_hand(number)
+        print(hand.hand_id, hand.timestamp, hand.table, hand.board)
+
+if __name__ == '__main__':
+    main()
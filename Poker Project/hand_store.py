@@ -0,0 +1,342 @@
+from hand_history import (ACTION_KINDS, STREETS, Action, ParsedHand,
+                          chunks, data_files, map_hands)
+from pathlib import Path
+from typing import Iterator, Optional
+import json
+import numpy as np
+import os
+
+STORE_DIR = Path(__file__).with_name('hand_store')
+BATCH_FILES = 16
+
+# Street codes of actions: the posts before the deal, then each street.
+ACTION_STREETS = ['POSTS'] + STREETS
+
+# Columns with one row per hand, and the per hand counts that index the
+# flat columns of seats, actions, shown cards and collected pots.
+HAND_COLUMNS = ['hand_id', 'timestamp', 'game', 'table', 'stakes', 'ante',
+                'dealer', 'total_pot', 'rake', 'board', 'seat_count',
+                'action_count', 'show_count', 'collect_count']
+FLAT_COLUMNS = {
+    'seat_count': ['seat_number', 'seat_player', 'seat_stack'],
+    'action_count': ['action_street', 'action_player', 'action_kind',
+                     'action_amount', 'action_total'],
+    'show_count': ['show_player', 'show_cards'],
+    'collect_count': ['collect_player', 'collect_amount'],
+}
+_DTYPES = {
+    'hand_id': np.int64, 'timestamp': 'datetime64[s]', 'game': np.int32,
+    'table': np.int32, 'stakes': np.float64, 'ante': np.float64,
+    'dealer': np.int8, 'total_pot': np.float64, 'rake': np.float64,
+    'board': np.int8, 'seat_count': np.int16, 'action_count': np.int16,
+    'show_count': np.int16, 'collect_count': np.int16,
+    'seat_number': np.int8, 'seat_player': np.int32,
+    'seat_stack': np.float64, 'action_street': np.int8,
+    'action_player': np.int32, 'action_kind': np.int8,
+    'action_amount': np.float64, 'action_total': np.float64,
+    'show_player': np.int32, 'show_cards': np.int8,
+    'collect_player': np.int32, 'collect_amount': np.float64,
+}
+_STRING_COLUMNS = {'game': 'games', 'table': 'tables',
+                   'seat_player': 'players', 'action_player': 'players',
+                   'show_player': 'players', 'collect_player': 'players'}
+
+def hand_columns(hands: Iterator[ParsedHand]) -> dict:
+    """Flattens parsed hands into lists, one per column.
+
+    Strings (games, tables and players) are kept as strings, to be
+    numbered by the store.
+
+    Returns a dict of column name to list.
+    """
+    columns = {name: [] for name in _DTYPES}
+    nan = float('nan')
+
+    for hand in hands:
+        columns['hand_id'].append(hand.hand_id)
+        columns['timestamp'].append(hand.timestamp.isoformat())
+        columns['game'].append(hand.game)
+        columns['table'].append(hand.table)
+        columns['stakes'].append(hand.stakes)
+        columns['ante'].append(nan if hand.ante is None else hand.ante)
+        columns['dealer'].append(hand.dealer)
+        columns['total_pot'].append(hand.total_pot)
+        columns['rake'].append(hand.rake)
+        columns['board'].append(hand.board + [-1] * (5 - len(hand.board)))
+        columns['seat_count'].append(len(hand.seats))
+
+        for seat, player, stack in hand.seats:
+            columns['seat_number'].append(seat)
+            columns['seat_player'].append(player)
+            columns['seat_stack'].append(stack)
+
+        actions = [(0, action) for action in hand.posts]
+        for street, name in enumerate(STREETS, 1):
+            actions += [(street, action) for action in hand.actions[name]]
+
+        columns['action_count'].append(len(actions))
+
+        for street, action in actions:
+            columns['action_street'].append(street)
+            columns['action_player'].append(action.player)
+            columns['action_kind'].append(ACTION_KINDS.index(action.kind))
+            columns['action_amount'].append(
+                nan if action.amount is None else action.amount)
+            columns['action_total'].append(
+                nan if action.total is None else action.total)
+
+        shows = [(player, cards) for player, cards in hand.shows.items()
+                 if len(cards) == 2]
+        columns['show_count'].append(len(shows))
+
+        for player, cards in shows:
+            columns['show_player'].append(player)
+            columns['show_cards'].append(cards)
+
+        columns['collect_count'].append(len(hand.collected))
+
+        for player, amount in hand.collected.items():
+            columns['collect_player'].append(player)
+            columns['collect_amount'].append(amount)
+
+    return columns
+
+class HandStore:
+    """Represents a columnar store of parsed hands on disk.
+
+    Each ingested file becomes a chunk directory of NumPy arrays, one per
+    column. Strings are numbered through shared lists of games, tables
+    and players. manifest.json records each ingested file's size and
+    modification time, so ingest only parses new or changed files.
+
+    Attributes:
+        path: Directory of the store.
+        manifest: Dict of file name to its size, mtime and chunk.
+        strings: Dict of 'games', 'tables' and 'players' to their lists.
+    """
+    def __init__(self, path: Path = STORE_DIR):
+        self.path = Path(path)
+        self.manifest = {}
+        self.strings = {'games': [], 'tables': [], 'players': []}
+        self._ids = {}
+        self._arrays = {}
+
+        if (self.path / 'manifest.json').exists():
+            with open(self.path / 'manifest.json') as file:
+                saved = json.load(file)
+
+            self.manifest = saved['files']
+            self.strings = saved['strings']
+
+        for kind, values in self.strings.items():
+            self._ids[kind] = {value: i for i, value in enumerate(values)}
+
+    @property
+    def chunks(self) -> list[str]:
+        """Names of the chunk directories, in ingest order."""
+        return [entry['chunk'] for entry in self.manifest.values()]
+
+    def pending(self, paths: list[Path]) -> list[Path]:
+        """Returns the files that are new or changed since their ingest."""
+        todo = []
+
+        for path in paths:
+            stat = os.stat(path)
+            entry = self.manifest.get(Path(path).name)
+
+            if (entry is None or entry['size'] != stat.st_size or
+                    entry['mtime'] != stat.st_mtime):
+                todo.append(Path(path))
+
+        return todo
+
+    def ingest(
+            self,
+            paths: Optional[list[Path]] = None,
+            workers: Optional[int] = None) -> int:
+        """Parses and stores every new or changed file.
+
+        Files are parsed BATCH_FILES at a time across worker processes,
+        and the manifest is saved after every batch, so an interrupted
+        ingest keeps what it finished.
+
+        Returns the number of files ingested.
+        """
+        if paths is None:
+            paths = data_files()
+
+        todo = self.pending(paths)
+
+        for i in range(0, len(todo), BATCH_FILES):
+            batch = todo[i:i + BATCH_FILES]
+            results = map_hands(hand_columns, batch, workers)
+            by_file = {}
+
+            for (path, _, _), columns in zip(chunks(batch), results):
+                if path in by_file:
+                    for name, values in columns.items():
+                        by_file[path][name] += values
+
+                else:
+                    by_file[path] = columns
+
+            for path in batch:
+                self._write(path, by_file.get(path, hand_columns([])))
+
+            self._save_manifest()
+
+        self._arrays = {}
+
+        return len(todo)
+
+    def _write(self, path: Path, columns: dict) -> None:
+        """Writes the columns of one file as a chunk directory."""
+        entry = self.manifest.get(path.name)
+        chunk = (entry['chunk'] if entry is not None else
+                 'chunk_%05d' % len(self.manifest))
+        directory = self.path / chunk
+        directory.mkdir(parents=True, exist_ok=True)
+
+        for name, values in columns.items():
+            if name in _STRING_COLUMNS:
+                values = [self._id(_STRING_COLUMNS[name], value)
+                          for value in values]
+
+            array = np.array(values, dtype=_DTYPES[name])
+
+            if name == 'board':
+                array = array.reshape(-1, 5)
+
+            elif name == 'show_cards':
+                array = array.reshape(-1, 2)
+
+            np.save(directory / f'{name}.npy', array)
+
+        stat = os.stat(path)
+        self.manifest[path.name] = {'size': stat.st_size,
+                                    'mtime': stat.st_mtime,
+                                    'chunk': chunk}
+
+    def _id(self, kind: str, value: str) -> int:
+        """Returns the number of a string, adding it if it is new."""
+        ids = self._ids[kind]
+
+        if value not in ids:
+            ids[value] = len(self.strings[kind])
+            self.strings[kind].append(value)
+
+        return ids[value]
+
+    def _save_manifest(self) -> None:
+        """Atomically writes the manifest and string lists."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        temp = self.path / 'manifest.json.tmp'
+
+        with open(temp, 'w') as file:
+            json.dump({'files': self.manifest, 'strings': self.strings},
+                      file)
+
+        os.replace(temp, self.path / 'manifest.json')
+
+    def chunk_column(self, chunk: str, name: str) -> np.ndarray:
+        """Returns one column of one chunk, memory mapped."""
+        key = (chunk, name)
+
+        if key not in self._arrays:
+            self._arrays[key] = np.load(self.path / chunk / f'{name}.npy',
+                                        mmap_mode='r')
+
+        return self._arrays[key]
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns one column across every chunk, in ingest order."""
+        arrays = [self.chunk_column(chunk, name) for chunk in self.chunks]
+
+        if not arrays:
+            return np.empty(0, dtype=_DTYPES[name])
+
+        return np.concatenate(arrays)
+
+    def offsets(self, chunk: str, count: str) -> np.ndarray:
+        """Returns where each hand's rows start in the flat columns of a
+        count column such as 'action_count', with the total at the end.
+        They are kept, so decoding many hands of a chunk sums them once."""
+        key = (chunk, count, 'offsets')
+
+        if key not in self._arrays:
+            counts = self.chunk_column(chunk, count)
+            offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            self._arrays[key] = offsets
+
+        return self._arrays[key]
+
+    def read_hand(self, chunk: str, row: int) -> ParsedHand:
+        """Decodes one stored hand back into a ParsedHand."""
+        column = lambda name: self.chunk_column(chunk, name)
+        players = self.strings['players']
+        hand = ParsedHand(
+            int(column('hand_id')[row]),
+            self.strings['games'][column('game')[row]],
+            float(column('stakes')[row]),
+            None if np.isnan(column('ante')[row])
+            else float(column('ante')[row]),
+            column('timestamp')[row].astype(object))
+        hand.table = self.strings['tables'][column('table')[row]]
+        hand.dealer = int(column('dealer')[row])
+        hand.total_pot = float(column('total_pot')[row])
+        hand.rake = float(column('rake')[row])
+        hand.board = [int(card) for card in column('board')[row]
+                      if card >= 0]
+
+        start, end = self.offsets(chunk, 'seat_count')[row:row + 2]
+        hand.seats = [(int(seat), players[player], float(stack))
+                      for seat, player, stack in
+                      zip(column('seat_number')[start:end],
+                          column('seat_player')[start:end],
+                          column('seat_stack')[start:end])]
+
+        start, end = self.offsets(chunk, 'action_count')[row:row + 2]
+        for i in range(start, end):
+            amount = float(column('action_amount')[i])
+            total = float(column('action_total')[i])
+            action = Action(players[column('action_player')[i]],
+                            ACTION_KINDS[column('action_kind')[i]],
+                            None if np.isnan(amount) else amount,
+                            None if np.isnan(total) else total)
+            street = ACTION_STREETS[column('action_street')[i]]
+
+            if street == 'POSTS':
+                hand.posts.append(action)
+
+            else:
+                hand.actions[street].append(action)
+
+        start, end = self.offsets(chunk, 'show_count')[row:row + 2]
+        hand.shows = {players[player]: [int(card) for card in cards]
+                      for player, cards in
+                      zip(column('show_player')[start:end],
+                          column('show_cards')[start:end])}
+
+        start, end = self.offsets(chunk, 'collect_count')[row:row + 2]
+        hand.collected = {players[player]: float(amount)
+                          for player, amount in
+                          zip(column('collect_player')[start:end],
+                              column('collect_amount')[start:end])}
+
+        return hand
+
+    def hands(self) -> Iterator[ParsedHand]:
+        """Lazily decodes every stored hand, in ingest order."""
+        for chunk in self.chunks:
+            for row in range(len(self.chunk_column(chunk, 'hand_id'))):
+                yield self.read_hand(chunk, row)
+
+def main():
+    """Main function that ingests new hand history files into the store."""
+    store = HandStore()
+    count = store.ingest()
+    print(f'Ingested {count} files, {len(store.column("hand_id"))} hands')
+
+if __name__ == '__main__':
+    main()
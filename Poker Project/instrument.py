@@ -0,0 +1,369 @@
+from contextlib import contextmanager
+from datetime import datetime
+from evaluator import int_to_card
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Optional
+import argparse
+import cProfile
+import importlib
+import inspect
+import json
+import solo_probability
+import sys
+import total_probability
+
+# Modules of the equity pipeline whose functions are instrumented. Their
+# references to instrumented functions (e.g. from evaluator import
+# evaluate) are replaced too.
+MODULES = ['evaluator', 'batch_evaluator', 'equity_cache', 'poker_basics',
+           'solo_probability', 'total_probability', 'multiway',
+           'monte_carlo', 'preflop', 'ranges', 'outs']
+
+# Functions whose calls are counted, as (module, attribute, count name).
+COUNTED = [
+    ('evaluator', 'evaluate', 'evaluate'),
+    ('evaluator', 'evaluate_partial', 'evaluate_partial'),
+    ('evaluator', 'partial_hand', 'partial_hand'),
+    ('poker_basics', 'Hand.__init__', 'hand'),
+    ('poker_basics', 'hand_hierarchy', 'hand_hierarchy'),
+    ('total_probability', 'best_hands', 'best_hands'),
+]
+
+# Functions whose calls are timed, as (module, attribute, board argument
+# position, board argument name). Times of functions with a board are kept
+# per street. Times include the time of the timed functions they call.
+TIMED = [
+    ('solo_probability', 'wins_ties', 1, 'board'),
+    ('solo_probability', 'runout_wins_ties', 1, 'board'),
+    ('solo_probability', 'post_flop', 1, 'current_board'),
+    ('solo_probability', 'post_turn', 1, 'current_board'),
+    ('solo_probability', 'post_river', 1, 'board'),
+    ('solo_probability', 'SoloSession.__init__', 2, 'board'),
+    ('solo_probability', 'SoloSession.deal', None, None),
+    ('solo_probability', 'SoloSession.wins_ties', None, None),
+    ('total_probability', 'count_winners', 0, 'board'),
+    ('total_probability', 'parallel_count_winners', 1, 'board'),
+    ('total_probability', 'equities', 1, 'board'),
+    ('total_probability', 'batch_equities', None, None),
+    ('total_probability', 'EquitySession.__init__', 2, 'board'),
+    ('total_probability', 'EquitySession.deal', None, None),
+    ('total_probability', 'EquitySession.equities', None, None),
+    ('multiway', 'exact_multiway', 1, 'board'),
+    ('multiway', 'sample_multiway', 1, 'board'),
+    ('monte_carlo', 'sample_equity', 1, 'board'),
+    ('monte_carlo', 'sample_players', 1, 'board'),
+    ('preflop', 'preflop_equity', None, None),
+    ('ranges', 'range_vs_range', 2, 'board'),
+    ('outs', 'outs', 1, 'board'),
+]
+
+STREET_NAMES = {0: 'preflop', 3: 'flop', 4: 'turn', 5: 'river'}
+
+# Longest list argument recorded in full for a slowest call.
+MAX_LISTED = 10
+
+class Metrics:
+    """Represents the counts and times gathered while instrumentation is
+    on.
+
+    Attributes:
+        counts: Dict of name to number of calls, or for evaluate_batch the
+            number of hands, and cache_hits and cache_misses.
+        timers: Dict of name (with the street, e.g. wins_ties.flop) to a
+            dict of calls, total seconds, the longest call in seconds and
+            the arguments of that call by name (long lists such as the
+            deck by their length).
+    """
+    def __init__(self):
+        self.counts = {}
+        self.timers = {}
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Adds to a count."""
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def time(self, name: str, seconds: float,
+             describe: Callable[[], dict]) -> None:
+        """Adds one timed call. describe returns the call's arguments, and
+        is only called for the slowest call so far."""
+        timer = self.timers.get(name)
+
+        if timer is None:
+            timer = self.timers[name] = {'calls': 0, 'seconds': 0.0,
+                                         'max_seconds': 0.0, 'slowest': ''}
+
+        timer['calls'] += 1
+        timer['seconds'] += seconds
+
+        # The arguments of the slowest call point at pathological spots.
+        if seconds > timer['max_seconds']:
+            timer['max_seconds'] = seconds
+            timer['slowest'] = describe()
+
+    def to_json(self) -> dict:
+        """Returns the metrics as a JSON friendly dict."""
+        return {'counts': dict(self.counts),
+                'timers': {name: dict(timer)
+                           for name, timer in self.timers.items()}}
+
+_metrics = Metrics()
+_replaced = []
+
+def _resolve(module: str, attribute: str) -> tuple:
+    """Returns the object holding an attribute such as 'Hand.__init__',
+    the last part of its name and its value."""
+    owner = importlib.import_module(module)
+    *path, name = attribute.split('.')
+
+    for part in path:
+        owner = getattr(owner, part)
+
+    return owner, name, getattr(owner, name)
+
+def _replace(module: str, attribute: str, wrapper: Callable) -> None:
+    """Puts a wrapper in place of a function, in its module or class and in
+    every module of MODULES that imported it by name."""
+    owner, name, original = _resolve(module, attribute)
+    targets = [(owner, name)]
+
+    for other in MODULES:
+        loaded = sys.modules.get(other)
+
+        for key, value in vars(loaded).items():
+            if value is original and (loaded, key) != (owner, name):
+                targets.append((loaded, key))
+
+    for target, key in targets:
+        _replaced.append((target, key, original))
+        setattr(target, key, wrapper)
+
+def _counted(function: Callable, name: str) -> Callable:
+    """Wraps a function to count its calls."""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        _metrics.count(name)
+
+        return function(*args, **kwargs)
+
+    return wrapper
+
+def _arguments(signature: inspect.Signature, args: tuple,
+               kwargs: dict) -> dict:
+    """Returns the arguments of a call by name, JSON friendly.
+
+    Lists longer than MAX_LISTED, such as the deck, are given by their
+    length, so the board and hands that identify the spot are kept whole.
+    """
+    try:
+        arguments = signature.bind(*args, **kwargs).arguments
+
+    except TypeError:
+        arguments = {**{str(i): arg for i, arg in enumerate(args)}, **kwargs}
+
+    described = {}
+
+    for key, value in arguments.items():
+        if key == 'self':
+            continue
+
+        if isinstance(value, (list, tuple)) and len(value) > MAX_LISTED:
+            described[f'{key}_length'] = len(value)
+
+        elif isinstance(value, (bool, int, float, str, type(None))):
+            described[key] = value
+
+        elif (isinstance(value, (list, tuple)) and
+              all(type(item) is int for item in value)):
+            described[key] = list(value)
+
+        else:
+            described[key] = repr(value)[:200]
+
+    return described
+
+def _timed(function: Callable, name: str, board_index: Optional[int],
+           board_name: Optional[str]) -> Callable:
+    """Wraps a function to time its calls, per street if it has a board."""
+    signature = inspect.signature(function)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if board_name in kwargs:
+            board = kwargs[board_name]
+
+        elif board_index is not None and len(args) > board_index:
+            board = args[board_index]
+
+        else:
+            board = None
+
+        key = name if board is None else (
+            f'{name}.{STREET_NAMES.get(len(board), len(board))}')
+        start = perf_counter()
+
+        try:
+            return function(*args, **kwargs)
+
+        finally:
+            _metrics.time(key, perf_counter() - start,
+                          lambda: _arguments(signature, args, kwargs))
+
+    return wrapper
+
+def _batch_counted(function: Callable) -> Callable:
+    """Wraps evaluate_batch to count the hands it scores."""
+    @wraps(function)
+    def wrapper(cards, *args, **kwargs):
+        _metrics.count('evaluate_batch', len(cards))
+
+        return function(cards, *args, **kwargs)
+
+    return wrapper
+
+def _cache_counted(function: Callable) -> Callable:
+    """Wraps EquityCache.get to count hits and misses of every cache."""
+    @wraps(function)
+    def wrapper(self, key: str):
+        value = function(self, key)
+        _metrics.count('cache_misses' if value is None else 'cache_hits')
+
+        return value
+
+    return wrapper
+
+def _combinations_counted(function: Callable) -> Callable:
+    """Wraps itertools.combinations to count the generators made."""
+    def wrapper(iterable, r):
+        _metrics.count('combinations')
+
+        return function(iterable, r)
+
+    return wrapper
+
+def enabled() -> bool:
+    """True if instrumentation is on."""
+    return bool(_replaced)
+
+def enable() -> None:
+    """Turns instrumentation on.
+
+    The counted and timed functions are replaced by wrappers, so while it
+    is off the pipeline runs the original functions and pays nothing.
+    Counts cover this process only, so use workers=1 to see everything.
+    """
+    if enabled():
+        return
+
+    for module in MODULES:
+        importlib.import_module(module)
+
+    for module, attribute, name in COUNTED:
+        _replace(module, attribute,
+                 _counted(_resolve(module, attribute)[2], name))
+
+    for module, attribute, board_index, board_name in TIMED:
+        _replace(module, attribute,
+                 _timed(_resolve(module, attribute)[2],
+                        attribute.replace('.__init__', ''), board_index,
+                        board_name))
+
+    _replace('batch_evaluator', 'evaluate_batch',
+             _batch_counted(_resolve('batch_evaluator', 'evaluate_batch')[2]))
+    _replace('equity_cache', 'EquityCache.get',
+             _cache_counted(_resolve('equity_cache', 'EquityCache.get')[2]))
+
+    combinations = _combinations_counted(
+        _resolve('itertools', 'combinations')[2])
+
+    for module in MODULES:
+        loaded = sys.modules[module]
+
+        if 'combinations' in vars(loaded):
+            _replaced.append((loaded, 'combinations', loaded.combinations))
+            loaded.combinations = combinations
+
+def disable() -> None:
+    """Turns instrumentation off, restoring the original functions."""
+    while _replaced:
+        target, key, original = _replaced.pop()
+        setattr(target, key, original)
+
+def metrics() -> dict:
+    """Returns the metrics gathered so far as a JSON friendly dict."""
+    return _metrics.to_json()
+
+def reset() -> None:
+    """Clears the metrics gathered so far."""
+    global _metrics
+
+    _metrics = Metrics()
+
+def write_metrics(path: Path, **labels) -> None:
+    """Appends the metrics to a JSON lines file, with the time and any
+    labels given (e.g. spot='AKs on Q72')."""
+    record = {'time': datetime.now().isoformat(), **labels, **metrics()}
+
+    with open(path, 'a') as file:
+        file.write(json.dumps(record) + '\n')
+
+@contextmanager
+def instrumented(profile: Optional[Path] = None):
+    """Turns instrumentation on for a block, with fresh metrics.
+
+    With profile, the block also runs under cProfile and its stats are
+    dumped to that path, for pstats, snakeviz, gprof2dot or flameprof.
+    Yields the Metrics of the block.
+    """
+    reset()
+    enable()
+    profiler = None
+
+    if profile is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        yield _metrics
+
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+
+        disable()
+
+def main():
+    """Main function that instruments the benchmark spots and prints the
+    metrics."""
+    parser = argparse.ArgumentParser(
+        description='Instrument the equity pipeline on fixed spots.')
+    parser.add_argument('--profile', type=Path, default=None,
+                        help='dump cProfile stats to this file')
+    parser.add_argument('--output', type=Path, default=None,
+                        help='append the metrics to this JSON lines file')
+    args = parser.parse_args()
+
+    # The demo spots are imported here, so that importing the hooks does
+    # not import the benchmarks and the hand history parser.
+    from benchmark import MULTIWAY_SPOT, SOLO_SPOT
+
+    player, board = SOLO_SPOT
+    deck = [card for card in range(52) if card not in player + board]
+
+    # The functions are looked up on their modules, so the instrumented
+    # versions are called.
+    with instrumented(args.profile):
+        solo_probability.post_flop([int_to_card(card) for card in deck],
+                                   [int_to_card(card) for card in board],
+                                   [int_to_card(card) for card in player], 2)
+        total_probability.equities(*MULTIWAY_SPOT, workers=1)
+
+    if args.output is not None:
+        write_metrics(args.output)
+
+    print(json.dumps(metrics(), indent=2))
+
+if __name__ == '__main__':
+    main()
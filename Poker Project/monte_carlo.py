@@ -0,0 +1,189 @@
+from evaluator import evaluate_partial, partial_hand
+from math import sqrt
+from statistics import NormalDist
+from typing import Callable, Optional
+import random
+import time
+
+BATCH_SIZE = 256
+
+# Sample budget when neither a time budget nor a target error is given.
+DEFAULT_SAMPLES = 10000
+
+class Estimate:
+    """Represents a sampled equity.
+
+    Attributes:
+        equity: Estimated equity as a percent.
+        std_error: Standard error of the equity as a percent.
+        low: Lower end of the confidence interval as a percent.
+        high: Upper end of the confidence interval as a percent.
+        samples: Number of trials the estimate is based on.
+    """
+    def __init__(
+            self,
+            equity: float,
+            std_error: float,
+            low: float,
+            high: float,
+            samples: int):
+        self.equity = equity
+        self.std_error = std_error
+        self.low = low
+        self.high = high
+        self.samples = samples
+
+    def __repr__(self):
+        return '%.3f%% (%.3f%% - %.3f%%, %d samples)' % (
+            self.equity, self.low, self.high, self.samples)
+
+def sample(
+        trial: Callable[[], list],
+        outcomes: int,
+        samples: Optional[int] = None,
+        seconds: Optional[float] = None,
+        target_error: Optional[float] = None,
+        confidence: float = 0.95) -> list[Estimate]:
+    """Runs trials until the sample or time budget is spent.
+
+    Each trial returns a list with each outcome's share of the pot. Trials
+    run in batches, and sampling stops early once every outcome's standard
+    error (as a percent) is at most target_error. Without samples, the
+    sample budget is DEFAULT_SAMPLES if there is no other budget and
+    unbounded otherwise.
+
+    Returns an Estimate for each outcome.
+    Raises ValueError if samples is less than 1.
+    """
+    if samples is None and seconds is None and target_error is None:
+        samples = DEFAULT_SAMPLES
+
+    if samples is not None and samples < 1:
+        raise ValueError('samples must be at least 1')
+
+    totals = [0.0] * outcomes
+    squares = [0.0] * outcomes
+    count = 0
+    deadline = None if seconds is None else time.perf_counter() + seconds
+
+    while samples is None or count < samples:
+        batch = BATCH_SIZE if samples is None else min(BATCH_SIZE,
+                                                       samples - count)
+
+        for _ in range(batch):
+            for i, share in enumerate(trial()):
+                totals[i] += share
+                squares[i] += share * share
+            count += 1
+
+            # Reading the clock is cheap next to a trial, so a time budget
+            # is kept to within one trial rather than one batch.
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+        if target_error is not None and max(
+                _std_error(totals[i], squares[i], count)
+                for i in range(outcomes)) * 100 <= target_error:
+            break
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    estimates = []
+
+    for i in range(outcomes):
+        mean = totals[i] / count
+        error = _std_error(totals[i], squares[i], count)
+        estimates.append(Estimate(mean * 100, error * 100,
+                                  max(mean - z * error, 0) * 100,
+                                  min(mean + z * error, 1) * 100, count))
+
+    return estimates
+
+def _std_error(total: float, square: float, count: int) -> float:
+    """Returns the standard error of a mean from its running sums."""
+    if count < 2:
+        return float('inf')
+
+    mean = total / count
+    variance = max(square / count - mean * mean, 0) * count / (count - 1)
+
+    return sqrt(variance / count)
+
+def sample_equity(
+        deck: list[int],
+        board: list[int],
+        player: list[int],
+        num_opponents: int,
+        samples: Optional[int] = None,
+        seconds: Optional[float] = None,
+        target_error: Optional[float] = None,
+        seed: Optional[int] = None,
+        confidence: float = 0.95) -> Estimate:
+    """Estimates the player's equity against unknown opponent hands.
+
+    Each trial deals the rest of the board and num_opponents hands from the
+    deck. The player gets the whole pot for a win and an equal share of it
+    for a tie. Works from preflop (empty board) to the river.
+
+    Returns the player's Estimate.
+    """
+    rng = random.Random(seed)
+    needed = 5 - len(board)
+    player_state = partial_hand(board + player)
+    draw = needed + 2 * num_opponents
+
+    def trial() -> list:
+        cards = rng.sample(deck, draw)
+        runout = cards[:needed]
+        state = partial_hand(board + runout)
+        player_rank = evaluate_partial(player_state, runout)
+        ties = 1
+
+        for i in range(needed, draw, 2):
+            opponent_rank = evaluate_partial(state, cards[i:i + 2])
+
+            if opponent_rank > player_rank:
+                return [0.0]
+
+            if opponent_rank == player_rank:
+                ties += 1
+
+        return [1 / ties]
+
+    return sample(trial, 1, samples, seconds, target_error, confidence)[0]
+
+def sample_players(
+        deck: list[int],
+        board: list[int],
+        player_cards: dict,
+        samples: Optional[int] = None,
+        seconds: Optional[float] = None,
+        target_error: Optional[float] = None,
+        seed: Optional[int] = None,
+        confidence: float = 0.95) -> dict:
+    """Estimates each known player's equity over sampled runouts.
+
+    Each trial deals the rest of the board from the deck. The pot goes to
+    the best hand and is split equally between tied hands.
+
+    Returns a dict of player number to Estimate.
+    """
+    rng = random.Random(seed)
+    needed = 5 - len(board)
+    players = list(player_cards)
+    states = [partial_hand(board + player_cards[key]) for key in players]
+
+    def trial() -> list:
+        runout = rng.sample(deck, needed)
+        ranks = [evaluate_partial(state, runout) for state in states]
+        best = max(ranks)
+        share = 1 / ranks.count(best)
+
+        return [share if rank == best else 0.0 for rank in ranks]
+
+    estimates = sample(trial, len(players), samples, seconds, target_error,
+                       confidence)
+
+    return dict(zip(players, estimates))
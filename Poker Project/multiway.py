@@ -0,0 +1,214 @@
+from evaluator import evaluate_partial, partial_hand
+from itertools import combinations
+from math import comb, prod
+from monte_carlo import sample
+from typing import Optional
+import random
+
+EXACT_LIMIT = 1000000
+
+class Result:
+    """Represents the player's outcomes against several opponents.
+
+    Attributes:
+        win: Percent of deals the player wins outright.
+        tie: Percent of deals the player ties for the best hand.
+        loss: Percent of deals the player loses.
+        tie_share: Percent of the pot the player wins through ties.
+        equity: Percent of the pot the player wins (win + tie_share).
+        deals: Number of deals enumerated or sampled.
+        exact: True if every deal was enumerated, False if sampled.
+        std_error: Standard error of the equity as a percent (0 if exact).
+    """
+    def __init__(
+            self,
+            win: float,
+            tie: float,
+            tie_share: float,
+            deals: int,
+            exact: bool,
+            std_error: float = 0.0):
+        self.win = win
+        self.tie = tie
+        self.loss = 100 - win - tie
+        self.tie_share = tie_share
+        self.equity = win + tie_share
+        self.deals = deals
+        self.exact = exact
+        self.std_error = std_error
+
+    def __repr__(self):
+        return 'win %.3f%%, tie %.3f%% (share %.3f%%), loss %.3f%%' % (
+            self.win, self.tie, self.tie_share, self.loss)
+
+def num_deals(deck_size: int, needed: int, num_opponents: int) -> int:
+    """Returns the number of distinct runouts and opponent hand deals."""
+    unseen = 2 * num_opponents
+
+    return (comb(deck_size, needed) * comb(deck_size - needed, unseen) *
+            prod(range(1, unseen, 2)))
+
+def _pairings(cards: tuple):
+    """Yields every way of splitting the cards into unordered pairs."""
+    if not cards:
+        yield ()
+        return
+
+    first = cards[0]
+
+    for i in range(1, len(cards)):
+        rest = cards[1:i] + cards[i + 1:]
+
+        for pairs in _pairings(rest):
+            yield ((first, cards[i]),) + pairs
+
+def exact_multiway(
+        deck: list[int],
+        board: list[int],
+        player: list[int],
+        num_opponents: int) -> Result:
+    """Enumerates every runout and every deal of the opponents' hands.
+
+    Each opponent hand is scored once per runout and shared by every deal
+    that contains it.
+
+    Returns the player's Result.
+    """
+    needed = 5 - len(board)
+    player_state = partial_hand(board + player)
+    pairings = list(_pairings(tuple(range(2 * num_opponents))))
+    wins = 0
+    ties = 0
+    tie_share = 0.0
+    deals = 0
+
+    for runout in combinations(deck, needed):
+        board_state = partial_hand(board + list(runout))
+        player_rank = evaluate_partial(player_state, runout)
+        live = [card for card in deck if card not in runout]
+        beats = {}
+
+        # 1 if the opponent hand loses, 0 if it ties and None if it wins
+        for pair in combinations(live, 2):
+            opponent_rank = evaluate_partial(board_state, pair)
+
+            if opponent_rank < player_rank:
+                beats[pair] = 1
+            elif opponent_rank == player_rank:
+                beats[pair] = 0
+            else:
+                beats[pair] = None
+
+        for unseen in combinations(live, 2 * num_opponents):
+            for pairing in pairings:
+                deals += 1
+                tied = 0
+
+                for i, j in pairing:
+                    beat = beats[(unseen[i], unseen[j])]
+
+                    if beat is None:
+                        break
+
+                    if beat == 0:
+                        tied += 1
+
+                else:
+                    if tied:
+                        ties += 1
+                        tie_share += 1 / (tied + 1)
+
+                    else:
+                        wins += 1
+
+    return Result(wins / deals * 100, ties / deals * 100,
+                  tie_share / deals * 100, deals, True)
+
+def sample_multiway(
+        deck: list[int],
+        board: list[int],
+        player: list[int],
+        num_opponents: int,
+        samples: Optional[int] = None,
+        seconds: Optional[float] = None,
+        target_error: Optional[float] = None,
+        seed: Optional[int] = None,
+        deals_per_runout: int = 8) -> Result:
+    """Samples runouts and deals of the opponents' hands.
+
+    Trials are batched by runout: the board and the player's hand are
+    scored once per sampled runout, then deals_per_runout deals of the
+    opponents' hands are drawn from the cards that are left. An opponent
+    who beats the player ends the deal without scoring the others. Deals
+    that share a runout are correlated, so the standard error is slightly
+    optimistic when deals_per_runout is above 1.
+
+    Returns the player's Result.
+    """
+    rng = random.Random(seed)
+    needed = 5 - len(board)
+    player_state = partial_hand(board + player)
+    unseen = 2 * num_opponents
+    batch = []
+
+    def trial() -> list:
+        if not batch:
+            runout = rng.sample(deck, needed)
+            board_state = partial_hand(board + runout)
+            player_rank = evaluate_partial(player_state, runout)
+            live = [card for card in deck if card not in runout]
+
+            for _ in range(deals_per_runout):
+                batch.append(_deal(rng.sample(live, unseen), board_state,
+                                   player_rank))
+
+        return batch.pop()
+
+    win, tie, equity = sample(trial, 3, samples, seconds, target_error)
+
+    return Result(win.equity, tie.equity, equity.equity - win.equity,
+                  win.samples, False, equity.std_error)
+
+def _deal(cards: list, board_state: tuple, player_rank: int) -> list:
+    """Scores one deal of opponent hands against the player.
+
+    Returns the player's win, tie and share of the pot.
+    """
+    tied = 0
+
+    for i in range(0, len(cards), 2):
+        opponent_rank = evaluate_partial(board_state, cards[i:i + 2])
+
+        if opponent_rank > player_rank:
+            return [0, 0, 0.0]
+
+        if opponent_rank == player_rank:
+            tied += 1
+
+    if tied:
+        return [0, 1, 1 / (tied + 1)]
+
+    return [1, 0, 1.0]
+
+def multiway_equity(
+        deck: list[int],
+        board: list[int],
+        player: list[int],
+        num_opponents: int,
+        exact_limit: int = EXACT_LIMIT,
+        samples: Optional[int] = None,
+        seconds: Optional[float] = None,
+        target_error: Optional[float] = None,
+        seed: Optional[int] = None) -> Result:
+    """Computes the player's equity against num_opponents unknown hands.
+
+    Enumerates every deal if there are at most exact_limit of them and
+    samples otherwise.
+
+    Returns the player's Result.
+    """
+    if num_deals(len(deck), 5 - len(board), num_opponents) <= exact_limit:
+        return exact_multiway(deck, board, player, num_opponents)
+
+    return sample_multiway(deck, board, player, num_opponents, samples,
+                           seconds, target_error, seed)
@@ -0,0 +1,316 @@
+from batch_evaluator import batch_tables, evaluate_batch
+from evaluator import _rank_multisets, evaluate
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement
+from math import comb
+from pathlib import Path
+from typing import Callable, Optional
+import argparse
+import mmap
+import numpy as np
+import struct
+
+ORACLE_PATH = Path(__file__).with_name('five_card_oracle.bin')
+NUM_HANDS = 2598960
+NUM_CLASSES = 7462
+CATEGORIES = ['High Card', 'One Pair', 'Two Pair', 'Three of a Kind',
+              'Straight', 'Flush', 'Full House', 'Four of a Kind',
+              'Straight Flush']
+
+# Header: magic, version, number of hands, number of classes. Then the
+# class (0 worst - 7461 best) of every 5 card hand as uint16, indexed by
+# the hand's colex rank among the 2,598,960 hands.
+_HEADER = struct.Struct('<4sHxxII')
+_MAGIC = b'FCRK'
+_VERSION = 1
+
+# _BINOMIALS[k][n] is comb(n, k + 1), the colex weight of the card n in
+# position k of a sorted hand.
+_BINOMIALS = [[comb(n, k + 1) for n in range(52)] for k in range(5)]
+
+def hand_index(cards: list[int]) -> int:
+    """Returns the colex rank (0-2598959) of 5 distinct card codes."""
+    first, second, third, fourth, fifth = sorted(cards)
+
+    return (_BINOMIALS[0][first] + _BINOMIALS[1][second] +
+            _BINOMIALS[2][third] + _BINOMIALS[3][fourth] +
+            _BINOMIALS[4][fifth])
+
+def class_key(ranks: tuple, flush: bool) -> tuple:
+    """Returns the standard poker ordering key of a 5 card hand.
+
+    ranks are the card ranks (0 for 2 - 12 for A). Keys compare like the
+    hands: the category first, then the ranks that break ties, grouped by
+    how many cards share them. A-2-3-4-5 is the lowest straight.
+    """
+    groups = sorted(((ranks.count(rank), rank) for rank in set(ranks)),
+                    reverse=True)
+    counts = [count for count, _ in groups]
+    order = tuple(rank for _, rank in groups)
+    straight = None
+
+    if len(groups) == 5:
+        if order[0] - order[4] == 4:
+            straight = order[0]
+
+        elif order == (12, 3, 2, 1, 0):
+            straight = 3
+
+    if straight is not None:
+        return (8 if flush else 4, (straight,))
+
+    if flush:
+        return (5, order)
+
+    category = {(4, 1): 7, (3, 2): 6, (3, 1, 1): 3, (2, 2, 1): 2,
+                (2, 1, 1, 1): 1, (1, 1, 1, 1, 1): 0}[tuple(counts)]
+
+    return (category, order)
+
+def _class_tables() -> tuple:
+    """Ranks every distinct 5 card hand in the standard poker order.
+
+    Returns dicts of rank key (sum of 1 << 3 * rank) to class for hands
+    that are not flushes, and of rank mask to class for flushes.
+    """
+    keys = {}
+
+    for ranks in combinations_with_replacement(range(13), 5):
+        if all(ranks.count(rank) <= 4 for rank in ranks):
+            keys[('rank', sum(1 << (3 * rank) for rank in ranks))] = \
+                class_key(ranks, False)
+
+    for ranks in combinations(range(13), 5):
+        keys[('flush', sum(1 << rank for rank in ranks))] = \
+            class_key(ranks, True)
+
+    classes = {key: i for i, key in enumerate(sorted(set(keys.values())))}
+
+    if len(classes) != NUM_CLASSES:
+        raise AssertionError(f'found {len(classes)} classes, not '
+                             f'{NUM_CLASSES}')
+
+    rank_classes = {}
+    flush_classes = {}
+
+    for (kind, key), value in keys.items():
+        table = rank_classes if kind == 'rank' else flush_classes
+        table[key] = classes[value]
+
+    return rank_classes, flush_classes
+
+@lru_cache(maxsize=1)
+def standard_tables() -> tuple:
+    """Builds evaluate_batch tables that rank 5 to 7 cards by the oracle's
+    classes, the standard poker order, instead of hand_hierarchy's.
+
+    6 and 7 card hands take the best of the hands with one card fewer, as
+    in evaluator.py, so no oracle file is needed.
+
+    Returns the tables, to pass to evaluate_batch.
+    """
+    rank_table, flush_classes = _class_tables()
+    flush_table = [0] * (1 << 13)
+
+    for mask, value in flush_classes.items():
+        flush_table[mask] = value
+
+    for size in (6, 7):
+        for ranks in _rank_multisets(size):
+            key = sum(1 << (3 * rank) for rank in ranks)
+            rank_table[key] = max(rank_table[key - (1 << (3 * rank))]
+                                  for rank in set(ranks))
+
+        for ranks in combinations(range(13), size):
+            mask = sum(1 << rank for rank in ranks)
+            flush_table[mask] = max(flush_table[mask ^ (1 << rank)]
+                                    for rank in ranks)
+
+    return batch_tables(rank_table, flush_table)
+
+def standard_rank(cards: list[int]) -> int:
+    """Returns the class (0 worst - 7461 best) of the best 5 card hand of
+    5 to 7 card codes, in the standard poker order."""
+    return int(evaluate_batch(np.array([cards]), standard_tables())[0])
+
+def all_hands() -> np.ndarray:
+    """Returns every 5 card hand as a (2598960, 5) array of sorted card
+    codes, in colex order, so row i is the hand whose hand_index is i."""
+    hands = np.empty((NUM_HANDS, 5), dtype=np.int8)
+    row = 0
+
+    # In colex order the highest card changes slowest.
+    for fifth in range(4, 52):
+        lower = np.array(list(combinations(range(fifth), 4)), dtype=np.int8)
+        lower = lower[np.lexsort(lower.T)]
+        hands[row:row + len(lower), :4] = lower
+        hands[row:row + len(lower), 4] = fifth
+        row += len(lower)
+
+    return hands
+
+def build() -> None:
+    """Ranks all 2,598,960 hands and writes the oracle table."""
+    rank_classes, flush_classes = _class_tables()
+    hands = all_hands().astype(np.int64)
+    ranks = hands >> 2
+    rank_keys = np.left_shift(1, 3 * ranks).sum(axis=1)
+    flush = (hands & 3 == (hands[:, :1] & 3)).all(axis=1)
+    table = np.empty(NUM_HANDS, dtype=np.uint16)
+
+    keys, inverse = np.unique(rank_keys[~flush], return_inverse=True)
+    table[~flush] = np.array([rank_classes[key] for key in keys.tolist()],
+                             dtype=np.uint16)[inverse]
+
+    masks = np.left_shift(1, ranks[flush]).sum(axis=1)
+    keys, inverse = np.unique(masks, return_inverse=True)
+    table[flush] = np.array([flush_classes[key] for key in keys.tolist()],
+                            dtype=np.uint16)[inverse]
+
+    with open(ORACLE_PATH, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, NUM_HANDS, NUM_CLASSES))
+        file.write(table.tobytes())
+
+def _load() -> Optional[np.ndarray]:
+    """Memory maps the oracle table if it has been built."""
+    if not ORACLE_PATH.exists():
+        return None
+
+    with open(ORACLE_PATH, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, hands, classes = _HEADER.unpack_from(data)
+
+    if (magic != _MAGIC or version != _VERSION or hands != NUM_HANDS or
+            classes != NUM_CLASSES):
+        raise ValueError(f'{ORACLE_PATH} is not an oracle table for this '
+                         f'version, rebuild it with oracle.py')
+
+    return np.frombuffer(data, dtype=np.uint16, offset=_HEADER.size)
+
+_TABLE = _load()
+
+def _table() -> np.ndarray:
+    """Returns the oracle table, or explains how to build it."""
+    if _TABLE is None:
+        raise FileNotFoundError(f'{ORACLE_PATH} has not been built, run '
+                                f'oracle.py --build to build it')
+
+    return _TABLE
+
+def hand_class(cards: list[int]) -> int:
+    """Returns the class (0 worst - 7461 best) of 5 card codes, with one
+    array index."""
+    return int(_table()[hand_index(cards)])
+
+def hand_classes(cards: np.ndarray) -> np.ndarray:
+    """Returns the classes of an (N, 5) array of card codes."""
+    cards = np.sort(np.asarray(cards, dtype=np.intp), axis=1)
+    binomials = np.array(_BINOMIALS, dtype=np.int64)
+    index = sum(binomials[k][cards[:, k]] for k in range(5))
+
+    return _table()[index]
+
+def class_category(hand_class: int) -> str:
+    """Returns the category name of a class, e.g. 'Full House'."""
+    bounds = [1277, 4137, 4995, 5853, 5863, 7140, 7296, 7452, 7462]
+
+    for name, bound in zip(CATEGORIES, bounds):
+        if hand_class < bound:
+            return name
+
+class Report:
+    """Represents how an evaluator's ranks compare with the oracle.
+
+    Attributes:
+        hands: Number of hands checked.
+        split: Number of classes whose hands the evaluator gave different
+            ranks, though they are equal.
+        merged: Number of classes the evaluator ranks the same as the class
+            just below them, though they are better.
+        inverted: Number of classes the evaluator ranks below some worse
+            class.
+        examples: Some hands of each problem, as card code lists.
+    """
+    def __init__(self, hands: int, split: int, merged: int, inverted: int,
+                 examples: dict):
+        self.hands = hands
+        self.split = split
+        self.merged = merged
+        self.inverted = inverted
+        self.examples = examples
+
+    @property
+    def exact(self) -> bool:
+        """True if the evaluator orders every hand like the oracle."""
+        return not (self.split or self.merged or self.inverted)
+
+    def __repr__(self):
+        return 'Report(split=%r, merged=%r, inverted=%r)' % (
+            self.split, self.merged, self.inverted)
+
+def compare(ranks: np.ndarray) -> Report:
+    """Compares an evaluator's ranks of all_hands() with the oracle.
+
+    Only the order matters: ranks may use any numbers where higher is
+    better.
+    """
+    classes = _table()
+    ranks = np.asarray(ranks)
+    hands = all_hands()
+    low = np.full(NUM_CLASSES, np.iinfo(np.int64).max)
+    high = np.full(NUM_CLASSES, np.iinfo(np.int64).min)
+    np.minimum.at(low, classes, ranks)
+    np.maximum.at(high, classes, ranks)
+
+    split = np.flatnonzero(low != high)
+    merged = np.flatnonzero(low[1:] == high[:-1]) + 1
+    inverted = np.flatnonzero(low[1:] < np.maximum.accumulate(high)[:-1]) + 1
+
+    def example(class_list: np.ndarray) -> list:
+        rows = np.flatnonzero(np.isin(classes, class_list[:3]))[:3]
+
+        return hands[rows].tolist()
+
+    examples = {'split': example(split), 'merged': example(merged),
+                'inverted': example(inverted)}
+
+    return Report(NUM_HANDS, len(split), len(merged), len(inverted),
+                  examples)
+
+def verify(evaluator: Callable, batch: bool = False) -> Report:
+    """Scores every 5 card hand with an evaluator and compares the order
+    with the oracle.
+
+    evaluator takes a list of 5 card codes and returns a rank, or with
+    batch=True takes an (N, 5) array and returns an array of ranks.
+    """
+    hands = all_hands()
+
+    if batch:
+        ranks = evaluator(hands)
+
+    else:
+        ranks = np.fromiter((evaluator(hand) for hand in hands.tolist()),
+                            dtype=np.int64, count=NUM_HANDS)
+
+    return compare(ranks)
+
+def main():
+    """Main function that builds the oracle and checks the evaluators."""
+    global _TABLE
+
+    parser = argparse.ArgumentParser(description='Build or use the oracle.')
+    parser.add_argument('--build', action='store_true',
+                        help='rank all 2,598,960 hands and store the table')
+    args = parser.parse_args()
+
+    if args.build or _TABLE is None:
+        build()
+        _TABLE = _load()
+
+    print('evaluate:', verify(evaluate))
+    print('evaluate_batch:', verify(evaluate_batch, batch=True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+from batch_evaluator import evaluate_batch
+from equity_cache import EquityCache, canonical_permutation
+from evaluator import card_to_int, evaluate, rank_category
+from itertools import combinations
+from poker_basics import Card
+from ranges import (BATCH_ROWS, COMBO_MASKS, COMBOS, NUM_COMBOS, Range,
+                    combo_index, mask_of, range_weights)
+from typing import Optional, Sequence
+import hashlib
+import numpy as np
+
+# Equity (percent) above which the hero is the favorite.
+FAVORITE = 50.0
+
+class Outs:
+    """Represents what each card to come does to the hero's equity.
+
+    Attributes:
+        equity: Hero's equity now, as a percent.
+        cards: Dict of each possible next card to the hero's equity once
+            it is dealt.
+        runouts: Dict of each runout to the river (a sorted tuple of one or
+            two cards) to the hero's equity on it.
+        outs: Next cards that make the hero the favorite (above FAVORITE)
+            and raise their equity, best first.
+        runout_outs: Runouts that make the hero the favorite on the river
+            and raise their equity, best first.
+        improves: Next cards that improve the category of the hero's hand,
+            e.g. from One Pair to Two Pair.
+    """
+    def __init__(self, equity: float, cards: dict, runouts: dict,
+                 improves: list[int]):
+        self.equity = equity
+        self.cards = cards
+        self.runouts = runouts
+        self.outs = sorted((card for card, value in cards.items()
+                            if value > FAVORITE and value > equity),
+                           key=lambda card: -cards[card])
+        self.runout_outs = sorted((runout for runout, value in runouts.items()
+                                   if value > FAVORITE and value > equity),
+                                  key=lambda runout: -runouts[runout])
+        self.improves = improves
+
+    @property
+    def deltas(self) -> dict:
+        """Change of the hero's equity, in percent, for each next card."""
+        return {card: value - self.equity
+                for card, value in self.cards.items()}
+
+    @property
+    def out_probability(self) -> float:
+        """Percent chance the next card is one of the outs."""
+        return len(self.outs) / len(self.cards) * 100
+
+    @property
+    def runout_probability(self) -> float:
+        """Percent chance the runout to the river is one of runout_outs."""
+        return len(self.runout_outs) / len(self.runouts) * 100
+
+    def __repr__(self):
+        return 'Outs(equity=%.3f%%, outs=%d, runout_outs=%d of %d)' % (
+            self.equity, len(self.outs), len(self.runout_outs),
+            len(self.runouts))
+
+def _runout_counts(
+        player: list[int],
+        villain: np.ndarray,
+        board: list[int],
+        dead: list[int]) -> tuple:
+    """Scores the hero and every villain combo on every runout in one pass.
+
+    Returns the runouts and, per runout, the villain weight the hero
+    beats, ties and faces.
+    """
+    known = mask_of(board + player + list(dead))
+    live = ((COMBO_MASKS & known) == 0) & (villain > 0)
+    combos = np.flatnonzero(live)
+    cards = COMBOS[combos]
+    masks = COMBO_MASKS[combos]
+    weights = villain[combos]
+
+    deck = [card for card in range(52) if not int(known) >> card & 1]
+    needed = 5 - len(board)
+    runouts = np.array(list(combinations(deck, needed)), dtype=np.int8)
+    runouts = runouts.reshape(-1, needed)
+    win = np.zeros(len(runouts))
+    tie = np.zeros(len(runouts))
+    total = np.zeros(len(runouts))
+    per_batch = max(1, BATCH_ROWS // max(len(combos), 1))
+
+    for start in range(0, len(runouts), per_batch):
+        batch = runouts[start:start + per_batch]
+        rows = slice(start, start + len(batch))
+        hands = np.empty((len(batch), len(combos) + 1, 7), dtype=np.int8)
+        hands[:, :, :len(board)] = board
+        hands[:, :, len(board):5] = batch[:, None, :]
+        hands[:, 0, 5:] = player
+        hands[:, 1:, 5:] = cards
+        runout_masks = np.bitwise_or.reduce(
+            np.left_shift(np.uint64(1), batch.astype(np.uint64)), axis=1)
+        valid = (masks[None, :] & runout_masks[:, None]) == 0
+
+        # Villain combos holding a card of the runout are not scored.
+        hero_ranks = evaluate_batch(hands[:, 0])
+        ranks = np.full((len(batch), len(combos)), -1, dtype=np.int16)
+        ranks[valid] = evaluate_batch(hands[:, 1:][valid])
+        faced = weights * valid
+        win[rows] = (faced * (ranks < hero_ranks[:, None])).sum(axis=1)
+        tie[rows] = (faced * (ranks == hero_ranks[:, None])).sum(axis=1)
+        total[rows] = faced.sum(axis=1)
+
+    return runouts, win, tie, total
+
+def _relabel(cards: np.ndarray, perm: tuple) -> np.ndarray:
+    """Applies a suit permutation to an array of card codes."""
+    return (cards & ~3) | np.array(perm, dtype=cards.dtype)[cards & 3]
+
+def _relabel_range(villain: np.ndarray, perm: tuple) -> np.ndarray:
+    """Applies a suit permutation to a range's weights."""
+    relabeled = np.zeros(NUM_COMBOS)
+    cards = _relabel(COMBOS.astype(np.intp), perm)
+    indexes = [combo_index(pair) for pair in cards.tolist()]
+    relabeled[indexes] = villain
+
+    return relabeled
+
+def outs(
+        player: list[int],
+        board: list[int],
+        villain: Optional[Range] = None,
+        dead: Sequence[int] = (),
+        cache: Optional[EquityCache] = None) -> Outs:
+    """Finds which cards to come help the hero, on a flop or turn.
+
+    The hero and every villain combo are scored on every runout once, and
+    the equity after each next card and on each runout is added up from
+    those counts. villain is a range, a random hand (every combo) by
+    default. With a cache, the runout counts are kept under the suit
+    canonical key of the spot, so boards that only differ by suits share
+    an entry.
+
+    Returns the Outs of the spot.
+    """
+    if len(board) not in (3, 4):
+        raise ValueError('outs needs a flop or turn board')
+
+    villain = (np.ones(NUM_COMBOS) if villain is None
+               else range_weights(villain))
+    key, perm = canonical_permutation([player], board, dead)
+    canonical = _relabel_range(villain, perm)
+    key = ('outs:' + key + '|' +
+           hashlib.sha1(canonical.tobytes()).hexdigest()[:16])
+    counts = None if cache is None else cache.get(key)
+
+    if counts is None:
+        relabel = lambda cards: _relabel(np.array(cards, dtype=np.intp),
+                                         perm).tolist()
+        runouts, win, tie, total = _runout_counts(
+            relabel(player), canonical, relabel(board), relabel(dead))
+        counts = [runouts.tolist(), win.tolist(), tie.tolist(),
+                  total.tolist()]
+
+        if cache is not None:
+            cache.put(key, counts)
+
+    # Counts are kept in the canonical suits, so runouts are relabeled back.
+    inverse = tuple(perm.index(suit) for suit in range(4))
+    runouts = _relabel(np.array(counts[0], dtype=np.intp), inverse)
+    win, tie, total = (np.array(values) for values in counts[1:])
+    points = win + tie / 2
+
+    if total.sum() == 0:
+        raise ValueError('the villain range has no combos left')
+
+    equity = points.sum() / total.sum() * 100
+    runout_equities = {tuple(sorted(runout)): value
+                       for runout, value in
+                       zip(runouts.tolist(), _percents(points, total))}
+
+    # Each next card's counts are those of the runouts that contain it.
+    card_points = np.zeros(52)
+    card_total = np.zeros(52)
+
+    for column in runouts.T:
+        np.add.at(card_points, column, points)
+        np.add.at(card_total, column, total)
+
+    next_cards = np.unique(runouts)
+    cards = dict(zip(next_cards.tolist(),
+                     _percents(card_points[next_cards],
+                               card_total[next_cards])))
+    category = rank_category(evaluate(board + player))
+    improves = [card for card in cards
+                if rank_category(evaluate(board + player + [card])) >
+                category]
+
+    return Outs(equity, cards, runout_equities, improves)
+
+def _percents(points: np.ndarray, total: np.ndarray) -> list[float]:
+    """Returns points / total as percents, 0 where nothing was faced."""
+    return (np.divide(points, total, out=np.zeros(len(total)),
+                      where=total > 0) * 100).tolist()
+
+def read_cards(prompt: str) -> list[int]:
+    """Reads cards such as 'A S, 10 H' from the user as codes."""
+    return [card_to_int(Card(*text.split()))
+            for text in input(prompt).split(',')]
+
+def main():
+    """Main function that prints the outs of the user's hand."""
+    player = read_cards('Enter your cards (e.g. A S, K S): ')
+    board = read_cards('Enter the board (e.g. Q S, J D, 2 S): ')
+    result = outs(player, board)
+    print(result)
+
+    for card in result.outs:
+        print(f'{Card.from_code(card)}: {result.cards[card]:.2f}% '
+              f'({result.deltas[card]:+.2f})')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+from hand_history import (STREETS, ParsedHand, chunks, data_files,
+                          map_hands)
+from pathlib import Path
+from typing import Iterator, Optional
+import json
+import os
+
+STATS_PATH = Path(__file__).with_name('player_stats.json')
+EARLY_POSITIONS = ['UTG', 'UTG+1', 'UTG+2', 'MP', 'MP+1']
+
+# Kinds of action that put money in the pot by choice, and that raise.
+_VOLUNTARY = ('call', 'bet', 'raise', 'allin', 'allin_raise')
+_RAISES = ('bet', 'raise', 'allin_raise')
+_INVESTED = ('ante', 'small_blind', 'big_blind', 'post', 'post_dead')
+_BLINDS = ('small_blind', 'big_blind', 'post')
+
+class PlayerStats:
+    """Represents counts of one player's play, which add up across hands.
+
+    Attributes:
+        hands: Hands the player was dealt into.
+        vpip: Hands the player voluntarily put money in preflop.
+        pfr: Hands the player raised preflop.
+        aggressive: Bets and raises after the flop.
+        calls: Calls after the flop.
+        saw_flop: Hands the player saw the flop in.
+        showdowns: Hands the player went to showdown in.
+        won_showdowns: Showdowns the player won money at.
+        net: Dollars won minus dollars put in.
+        net_bb: Big blinds won minus big blinds put in.
+    """
+    FIELDS = ['hands', 'vpip', 'pfr', 'aggressive', 'calls', 'saw_flop',
+              'showdowns', 'won_showdowns', 'net', 'net_bb']
+
+    def __init__(self, values: Optional[list] = None):
+        if values is None:
+            values = [0] * len(self.FIELDS)
+
+        for field, value in zip(self.FIELDS, values):
+            setattr(self, field, value)
+
+    def to_list(self) -> list:
+        """Returns the counts in FIELDS order, for JSON."""
+        return [getattr(self, field) for field in self.FIELDS]
+
+    def merge(self, other: 'PlayerStats') -> None:
+        """Adds another player's counts to these ones."""
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    @property
+    def vpip_percent(self) -> float:
+        """Percent of hands the player voluntarily put money in preflop."""
+        return self.vpip / self.hands * 100 if self.hands else 0.0
+
+    @property
+    def pfr_percent(self) -> float:
+        """Percent of hands the player raised preflop."""
+        return self.pfr / self.hands * 100 if self.hands else 0.0
+
+    @property
+    def aggression_factor(self) -> float:
+        """Bets and raises per call after the flop."""
+        return self.aggressive / self.calls if self.calls else float('inf')
+
+    @property
+    def wtsd_percent(self) -> float:
+        """Percent of the flops the player saw that went to showdown."""
+        return self.showdowns / self.saw_flop * 100 if self.saw_flop else 0.0
+
+    @property
+    def bb_per_100(self) -> float:
+        """Big blinds won per 100 hands."""
+        return self.net_bb / self.hands * 100 if self.hands else 0.0
+
+    @property
+    def dollars_per_100(self) -> float:
+        """Dollars won per 100 hands."""
+        return self.net / self.hands * 100 if self.hands else 0.0
+
+    def __repr__(self):
+        return ('PlayerStats(hands=%d, vpip=%.1f%%, pfr=%.1f%%, af=%.2f, '
+                'wtsd=%.1f%%, bb/100=%.2f)' % (
+                    self.hands, self.vpip_percent, self.pfr_percent,
+                    self.aggression_factor, self.wtsd_percent,
+                    self.bb_per_100))
+
+class StatsTable:
+    """Represents PlayerStats keyed by player, position and stakes.
+
+    Tables of different hands merge by adding their counts, so they can be
+    built in separate processes or from separate files and combined.
+
+    Attributes:
+        stats: Dict of (player, position, stakes) to PlayerStats.
+    """
+    def __init__(self):
+        self.stats = {}
+
+    def get(self, player: str, position: str, stakes: float) -> PlayerStats:
+        """Returns the PlayerStats of a key, adding it if it is new."""
+        key = (player, position, stakes)
+
+        if key not in self.stats:
+            self.stats[key] = PlayerStats()
+
+        return self.stats[key]
+
+    def add_hand(self, hand: ParsedHand) -> None:
+        """Counts one hand for every player dealt into it."""
+        hand_positions = positions(hand)
+        money_in = invested(hand)
+        preflop_raisers, aggressive, calls = _aggression(hand)
+        folded = {action.player for street in STREETS
+                  for action in hand.actions[street] if action.kind == 'fold'}
+        remaining = [player for player in hand_positions
+                     if player not in folded]
+        showdown = len(remaining) > 1
+        preflop_folds = {action.player for action in hand.actions['PREFLOP']
+                         if action.kind == 'fold'}
+
+        for player, position in hand_positions.items():
+            stats = self.get(player, position, hand.stakes)
+            net = hand.collected.get(player, 0.0) - money_in.get(player, 0.0)
+            stats.hands += 1
+            stats.vpip += any(action.player == player and
+                              action.kind in _VOLUNTARY
+                              for action in hand.actions['PREFLOP'])
+            stats.pfr += player in preflop_raisers
+            stats.aggressive += aggressive.get(player, 0)
+            stats.calls += calls.get(player, 0)
+
+            if len(hand.board) >= 3 and player not in preflop_folds:
+                stats.saw_flop += 1
+
+                if showdown and player in remaining:
+                    stats.showdowns += 1
+                    stats.won_showdowns += player in hand.collected
+
+            stats.net += net
+            stats.net_bb += net / hand.stakes
+
+    def merge(self, other: 'StatsTable') -> None:
+        """Adds another table's counts to this one."""
+        for key, stats in other.stats.items():
+            self.get(*key).merge(stats)
+
+    def summary(self, by: tuple = ('player',)) -> dict:
+        """Adds up the stats over the key fields not in by.
+
+        by is some of 'player', 'position' and 'stakes', e.g.
+        ('player', 'position').
+
+        Returns a dict of the tuple of the by fields to PlayerStats.
+        """
+        fields = ['player', 'position', 'stakes']
+        indexes = [fields.index(field) for field in by]
+        totals = {}
+
+        for key, stats in self.stats.items():
+            group = tuple(key[i] for i in indexes)
+
+            if group not in totals:
+                totals[group] = PlayerStats()
+
+            totals[group].merge(stats)
+
+        return totals
+
+    def to_json(self) -> list:
+        """Returns the table as a JSON friendly list."""
+        return [list(key) + stats.to_list()
+                for key, stats in self.stats.items()]
+
+    @classmethod
+    def from_json(cls, rows: list) -> 'StatsTable':
+        """Returns the table saved by to_json."""
+        table = cls()
+
+        for row in rows:
+            table.stats[tuple(row[:3])] = PlayerStats(row[3:])
+
+        return table
+
+def positions(hand: ParsedHand) -> dict:
+    """Names the position of every player dealt into a hand.
+
+    Players are ordered clockwise from the seat after the dealer button:
+    SB, BB, then the early positions, HJ, CO and BTN. Heads up the button
+    is the small blind, so the players are BTN and BB.
+
+    Returns a dict of player to position, in order.
+    """
+    sitting_out = {action.player for action in hand.posts
+                   if action.kind == 'sitout'}
+    seats = sorted((seat, player) for seat, player, _ in hand.seats
+                   if player not in sitting_out)
+    seats.sort(key=lambda seat: (seat[0] - hand.dealer - 1) % 100)
+    players = [player for _, player in seats]
+
+    if len(players) == 2:
+        return {players[0]: 'BB', players[1]: 'BTN'}
+
+    late = ['HJ', 'CO', 'BTN'][max(0, 3 - (len(players) - 2)):]
+    middle = len(players) - 2 - len(late)
+    names = (['SB', 'BB'] + EARLY_POSITIONS[:middle] +
+             ['MP'] * (middle - len(EARLY_POSITIONS)) + late)
+
+    return dict(zip(players, names))
+
+def invested(hand: ParsedHand) -> dict:
+    """Returns the dollars each player put in the pot, less what was
+    returned to them."""
+    amounts = {}
+
+    def add(player: str, amount: float) -> None:
+        amounts[player] = amounts.get(player, 0.0) + amount
+
+    for action in hand.posts:
+        if action.kind in _INVESTED:
+            add(action.player, action.amount)
+
+        elif action.kind == 'ante_returned':
+            add(action.player, -action.amount)
+
+    for street, contributions in _street_contributions(hand):
+        for player, amount in contributions.items():
+            add(player, amount)
+
+    for street in STREETS:
+        for action in hand.actions[street]:
+            if action.kind == 'returned':
+                add(action.player, -action.amount)
+
+    return amounts
+
+def _street_contributions(hand: ParsedHand) -> Iterator[tuple]:
+    """Yields each street and the dollars each player put in on it by
+    calling, betting and raising (not blinds)."""
+    for street in STREETS:
+        bets = _blind_bets(hand) if street == 'PREFLOP' else {}
+        contributions = {}
+
+        for action in hand.actions[street]:
+            amount = _amount_in(action, bets)
+
+            if amount:
+                bets[action.player] = bets.get(action.player, 0.0) + amount
+                contributions[action.player] = (
+                    contributions.get(action.player, 0.0) + amount)
+
+        yield street, contributions
+
+def _blind_bets(hand: ParsedHand) -> dict:
+    """Returns the blinds each player has in front of them preflop."""
+    bets = {}
+
+    for action in hand.posts:
+        if action.kind in _BLINDS:
+            bets[action.player] = bets.get(action.player, 0.0) + action.amount
+
+    return bets
+
+def _amount_in(action, bets: dict) -> float:
+    """Returns the dollars an action adds to the player's bet on a street."""
+    if action.kind in ('raise', 'allin_raise') and action.total is not None:
+        return action.total - bets.get(action.player, 0.0)
+
+    if action.kind in ('call', 'bet', 'raise', 'allin', 'allin_raise'):
+        return action.amount or 0.0
+
+    return 0.0
+
+def _aggression(hand: ParsedHand) -> tuple:
+    """Finds who raised preflop and counts bets, raises and calls after
+    the flop. An all-in counts as a raise if it puts the player's bet
+    above the biggest one so far.
+
+    Returns the set of preflop raisers and dicts of player to aggressive
+    actions and to calls after the flop.
+    """
+    preflop_raisers = set()
+    aggressive = {}
+    calls = {}
+
+    for street in STREETS:
+        bets = _blind_bets(hand) if street == 'PREFLOP' else {}
+
+        for action in hand.actions[street]:
+            highest = max(bets.values(), default=0.0)
+            amount = _amount_in(action, bets)
+            bets[action.player] = bets.get(action.player, 0.0) + amount
+            raised = (action.kind in _RAISES or
+                      action.kind == 'allin' and bets[action.player] > highest)
+            called = action.kind == 'call' or (action.kind == 'allin' and
+                                               not raised)
+
+            if street == 'PREFLOP':
+                if raised:
+                    preflop_raisers.add(action.player)
+
+            elif raised:
+                aggressive[action.player] = aggressive.get(action.player,
+                                                           0) + 1
+
+            elif called:
+                calls[action.player] = calls.get(action.player, 0) + 1
+
+    return preflop_raisers, aggressive, calls
+
+def hand_stats(hands: Iterator[ParsedHand]) -> StatsTable:
+    """Counts a stream of hands in one pass.
+
+    Returns the StatsTable of the hands.
+    """
+    table = StatsTable()
+
+    for hand in hands:
+        table.add_hand(hand)
+
+    return table
+
+def collect_stats(
+        paths: Optional[list[Path]] = None,
+        workers: Optional[int] = None) -> StatsTable:
+    """Counts every hand of some files across worker processes.
+
+    Returns the merged StatsTable.
+    """
+    table = StatsTable()
+
+    for partial in map_hands(hand_stats, paths, workers):
+        table.merge(partial)
+
+    return table
+
+def update_stats(
+        paths: Optional[list[Path]] = None,
+        workers: Optional[int] = None,
+        path: Path = STATS_PATH) -> StatsTable:
+    """Updates the saved stats with new or changed files.
+
+    Each file's StatsTable is saved with its size and modification time,
+    so only new or changed files are parsed, and a changed file replaces
+    its old counts instead of adding to them.
+
+    Returns the StatsTable of every file.
+    """
+    if paths is None:
+        paths = data_files()
+
+    saved = {}
+
+    if path.exists():
+        with open(path) as file:
+            saved = json.load(file)
+
+    todo = []
+
+    for data_path in paths:
+        stat = os.stat(data_path)
+        entry = saved.get(Path(data_path).name)
+
+        if (entry is None or entry['size'] != stat.st_size or
+                entry['mtime'] != stat.st_mtime):
+            todo.append(Path(data_path))
+
+    if todo:
+        by_file = {data_path: StatsTable() for data_path in todo}
+        results = map_hands(hand_stats, todo, workers)
+
+        for (data_path, _, _), partial in zip(chunks(todo), results):
+            by_file[data_path].merge(partial)
+
+        for data_path, table in by_file.items():
+            stat = os.stat(data_path)
+            saved[data_path.name] = {'size': stat.st_size,
+                                     'mtime': stat.st_mtime,
+                                     'stats': table.to_json()}
+
+        temp = path.with_suffix('.tmp')
+
+        with open(temp, 'w') as file:
+            json.dump(saved, file)
+
+        os.replace(temp, path)
+
+    table = StatsTable()
+
+    for entry in saved.values():
+        table.merge(StatsTable.from_json(entry['stats']))
+
+    return table
+
+def main():
+    """Main function that updates and prints the most active players."""
+    totals = update_stats().summary()
+    players = sorted(totals.items(), key=lambda item: -item[1].hands)
+
+    for (player,), stats in players[:20]:
+        print(player, stats)
+
+if __name__ == '__main__':
+    main()
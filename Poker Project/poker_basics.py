@@ -1,24 +1,64 @@
 from typing import Optional
 from math import comb
 
+VALUES = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+SUITS = ['S', 'D', 'C', 'H']
+HIERARCHY_NAMES = ['High Card', 'Pair', 'Two Pair', 'Three of a Kind',
+                   'Straight', 'Flush', 'Full House', 'Four of a Kind',
+                   'Straight Flush', 'Royal Flush']
+
 class Card:
     """Represents a poker card.
 
+    Cards are interned: Card('A', 'S') always returns the same object, so
+    there are only ever 52 of them and equal cards are identical.
+
     Attributes:
+        code: Integer code of the card (0-51), ordered 2S, 2D, 2C, 2H,...
+            AH like the deck.
         val: Value of card (A, 2, 3,...K)
         suit: Suit of card (S, D, C, H)
     """
-    def __init__(self, val: str, suit: str):
-        self.val = val
-        self.suit = suit
+    __slots__ = ('code',)
+
+    _interned = {}
+    _by_code = []
+
+    def __new__(cls, val: str, suit: str):
+        card = cls._interned.get((val, suit))
+
+        if card is None:
+            if val not in VALUES or suit not in SUITS:
+                raise ValueError(f'{val!r} {suit!r} is not a card')
+
+            card = object.__new__(cls)
+            card.code = VALUES.index(val) * 4 + SUITS.index(suit)
+            cls._interned[(val, suit)] = card
+
+        return card
+
+    @classmethod
+    def from_code(cls, code: int) -> 'Card':
+        """Returns the card with an integer code."""
+        return cls._by_code[code]
+
+    @property
+    def val(self) -> str:
+        return VALUES[self.code >> 2]
+
+    @property
+    def suit(self) -> str:
+        return SUITS[self.code & 3]
 
     def __eq__(self, other) -> bool:
         """Returns True if and only if self and other are equal."""
-        return (
-            isinstance(other, Card) and
-            self.val == other.val and
-            self.suit == other.suit
-        )
+        return isinstance(other, Card) and self.code == other.code
+
+    def __hash__(self) -> int:
+        return self.code
+
+    def __reduce__(self):
+        return Card, (self.val, self.suit)
 
     def __repr__(self):
         if self.suit == 'S':
@@ -32,9 +72,18 @@ class Card:
 
         return '%r%r' % (self.val, symbol)
 
+Card._by_code = [Card(val, suit) for val in VALUES for suit in SUITS]
+
+# Each card code takes 6 bits of a packed hand, the suit being the low 2.
+_SUITS_MASK = sum(3 << (6 * i) for i in range(5))
+_SUITS_ONES = sum(1 << (6 * i) for i in range(5))
+
 class Hand:
     """Represents a poker hand.
 
+    The cards are packed into one integer, 6 bits per card code, and the
+    hierarchy into a rank integer that compares like the hierarchy.
+
     Attributes:
         player: Player number which the hand belongs to. Board is player 0.
         card1: First Card object in the hand.
@@ -42,8 +91,13 @@ class Hand:
         card3: Third Card object in the hand.
         card4: Fourth Card object in the hand.
         card5: Fifth Card object in the hand.
+        packed: The five card codes packed into one integer.
+        rank: The category of the hierarchy times 65536 plus its value, or
+            None before hand_hierarchy is called.
         hierarchy: The hierarchy of the hand.
     """
+    __slots__ = ('player', 'packed', 'rank')
+
     def __init__(
             self,
             card1: Card,
@@ -52,30 +106,65 @@ class Hand:
             card4: Card,
             card5: Card,
             hierarchy: Optional[list] = None):
-        self.card1 = card1
-        self.card2 = card2
-        self.card3 = card3
-        self.card4 = card4
-        self.card5 = card5
-        self.hierarchy = hierarchy
+        self.packed = (card1.code | card2.code << 6 | card3.code << 12 |
+                       card4.code << 18 | card5.code << 24)
+        self.rank = (None if hierarchy is None else
+                     hierarchy[1] << 16 | hierarchy[2])
+
+    @property
+    def card1(self) -> Card:
+        return Card.from_code(self.packed & 63)
+
+    @property
+    def card2(self) -> Card:
+        return Card.from_code(self.packed >> 6 & 63)
+
+    @property
+    def card3(self) -> Card:
+        return Card.from_code(self.packed >> 12 & 63)
+
+    @property
+    def card4(self) -> Card:
+        return Card.from_code(self.packed >> 18 & 63)
+
+    @property
+    def card5(self) -> Card:
+        return Card.from_code(self.packed >> 24 & 63)
+
+    @property
+    def codes(self) -> list[int]:
+        """The five card codes, in order."""
+        packed = self.packed
+
+        return [packed & 63, packed >> 6 & 63, packed >> 12 & 63,
+                packed >> 18 & 63, packed >> 24]
+
+    @property
+    def flush(self) -> bool:
+        """True if all five cards have the same suit."""
+        return self.packed & _SUITS_MASK == (self.packed & 3) * _SUITS_ONES
+
+    @property
+    def hierarchy(self) -> Optional[list]:
+        if self.rank is None:
+            return None
+
+        category = self.rank >> 16
+
+        return [HIERARCHY_NAMES[category], category, self.rank & 0xFFFF]
+
+    @hierarchy.setter
+    def hierarchy(self, hierarchy: Optional[list]) -> None:
+        self.rank = (None if hierarchy is None else
+                     hierarchy[1] << 16 | hierarchy[2])
 
     def __eq__(self, other) -> bool:
         """Returns True if and only if self and other are equal."""
-        return (
-            isinstance(other, Hand) and
-            self.hierarchy == other.hierarchy
-        )
+        return isinstance(other, Hand) and self.rank == other.rank
 
     def __lt__(self, other) -> bool:
         """Returns True if and only if self < other."""
-        if (isinstance(other, Hand) and
-                (self.hierarchy[1] < other.hierarchy[1] or
-                 (self.hierarchy[1] == other.hierarchy[1] and
-                  self.hierarchy[2] < other.hierarchy[2]))):
-            return True
-
-        else:
-            return False
+        return isinstance(other, Hand) and self.rank < other.rank
 
     def __repr__(self):
         return '%r %r %r %r %r' % (self.card1, self.card2, self.card3,
@@ -86,30 +175,10 @@ def card_nums_sort(hand: Hand) -> list:
 
     Returns a list of the card values from the hand in sorted numeric form.
     """
-    card_vals = [hand.card1.val, hand.card2.val, hand.card3.val,
-                 hand.card4.val, hand.card5.val]
-    card_nums = []
-
-    for card_val in card_vals:
-        if card_val == '10':
-            card_nums.append(10)
-
-        elif ord(card_val) >= 65:
-            if card_val == 'J':
-                card_nums.append(11)
-
-            elif card_val == 'Q':
-                card_nums.append(12)
-
-            elif card_val == 'K':
-                card_nums.append(13)
-
-            elif card_val == 'A':
-                card_nums.append(14)
-
-        else:
-            card_nums.append(int(card_val))
-
+    packed = hand.packed
+    card_nums = [(packed >> 2 & 15) + 2, (packed >> 8 & 15) + 2,
+                 (packed >> 14 & 15) + 2, (packed >> 20 & 15) + 2,
+                 (packed >> 26) + 2]
     card_nums.sort()
 
     return card_nums
@@ -117,15 +186,14 @@ def card_nums_sort(hand: Hand) -> list:
 def hand_hierarchy(hand: Hand) -> None:
     """Identifies the hierarchy of the given hand."""
     card_nums = card_nums_sort(hand)
+    flush = hand.flush
     card_set = list(set(card_nums))
     card_set.sort()
     max_card = card_nums[4]
     min_card = card_nums[0]
 
     if len(card_set) == 5 and (max_card - min_card == 4 or\
-            card_nums == [2, 3, 4, 5, 14]) and\
-            hand.card1.suit == hand.card2.suit == hand.card3.suit ==\
-            hand.card4.suit == hand.card5.suit:
+            card_nums == [2, 3, 4, 5, 14]) and flush:
         if card_nums == [10, 11, 12, 13, 14]:
             hand.hierarchy = ['Royal Flush', 9, 0]
 
@@ -150,8 +218,7 @@ def hand_hierarchy(hand: Hand) -> None:
             if card_nums == straights[i]:
                 hand.hierarchy = ['Straight', 4, i]
 
-    elif hand.card1.suit == hand.card2.suit == hand.card3.suit ==\
-            hand.card4.suit == hand.card5.suit:
+    elif flush:
         max_list = [7, 8, 9, 10, 11, 12, 13, 14]
 
         for i in range(len(max_list)):
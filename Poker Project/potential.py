@@ -0,0 +1,229 @@
+from batch_evaluator import evaluate_batch
+from equity_cache import EquityCache, canonical_permutation
+from functools import lru_cache
+from itertools import combinations
+from outs import read_cards
+from ranges import (BATCH_ROWS, COMBO_MASKS, COMBOS, NUM_COMBOS, combo_index,
+                    mask_of)
+from total_probability import get_pool
+from typing import Optional
+import numpy as np
+
+# Rank tables kept per process. A flop's table is 1176 x 1326 int16.
+TABLE_CACHE_SIZE = 16
+
+# Indexes of the states of the hero against an opponent hand.
+AHEAD, TIED, BEHIND = 0, 1, 2
+
+class Potential:
+    """Represents the hand strength and potential of hole cards against a
+    random opponent hand, as defined by Billings et al.
+
+    Attributes:
+        hs: Percent of opponent hands the hero is ahead of now, counting
+            ties as half.
+        ppot: Positive potential, the percent chance a hero behind now is
+            ahead by the river, counting ties as half.
+        npot: Negative potential, the percent chance a hero ahead now is
+            behind by the river, counting ties as half.
+        current: Number of opponent hands the hero is AHEAD of, TIED with
+            and BEHIND now.
+        transitions: 3 x 3 counts of (opponent hand, runout) pairs by the
+            hero's state now and on the river.
+    """
+    def __init__(self, current: list[int], transitions: list[list[int]]):
+        self.current = current
+        self.transitions = transitions
+        ahead, tied, behind = current
+        totals = [sum(row) for row in transitions]
+        self.hs = _percent(ahead + tied / 2, ahead + tied + behind)
+
+        # The potentials are fractions of the (opponent hand, runout)
+        # pairs, so every opponent hand is weighted by the runouts it
+        # leaves.
+        self.ppot = _percent(transitions[BEHIND][AHEAD] +
+                             transitions[BEHIND][TIED] / 2 +
+                             transitions[TIED][AHEAD] / 2,
+                             totals[BEHIND] + totals[TIED] / 2)
+        self.npot = _percent(transitions[AHEAD][BEHIND] +
+                             transitions[TIED][BEHIND] / 2 +
+                             transitions[AHEAD][TIED] / 2,
+                             totals[AHEAD] + totals[TIED] / 2)
+
+    @property
+    def ehs(self) -> float:
+        """Effective hand strength, the percent chance the hero is ahead by
+        the river: HS * (1 - NPot) + (1 - HS) * PPot."""
+        return (self.hs * (100 - self.npot) +
+                (100 - self.hs) * self.ppot) / 100
+
+    def __repr__(self):
+        return 'Potential(hs=%.3f%%, ppot=%.3f%%, npot=%.3f%%, ehs=%.3f%%)' % (
+            self.hs, self.ppot, self.npot, self.ehs)
+
+def _percent(part: float, total: float) -> float:
+    """Returns part / total as a percent, 0 if total is 0."""
+    return part / total * 100 if total else 0.0
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def rank_table(board: tuple) -> tuple:
+    """Scores every combo on a board now and on every runout to the river.
+
+    The table is shared by every hero on the board: heroes are combos of
+    it too, so each hero's counts only compare entries of the table.
+
+    Returns the combos' ranks now as a (1326,) array, the runouts'
+    bitmasks as an (R,) array, and the combos' ranks on each runout as an
+    (R, 1326) array. Combos that hold a board or runout card are -1.
+    """
+    board = list(board)
+    board_mask = mask_of(board)
+    live = np.flatnonzero((COMBO_MASKS & board_mask) == 0)
+    hands = np.empty((len(live), len(board) + 2), dtype=np.int8)
+    hands[:, :len(board)] = board
+    hands[:, len(board):] = COMBOS[live]
+    current = np.full(NUM_COMBOS, -1, dtype=np.int16)
+    current[live] = evaluate_batch(hands)
+
+    deck = [card for card in range(52) if card not in board]
+    needed = 5 - len(board)
+    runouts = np.array(list(combinations(deck, needed)), dtype=np.int8)
+    runouts = runouts.reshape(len(runouts), needed)
+    masks = np.bitwise_or.reduce(
+        np.left_shift(np.uint64(1), runouts.astype(np.uint64)), axis=1)
+    final = np.full((len(runouts), NUM_COMBOS), -1, dtype=np.int16)
+    per_batch = max(1, BATCH_ROWS // NUM_COMBOS)
+
+    for start in range(0, len(runouts), per_batch):
+        rows = slice(start, start + per_batch)
+        valid = (COMBO_MASKS[None, :] &
+                 (masks[rows, None] | board_mask)) == 0
+        row, column = np.nonzero(valid)
+        hands = np.empty((len(row), 7), dtype=np.int8)
+        hands[:, :len(board)] = board
+        hands[:, len(board):5] = runouts[rows][row]
+        hands[:, 5:] = COMBOS[column]
+        final[rows][valid] = evaluate_batch(hands)
+
+    return current, masks, final
+
+def hand_counts(board: tuple, player: list[int]) -> tuple:
+    """Counts the hero's states against every opponent hand now and on
+    every runout, from the board's rank_table.
+
+    Returns the current counts and the transition counts, as a Potential
+    takes them.
+    """
+    current, masks, final = rank_table(board)
+    hero = combo_index(player)
+    hero_mask = COMBO_MASKS[hero]
+
+    if current[hero] < 0:
+        raise ValueError('hole cards share a card with the board')
+
+    # Each opponent hand's column is counted over the runouts the hero's
+    # cards leave, and the columns are then summed by the hero's state now.
+    later = final[(masks & hero_mask) == 0]
+    hero_later = later[:, hero, None]
+    columns = np.flatnonzero(((COMBO_MASKS & hero_mask) == 0) &
+                             (current >= 0))
+    below = (later < hero_later).sum(axis=0)[columns]
+    equal = (later == hero_later).sum(axis=0)[columns]
+
+    # Opponent hands that hold a card of the runout are -1 there, so they
+    # count as below the hero and are taken back out.
+    blocked = (later < 0).sum(axis=0)[columns]
+
+    # 1 - sign(hero - opponent) is AHEAD, TIED or BEHIND.
+    now = (1 - np.sign(current[hero] - current[columns])).astype(np.intp)
+    ahead = np.bincount(now, below - blocked, 3)
+    tied = np.bincount(now, equal, 3)
+    faced = np.bincount(now, len(later) - blocked, 3)
+
+    return (np.bincount(now, minlength=3).tolist(),
+            [[int(a), int(t), int(f - a - t)]
+             for a, t, f in zip(ahead, tied, faced)])
+
+def _board_counts(job: tuple) -> list[tuple]:
+    """Counts every hero of one board, for the worker pool."""
+    board, players = job
+
+    return [hand_counts(board, player) for player in players]
+
+def batch_potentials(
+        spots: list[tuple],
+        workers: Optional[int] = None,
+        cache: Optional[EquityCache] = None) -> list[Potential]:
+    """Computes the Potential of many (player_cards, board) spots on the
+    flop, turn or river.
+
+    Spots are relabeled to their suit canonical form and deduplicated
+    through a shared cache (in memory for this call if none is given).
+    The remaining spots are grouped by board, so each board's rank_table
+    is built once for all of its heroes, and the boards are spread across
+    the shared worker pool.
+
+    Returns the Potential of each spot, in order.
+    """
+    if cache is None:
+        cache = EquityCache(None)
+
+    # Counts are kept here as well as in the cache, which may evict some of
+    # them before the end of a large batch.
+    keys = []
+    found = {}
+    boards = {}
+
+    for player, board in spots:
+        if len(board) not in (3, 4, 5):
+            raise ValueError('the board must have 3, 4 or 5 cards')
+
+        key, perm = canonical_permutation([player], board)
+        key = 'potential:' + key
+        keys.append(key)
+
+        if key not in found:
+            found[key] = cache.get(key)
+
+        if found[key] is None:
+            relabel = lambda cards: sorted(card & ~3 | perm[card & 3]
+                                           for card in cards)
+            heroes = boards.setdefault(tuple(relabel(board)), {})
+            heroes[key] = relabel(player)
+
+    jobs = [(board, list(heroes.values())) for board, heroes in
+            boards.items()]
+
+    if workers == 1 or len(jobs) < 2:
+        results = map(_board_counts, jobs)
+
+    else:
+        results = get_pool(workers).map(_board_counts, jobs)
+
+    for heroes, counts in zip(boards.values(), results):
+        for key, (current, transitions) in zip(heroes, counts):
+            found[key] = [current, transitions]
+            cache.put(key, found[key])
+
+    return [Potential(*found[key]) for key in keys]
+
+def potential(
+        player: list[int],
+        board: list[int],
+        cache: Optional[EquityCache] = None) -> Potential:
+    """Computes the hand strength and potential of hole cards on a flop,
+    turn or river.
+
+    Returns the Potential of the spot.
+    """
+    return batch_potentials([(player, board)], 1, cache)[0]
+
+def main():
+    """Main function that prints the hand strength and potential of the
+    user's hand."""
+    player = read_cards('Enter your cards (e.g. A S, K S): ')
+    board = read_cards('Enter the board (e.g. Q S, J D, 2 S): ')
+    print(potential(player, board))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiway import Result, sample_multiway
+from pathlib import Path
+from typing import Optional
+import argparse
+import mmap
+import struct
+
+TABLE_PATH = Path(__file__).with_name('preflop_equity.bin')
+NUM_CLASSES = 169
+MAX_OPPONENTS = 8
+RANK_CHARS = '23456789TJQKA'
+
+# Header: magic, version, classes, max opponents, samples per entry. Each
+# entry is win, tie, equity and standard error as float32 percents, stored
+# by class and then by number of opponents.
+_HEADER = struct.Struct('<4sHHHxxI')
+_MAGIC = b'PFEQ'
+_VERSION = 1
+_FIELDS = 4
+
+def hand_class(player: list[int]) -> int:
+    """Returns the index (0-168) of the starting hand class of hole cards.
+
+    Classes are laid out as a 13 x 13 grid by rank: pairs on the diagonal,
+    suited hands above it and offsuit hands below it.
+    """
+    high = max(player[0] >> 2, player[1] >> 2)
+    low = min(player[0] >> 2, player[1] >> 2)
+
+    if player[0] & 3 == player[1] & 3:
+        return low * 13 + high
+
+    return high * 13 + low
+
+def class_name(index: int) -> str:
+    """Returns the name of a starting hand class, e.g. 'AKs' or 'TT'."""
+    row, column = divmod(index, 13)
+
+    if row == column:
+        return RANK_CHARS[row] * 2
+
+    if row < column:
+        return RANK_CHARS[column] + RANK_CHARS[row] + 's'
+
+    return RANK_CHARS[row] + RANK_CHARS[column] + 'o'
+
+def class_cards(index: int) -> list[int]:
+    """Returns example hole cards for a starting hand class."""
+    row, column = divmod(index, 13)
+
+    if row < column:
+        return [column * 4, row * 4]
+
+    return [row * 4, column * 4 + 1]
+
+def _load() -> Optional[tuple]:
+    """Memory maps the preflop table if it has been built.
+
+    Returns the mapped floats and samples per entry, or None.
+    """
+    if not TABLE_PATH.exists():
+        return None
+
+    with open(TABLE_PATH, 'rb') as file:
+        table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, classes, opponents, samples = _HEADER.unpack_from(table)
+
+    if (magic != _MAGIC or version != _VERSION or classes != NUM_CLASSES or
+            opponents != MAX_OPPONENTS):
+        raise ValueError(f'{TABLE_PATH} is not a preflop table for this '
+                         f'version, rebuild it with preflop.py')
+
+    return memoryview(table)[_HEADER.size:].cast('f'), samples
+
+_TABLE = _load()
+
+def preflop_equity(player: list[int], num_opponents: int) -> Result:
+    """Looks up the player's preflop equity against unknown opponents.
+
+    Returns the player's Result from the precomputed table, without any
+    simulation.
+    """
+    if _TABLE is None:
+        raise FileNotFoundError(f'{TABLE_PATH} has not been built, run '
+                                f'preflop.py to build it')
+
+    if not 1 <= num_opponents <= MAX_OPPONENTS:
+        raise ValueError(f'num_opponents must be between 1 and '
+                         f'{MAX_OPPONENTS}')
+
+    values, samples = _TABLE
+    offset = ((hand_class(player) * MAX_OPPONENTS + num_opponents - 1) *
+              _FIELDS)
+    win, tie, equity, std_error = values[offset:offset + _FIELDS]
+
+    return Result(win, tie, equity - win, samples, False, std_error)
+
+def _entry(args: tuple) -> list[float]:
+    """Samples the equity of one class against some number of opponents."""
+    index, num_opponents, samples, seed = args
+    player = class_cards(index)
+    deck = [card for card in range(52) if card not in player]
+    result = sample_multiway(deck, [], player, num_opponents, samples,
+                             seed=seed)
+
+    return [result.win, result.tie, result.equity, result.std_error]
+
+def build(samples: int = 20000, workers: Optional[int] = None,
+          seed: int = 0) -> None:
+    """Builds the preflop table by sampling every class and opponent count."""
+    jobs = [(index, num_opponents, samples,
+             seed * NUM_CLASSES * MAX_OPPONENTS + index * MAX_OPPONENTS +
+             num_opponents)
+            for index in range(NUM_CLASSES)
+            for num_opponents in range(1, MAX_OPPONENTS + 1)]
+
+    with ProcessPoolExecutor(workers) as executor:
+        entries = list(executor.map(_entry, jobs, chunksize=8))
+
+    values = [value for entry in entries for value in entry]
+
+    with open(TABLE_PATH, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, NUM_CLASSES, MAX_OPPONENTS,
+                                samples))
+        file.write(struct.pack(f'<{len(values)}f', *values))
+
+def main():
+    """Main function that builds the preflop equity table."""
+    parser = argparse.ArgumentParser(description='Build the preflop table.')
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    build(args.samples, args.workers, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+from batch_evaluator import evaluate_batch
+from itertools import combinations
+from math import comb, sqrt
+from multiway import Result
+from preflop import RANK_CHARS
+from typing import Optional, Sequence, Union
+import numpy as np
+import re
+
+NUM_COMBOS = 1326
+EXACT_RUNOUTS = 20000
+BATCH_ROWS = 1 << 20
+SUIT_CHARS = 'sdch'
+
+# Every pair of hole cards, with the lower code first, as a 1326 weight
+# vector is laid out. Each combo's cards are also kept as a bitmask, so
+# blocking by the board, dead cards or a runout is one AND.
+COMBOS = np.array(list(combinations(range(52), 2)), dtype=np.int8)
+COMBO_MASKS = (np.left_shift(np.uint64(1), COMBOS[:, 0].astype(np.uint64)) |
+               np.left_shift(np.uint64(1), COMBOS[:, 1].astype(np.uint64)))
+_COMBO_INDEX = {(int(low), int(high)): i
+                for i, (low, high) in enumerate(COMBOS)}
+
+_TOKEN = re.compile(r'([2-9TJQKA])([2-9TJQKA])([so]?)(\+?)$')
+_SPAN = re.compile(r'([2-9TJQKA])([2-9TJQKA])([so]?)-'
+                   r'([2-9TJQKA])([2-9TJQKA])([so]?)$')
+_EXPLICIT = re.compile(r'([2-9TJQKA][sdch]){2}$')
+
+Range = Union[str, np.ndarray, list]
+
+def combo_index(player: list[int]) -> int:
+    """Returns the index (0-1325) of two hole cards in a weight vector."""
+    return _COMBO_INDEX[(min(player), max(player))]
+
+def mask_of(cards: list[int]) -> np.uint64:
+    """Returns the bitmask of some cards."""
+    mask = 0
+
+    for card in cards:
+        mask |= 1 << card
+
+    return np.uint64(mask)
+
+def _class_combos(high: int, low: int, suited: str) -> list[int]:
+    """Returns the combo indexes of a hand class such as AKs, AKo or AK."""
+    indexes = []
+
+    for high_suit in range(4):
+        for low_suit in range(4):
+            if high == low and high_suit >= low_suit:
+                continue
+
+            if suited == 's' and high_suit != low_suit:
+                continue
+
+            if suited == 'o' and high_suit == low_suit:
+                continue
+
+            indexes.append(combo_index([high * 4 + high_suit,
+                                        low * 4 + low_suit]))
+
+    return indexes
+
+def _token_combos(token: str) -> list[int]:
+    """Returns the combo indexes named by one token of a range."""
+    if _EXPLICIT.match(token):
+        return [combo_index([RANK_CHARS.index(token[i]) * 4 +
+                             SUIT_CHARS.index(token[i + 1])
+                             for i in (0, 2)])]
+
+    match = _TOKEN.match(token)
+
+    if match is not None:
+        high, low = sorted((RANK_CHARS.index(char)
+                            for char in match.group(1, 2)), reverse=True)
+        classes = [(high, low)]
+
+        # QQ+ adds the bigger pairs, ATs+ the bigger kickers below the A.
+        if match[4] and high == low:
+            classes = [(rank, rank) for rank in range(high, 13)]
+
+        elif match[4]:
+            classes = [(high, kicker) for kicker in range(low, high)]
+
+        return [index for high, low in classes
+                for index in _class_combos(high, low, match[3])]
+
+    match = _SPAN.match(token)
+
+    if match is not None and match[3] == match[6]:
+        first = sorted((RANK_CHARS.index(char) for char in match.group(1, 2)),
+                       reverse=True)
+        last = sorted((RANK_CHARS.index(char) for char in match.group(4, 5)),
+                      reverse=True)
+        gap = first[0] - first[1]
+
+        # 76s-54s keeps the gap between the ranks, A5s-A2s keeps the top
+        # rank and QQ-88 steps through the pairs.
+        if last[0] - last[1] == gap:
+            start, end = sorted((first[1], last[1]))
+            classes = [(low + gap, low) for low in range(start, end + 1)]
+
+        elif first[0] == last[0]:
+            start, end = sorted((first[1], last[1]))
+            classes = [(first[0], low) for low in range(start, end + 1)]
+
+        else:
+            raise ValueError(f'cannot parse range token {token!r}')
+
+        return [index for high, low in classes
+                for index in _class_combos(high, low, match[3])]
+
+    raise ValueError(f'cannot parse range token {token!r}')
+
+def parse_range(text: str) -> np.ndarray:
+    """Parses a range in standard notation into a weight vector.
+
+    Tokens are separated by commas, e.g. 'QQ+, AKs, 76s-54s, A5s-A2s, KQo,
+    AhKh'. A token may end with ':weight' to include its combos with that
+    weight, e.g. 'AQo:0.5'. Later tokens override earlier ones.
+
+    Returns a float array of the 1326 combo weights.
+    """
+    weights = np.zeros(NUM_COMBOS)
+
+    for token in text.replace(' ', '').split(','):
+        if not token:
+            continue
+
+        token, _, weight = token.partition(':')
+        weights[_token_combos(token)] = float(weight) if weight else 1.0
+
+    return weights
+
+def range_weights(hand_range: Range) -> np.ndarray:
+    """Returns the weight vector of a range given as text or as weights."""
+    if isinstance(hand_range, str):
+        return parse_range(hand_range)
+
+    weights = np.asarray(hand_range, dtype=np.float64)
+
+    if weights.shape != (NUM_COMBOS,) or (weights < 0).any():
+        raise ValueError(f'a range must be {NUM_COMBOS} weights that are '
+                         f'not negative')
+
+    return weights
+
+def _runouts(
+        deck: list[int],
+        needed: int,
+        samples: int,
+        seed: Optional[int]) -> tuple:
+    """Enumerates the runouts of the board, or samples them if there are
+    more than EXACT_RUNOUTS.
+
+    Returns the runouts as an array and whether they were enumerated.
+    """
+    if comb(len(deck), needed) <= EXACT_RUNOUTS:
+        runouts = np.array(list(combinations(deck, needed)), dtype=np.int8)
+
+        return runouts.reshape(-1, needed), True
+
+    rng = np.random.default_rng(seed)
+    order = np.argsort(rng.random((samples, len(deck))), axis=1)
+
+    return np.array(deck, dtype=np.int8)[order[:, :needed]], False
+
+def _showdowns(
+        hero: np.ndarray,
+        villain: np.ndarray,
+        board: list[int],
+        dead: list[int],
+        samples: int,
+        seed: Optional[int]) -> tuple:
+    """Weighs every hero combo against the villain range over the runouts.
+
+    For each runout, every live combo of either range is scored with one
+    batch evaluation. The villain weight a hero combo beats or ties is
+    found by sorting the villain combos by rank and taking cumulative
+    weights, and the villain combos sharing a card with the hero combo are
+    removed using cumulative weights per card.
+
+    Returns the hero combos, and per hero combo the summed villain weight
+    it beats, ties and faces over the runouts, with the per runout
+    numerators and denominators of the equity and whether it was exact.
+    """
+    known = mask_of(board + list(dead))
+    live = ((COMBO_MASKS & known) == 0) & ((hero > 0) | (villain > 0))
+    combos = np.flatnonzero(live)
+    cards = COMBOS[combos].astype(np.intp)
+    masks = COMBO_MASKS[combos]
+    hero_weights = hero[combos]
+    villain_weights = villain[combos]
+    size = len(combos)
+    rows = np.arange(size)
+
+    # contains[c, i] is whether combo i holds card c.
+    contains = np.zeros((52, size))
+    contains[cards[:, 0], rows] = 1
+    contains[cards[:, 1], rows] = 1
+
+    deck = [card for card in range(52) if not int(known) >> card & 1]
+    needed = 5 - len(board)
+    runouts, exact = _runouts(deck, needed, samples, seed)
+
+    win = np.zeros(size)
+    tie = np.zeros(size)
+    total = np.zeros(size)
+    numerators = []
+    denominators = []
+    per_batch = max(1, BATCH_ROWS // max(size, 1))
+
+    for start in range(0, len(runouts), per_batch):
+        batch = runouts[start:start + per_batch]
+        hands = np.empty((len(batch), size, 7), dtype=np.int8)
+        hands[:, :, :len(board)] = board
+        hands[:, :, len(board):5] = batch[:, None, :]
+        hands[:, :, 5:] = cards
+        runout_masks = np.bitwise_or.reduce(
+            np.left_shift(np.uint64(1), batch.astype(np.uint64)), axis=1)
+        valid_rows = (masks[None, :] & runout_masks[:, None]) == 0
+
+        # Combos holding a card of the runout are blocked and not scored.
+        ranks = np.full((len(batch), size), -1, dtype=np.int16)
+        ranks[valid_rows] = evaluate_batch(hands[valid_rows])
+
+        for valid, rank in zip(valid_rows, ranks):
+            weights = villain_weights * valid
+            order = np.argsort(rank, kind='stable')
+            ordered = rank[order]
+            low = np.searchsorted(ordered, rank, 'left')
+            high = np.searchsorted(ordered, rank, 'right')
+
+            cumulative = np.zeros(size + 1)
+            np.cumsum(weights[order], out=cumulative[1:])
+            by_card = np.zeros((52, size + 1))
+            np.cumsum(contains[:, order] * weights[order], axis=1,
+                      out=by_card[:, 1:])
+
+            first, second = cards[:, 0], cards[:, 1]
+            beaten = (cumulative[low] - by_card[first, low] -
+                      by_card[second, low])
+            tied = (cumulative[high] - cumulative[low] -
+                    (by_card[first, high] - by_card[first, low]) -
+                    (by_card[second, high] - by_card[second, low]) +
+                    weights)
+            faced = (cumulative[-1] - by_card[first, -1] -
+                     by_card[second, -1] + weights)
+
+            # The villain combo equal to the hero combo was removed twice
+            # but only counted once, so its weight is added back above.
+            win += beaten * valid
+            tie += tied * valid
+            total += faced * valid
+            numerators.append(hero_weights @ ((beaten + tied / 2) * valid))
+            denominators.append(hero_weights @ (faced * valid))
+
+    return (combos, win, tie, total, np.array(numerators),
+            np.array(denominators), exact)
+
+def range_vs_range(
+        hero: Range,
+        villain: Range,
+        board: list[int],
+        dead: Sequence[int] = (),
+        samples: int = 10000,
+        seed: Optional[int] = None) -> Result:
+    """Computes a weighted range's equity against another weighted range.
+
+    Every runout of a flop or turn is enumerated, and runouts are sampled
+    preflop. Combos that share a card with the board, the dead cards, the
+    runout or the other player's combo are removed.
+
+    Returns the hero range's heads up Result.
+    """
+    hero = range_weights(hero)
+    combos, win, tie, total, numerators, denominators, exact = _showdowns(
+        hero, range_weights(villain), board, dead, samples, seed)
+    weights = hero[combos]
+    faced = weights @ total
+
+    if faced == 0:
+        raise ValueError('the ranges have no combos that can meet')
+
+    win_share = weights @ win / faced * 100
+    tie_share = weights @ tie / faced * 100
+    std_error = 0.0
+
+    if not exact:
+        equity = numerators.sum() / denominators.sum()
+        std_error = (sqrt(((numerators - equity * denominators) ** 2).sum()) /
+                     denominators.sum() * 100)
+
+    return Result(win_share, tie_share, tie_share / 2, len(numerators),
+                  exact, std_error)
+
+def hero_vs_range(
+        player: list[int],
+        villain: Range,
+        board: list[int],
+        dead: Sequence[int] = (),
+        samples: int = 10000,
+        seed: Optional[int] = None) -> Result:
+    """Computes the equity of known hole cards against a weighted range.
+
+    Returns the player's heads up Result.
+    """
+    hero = np.zeros(NUM_COMBOS)
+    hero[combo_index(player)] = 1
+
+    return range_vs_range(hero, villain, board, dead, samples, seed)
+
+def combo_equities(
+        hero: Range,
+        villain: Range,
+        board: list[int],
+        dead: Sequence[int] = (),
+        samples: int = 10000,
+        seed: Optional[int] = None) -> np.ndarray:
+    """Computes the equity of each combo of a range against another range.
+
+    Returns the 1326 equities as percents, nan for combos that are not in
+    the hero range or cannot meet the villain range.
+    """
+    hero = range_weights(hero)
+    combos, win, tie, total, _, _, _ = _showdowns(
+        hero, range_weights(villain), board, dead, samples, seed)
+    equities = np.full(NUM_COMBOS, np.nan)
+    met = (total > 0) & (hero[combos] > 0)
+    equities[combos[met]] = (win[met] + tie[met] / 2) / total[met] * 100
+
+    return equities
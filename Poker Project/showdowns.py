@@ -0,0 +1,392 @@
+from batch_evaluator import evaluate_batch
+from equity_cache import EquityCache, canonical_spot
+from hand_history import STREETS, ParsedHand, map_hands
+from functools import lru_cache
+from itertools import chain, combinations
+from oracle import standard_rank, standard_tables
+from pathlib import Path
+from player_stats import invested
+from total_probability import get_pool
+from typing import Iterator, Optional
+import numpy as np
+
+RUNOUT_BLOCK = 1 << 16
+
+# Kinds of action that are not betting, so they do not show which street
+# the betting ended on.
+_NOT_BETTING = ('returned', 'show', 'muck', 'no_show', 'other')
+_BOARD_SIZES = {'PREFLOP': 0, 'FLOP': 3, 'TURN': 4}
+
+class Showdown:
+    """Represents the players of one hand that went to showdown.
+
+    Attributes:
+        hand_id: Stage number of the hand.
+        stakes: Big blind of the game in dollars.
+        players: Players that did not fold, in the order they acted.
+        cards: Hole cards each of them showed, or None if one did not.
+        board: Board cards as codes.
+        allin_board: Board when the betting ended before the river, or None
+            if it did not or some cards were not shown.
+        pots: List of (dollars, indexes of the players in it) per pot, with
+            the main pot first.
+        collected: Dollars each player collected.
+        net: Dollars each player won minus dollars they put in.
+        verified: Whether the best shown hand collected money, or None if
+            some cards were not shown.
+    """
+    def __init__(self, hand_id: int, stakes: float, players: list[str],
+                 cards: Optional[list], board: list[int],
+                 allin_board: Optional[list[int]], pots: list[tuple],
+                 collected: list[float], net: list[float],
+                 verified: Optional[bool]):
+        self.hand_id = hand_id
+        self.stakes = stakes
+        self.players = players
+        self.cards = cards
+        self.board = board
+        self.allin_board = allin_board
+        self.pots = pots
+        self.collected = collected
+        self.net = net
+        self.verified = verified
+
+class ShowdownStats:
+    """Represents a player's showdown results, which add up across hands.
+
+    Attributes:
+        showdowns: Hands the player went to showdown in.
+        won: Showdowns the player collected money at.
+        allins: Showdowns whose betting ended before the river.
+        net: Dollars won at showdown minus dollars put in.
+        ev_net: net with every all-in pot shared by equity instead of by
+            the runout.
+        net_bb: net in big blinds.
+        ev_net_bb: ev_net in big blinds.
+    """
+    def __init__(self):
+        self.showdowns = 0
+        self.won = 0
+        self.allins = 0
+        self.net = 0.0
+        self.ev_net = 0.0
+        self.net_bb = 0.0
+        self.ev_net_bb = 0.0
+
+    @property
+    def luck(self) -> float:
+        """Dollars won above the all-in equity."""
+        return self.net - self.ev_net
+
+    @property
+    def luck_bb(self) -> float:
+        """Big blinds won above the all-in equity."""
+        return self.net_bb - self.ev_net_bb
+
+    def __repr__(self):
+        return ('ShowdownStats(showdowns=%d, allins=%d, net=%.2f, '
+                'ev_net=%.2f)' % (self.showdowns, self.allins, self.net,
+                                  self.ev_net))
+
+class ShowdownReport:
+    """Represents the showdowns of many hands re-evaluated.
+
+    Attributes:
+        showdowns: Number of showdowns.
+        verified: Number of showdowns whose best shown hand collected.
+        mismatches: Hand ids of the showdowns whose best shown hand, by the
+            standard poker order, collected nothing.
+        allins: Number of all-ins before the river with every hand shown.
+        players: Dict of player to ShowdownStats.
+    """
+    def __init__(self):
+        self.showdowns = 0
+        self.verified = 0
+        self.mismatches = []
+        self.allins = 0
+        self.players = {}
+
+    def __repr__(self):
+        return ('ShowdownReport(showdowns=%d, verified=%d, mismatches=%d, '
+                'allins=%d)' % (self.showdowns, self.verified,
+                                len(self.mismatches), self.allins))
+
+def side_pots(money_in: dict, players: list[str]) -> list[tuple]:
+    """Splits the dollars put in a hand into a main pot and side pots.
+
+    Each pot goes up to the next amount one of the players still in put in,
+    and holds the money of everyone, including players that folded, up to
+    that amount.
+
+    Returns a list of (dollars, indexes into players of those in it).
+    """
+    levels = sorted({money_in.get(player, 0.0) for player in players})
+    pots = []
+    previous = 0.0
+
+    for level in levels:
+        amount = sum(min(value, level) - min(value, previous)
+                     for value in money_in.values())
+        eligible = tuple(i for i, player in enumerate(players)
+                         if money_in.get(player, 0.0) >= level)
+
+        if amount > 0:
+            pots.append((amount, eligible))
+
+        previous = level
+
+    return pots
+
+def _betting_street(hand: ParsedHand) -> str:
+    """Returns the last street with betting on it."""
+    last = 'PREFLOP'
+
+    for street in STREETS:
+        if any(action.kind not in _NOT_BETTING
+               for action in hand.actions[street]):
+            last = street
+
+    return last
+
+def showdown_of(hand: ParsedHand) -> Optional[Showdown]:
+    """Finds the showdown of a hand and checks its winner with
+    standard_rank, which orders hands as the site does (unlike
+    hand_hierarchy, which ranks flushes by their high card alone).
+
+    Returns the Showdown, or None if the hand had no showdown.
+    """
+    money_in = invested(hand)
+    folded = {action.player for street in STREETS
+              for action in hand.actions[street] if action.kind == 'fold'}
+    players = [player for player in money_in if player not in folded]
+
+    if len(players) < 2 or len(hand.board) != 5:
+        return None
+
+    cards = [hand.shows.get(player) for player in players]
+    verified = None
+    allin_board = None
+
+    if all(hole is not None and len(hole) == 2 for hole in cards):
+        ranks = [standard_rank(hand.board + hole) for hole in cards]
+        best = max(ranks)
+        verified = all(players[i] in hand.collected
+                       for i, rank in enumerate(ranks) if rank == best)
+        street = _betting_street(hand)
+
+        if street != 'RIVER':
+            allin_board = hand.board[:_BOARD_SIZES[street]]
+
+    else:
+        cards = None
+
+    collected = [hand.collected.get(player, 0.0) for player in players]
+    net = [value - money_in[player]
+           for player, value in zip(players, collected)]
+
+    return Showdown(hand.hand_id, hand.stakes, players, cards, hand.board,
+                    allin_board, side_pots(money_in, players), collected,
+                    net, verified)
+
+def hand_showdowns(hands: Iterator[ParsedHand]) -> list[Showdown]:
+    """Returns the Showdowns of a stream of hands, for map_hands."""
+    return [showdown for showdown in map(showdown_of, hands)
+            if showdown is not None]
+
+@lru_cache(maxsize=4)
+def _runout_indexes(deck_size: int, needed: int) -> np.ndarray:
+    """Returns every way to pick needed cards from a deck, as an array of
+    positions in the deck. The array is kept, since the preflop one takes
+    longer to build than to score a spot with."""
+    runouts = np.fromiter(chain.from_iterable(combinations(range(deck_size),
+                                                           needed)),
+                          dtype=np.int8)
+
+    return runouts.reshape(-1, needed)
+
+def pot_shares(hands: list[list[int]], board: list[int]) -> dict:
+    """Computes the share of a pot each hand wins on average, for every
+    group of two or more of the hands that could contest a pot.
+
+    Every runout of the board is enumerated and all hands are scored with
+    evaluate_batch in the standard poker order, RUNOUT_BLOCK runouts at a
+    time.
+
+    Returns a dict of group bitmask (bit i for hand i) to the average
+    share each hand of the group wins, in hand order.
+    """
+    used = set(board).union(*hands)
+    deck = [card for card in range(52) if card not in used]
+    needed = 5 - len(board)
+    groups = [mask for mask in range(1, 1 << len(hands))
+              if bin(mask).count('1') > 1]
+    members = {mask: [i for i in range(len(hands)) if mask >> i & 1]
+               for mask in groups}
+    totals = {mask: np.zeros(len(members[mask])) for mask in groups}
+    runouts = _runout_indexes(len(deck), needed)
+    deck = np.array(deck, dtype=np.int8)
+
+    for start in range(0, len(runouts), RUNOUT_BLOCK):
+        block = deck[runouts[start:start + RUNOUT_BLOCK]]
+        cards = np.empty((len(block), len(hands), 7), dtype=np.int8)
+        cards[:, :, :len(board)] = board
+        cards[:, :, len(board):5] = block[:, None, :]
+        cards[:, :, 5:] = hands
+        ranks = evaluate_batch(cards.reshape(-1, 7),
+                               standard_tables()).reshape(len(block), -1)
+
+        for mask in groups:
+            group = ranks[:, members[mask]]
+            best = group == group.max(axis=1, keepdims=True)
+            totals[mask] += (best / best.sum(axis=1, keepdims=True)).sum(0)
+
+    return {mask: (total / len(runouts)).tolist()
+            for mask, total in totals.items()}
+
+def _spot_shares(args: tuple) -> list:
+    """Computes pot_shares as a JSON friendly list, for the workers."""
+    return [[mask, shares] for mask, shares in pot_shares(*args).items()]
+
+def batch_pot_shares(
+        spots: list[tuple],
+        workers: Optional[int] = None,
+        cache: Optional[EquityCache] = None) -> list[dict]:
+    """Computes the pot_shares of many (hands, board) spots in one call.
+
+    Spots are deduplicated through their suit canonical keys and a shared
+    cache (in memory for this call if none is given), and the remaining
+    spots are spread across the shared worker pool.
+
+    Returns the pot_shares of each spot, in order.
+    """
+    if cache is None:
+        cache = EquityCache(None)
+
+    # Shares cached under the 'pots:' keys were ranked by hand_hierarchy.
+    keys = ['standard_pots:' + canonical_spot(hands, board)
+            for hands, board in spots]
+
+    # Shares are kept here as well as in the cache, which may evict some of
+    # them before the end of a large batch.
+    found = {}
+    todo = {}
+
+    for key, spot in zip(keys, spots):
+        if key in found or key in todo:
+            continue
+
+        shares = cache.get(key)
+
+        if shares is None:
+            todo[key] = spot
+
+        else:
+            found[key] = shares
+
+    if workers == 1 or len(todo) < 2:
+        results = map(_spot_shares, todo.values())
+
+    else:
+        results = get_pool(workers).map(_spot_shares, todo.values())
+
+    for key, shares in zip(todo, results):
+        cache.put(key, shares)
+        found[key] = shares
+
+    return [{mask: shares for mask, shares in found[key]} for key in keys]
+
+def expected_net(showdown: Showdown, shares: dict) -> list[float]:
+    """Returns each player's net with every pot shared by their equity at
+    the all-in instead of by the runout. Rake is taken from each pot in
+    proportion to its size."""
+    pot_total = sum(amount for amount, _ in showdown.pots)
+    paid = sum(showdown.collected) / pot_total if pot_total else 0.0
+    expected = [0.0] * len(showdown.players)
+
+    for amount, eligible in showdown.pots:
+        if len(eligible) == 1:
+            expected[eligible[0]] += amount * paid
+            continue
+
+        group = shares[sum(1 << i for i in eligible)]
+
+        for i, share in zip(eligible, group):
+            expected[i] += amount * paid * share
+
+    return [net - collected + value for net, collected, value in
+            zip(showdown.net, showdown.collected, expected)]
+
+def analyze(
+        paths: Optional[list[Path]] = None,
+        workers: Optional[int] = None,
+        cache: Optional[EquityCache] = None) -> ShowdownReport:
+    """Re-evaluates every showdown of some hand history files.
+
+    Showdowns are found across worker processes, then the equities of all
+    the all-ins before the river are computed in one batch.
+
+    Returns the ShowdownReport.
+    """
+    showdowns = [showdown for chunk in map_hands(hand_showdowns, paths,
+                                                 workers)
+                 for showdown in chunk]
+    allins = [showdown for showdown in showdowns
+              if showdown.allin_board is not None]
+    spots = [(showdown.cards, showdown.allin_board) for showdown in allins]
+    shares = iter(batch_pot_shares(spots, workers, cache))
+    report = ShowdownReport()
+
+    for showdown in showdowns:
+        report.showdowns += 1
+
+        if showdown.verified:
+            report.verified += 1
+
+        elif showdown.verified is not None:
+            report.mismatches.append(showdown.hand_id)
+
+        allin = showdown.allin_board is not None
+        report.allins += allin
+        ev_net = (expected_net(showdown, next(shares)) if allin
+                  else showdown.net)
+
+        for player, collected, net, ev in zip(showdown.players,
+                                              showdown.collected,
+                                              showdown.net, ev_net):
+            if player not in report.players:
+                report.players[player] = ShowdownStats()
+
+            stats = report.players[player]
+            stats.showdowns += 1
+            stats.won += collected > 0
+            stats.allins += allin
+            stats.net += net
+            stats.ev_net += ev
+            stats.net_bb += net / showdown.stakes
+            stats.ev_net_bb += ev / showdown.stakes
+
+    return report
+
+def main():
+    """Main function that re-evaluates the showdowns of the hand histories
+    and prints the luckiest and unluckiest players."""
+    cache = EquityCache()
+
+    try:
+        report = analyze(cache=cache)
+
+    finally:
+        cache.close()
+
+    print(report)
+
+    if report.mismatches:
+        print('mismatched hands:', report.mismatches[:20])
+
+    players = sorted(report.players.items(), key=lambda item: item[1].luck)
+
+    for player, stats in players[:10] + players[-10:]:
+        print(player, stats, 'luck %.2f' % stats.luck)
+
+if __name__ == '__main__':
+    main()
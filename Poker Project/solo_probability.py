@@ -1,149 +1,211 @@
 from itertools import combinations
-from poker_basics import Card, Hand, hand_hierarchy
-import copy
+from math import comb
+from operator import itemgetter
+from equity_cache import EquityCache, canonical_key
+from evaluator import (card_to_int, cards_to_ints, evaluate_partial,
+                       partial_hand)
+from poker_basics import Card
+from typing import Optional
 
-def best_hand(hands: list[Hand]) -> Hand:
-    """Identifies the best hand from a list of hands.
+def wins_ties(deck: list[int], board: list[int], player: list[int]) -> tuple:
+    """Counts the heads up matchups the player wins or ties.
 
-    Returns the best hand.
-    """
-    return max(hands)
+    Every runout of the board and every opponent hand from the rest of the
+    deck is a matchup, counted by runout_wins_ties.
 
-def post_flop(deck: list, current_board: list, player: list, num_opponents: int) -> float:
-    """Returns the probabilty of the player winning or tying after the flop."""
-    turn_river = list(combinations(deck, 2))
-    player_wins_ties = 0
-    heads_up = 0
+    Returns the number of wins or ties and the number of matchups.
+    """
+    needed = 5 - len(board)
+    heads_up = comb(len(deck), needed) * comb(len(deck) - needed, 2)
 
-    for pair in turn_river:
-        edited_deck = copy.deepcopy(deck)
-        edited_deck.remove(pair[0])
-        edited_deck.remove(pair[1])
-        board = current_board + list(pair)
+    return sum(runout_wins_ties(deck, board, player).values()), heads_up
 
-        player_cards = player + board
-        player_hands_list = list(combinations(player_cards, 5))
-        player_hands = []
+def runout_wins_ties(
+        deck: list[int],
+        board: list[int],
+        player: list[int]) -> dict:
+    """Counts the heads up matchups the player wins or ties, by runout.
 
-        for hand in player_hands_list:
-            new_hand = Hand(hand[0], hand[1], hand[2], hand[3], hand[4])
-            hand_hierarchy(new_hand)
-            player_hands.append(new_hand)
+    The player is scored once per runout. An opponent's hand only depends
+    on which cards are unseen (runout plus hole cards), so each set of
+    unseen cards is scored once and compared against every way of
+    splitting it into a runout and hole cards. Each runout's count is kept
+    apart, so that later streets can be read off by filtering runouts.
 
-        best_player_hand = best_hand(player_hands)
-        opponent_cards_list = list(combinations(edited_deck, 2))
+    Returns a dict of runout (a sorted tuple of cards) to the number of
+    opponent hands from the rest of the deck the player wins or ties.
+    """
+    needed = 5 - len(board)
+    board_state = partial_hand(board)
+    player_state = partial_hand(board + player)
 
-        for opponent_cards in opponent_cards_list:
-            opponent_cards = list(opponent_cards) + board
-            opponent_hands_list = list(combinations(opponent_cards, 5))
-            opponent_hands = []
+    if needed == 0:
+        player_rank = evaluate_partial(player_state, ())
 
-            for hand in opponent_hands_list:
-                new_hand = Hand(hand[0], hand[1], hand[2], hand[3], hand[4])
-                hand_hierarchy(new_hand)
-                opponent_hands.append(new_hand)
+        return {(): sum(
+            1 for opponent_cards in combinations(deck, 2)
+            if player_rank >= evaluate_partial(board_state, opponent_cards))}
 
-            best_opponent_hand = best_hand(opponent_hands)
-            best_overall_hand = best_hand([best_player_hand, best_opponent_hand])
+    player_ranks = {}
 
-            if best_player_hand == best_overall_hand:
-                player_wins_ties += 1
-                heads_up += 1
+    for runout in combinations(deck, needed):
+        key = runout[0] if needed == 1 else runout
+        player_ranks[key] = evaluate_partial(player_state, runout)
 
-            else:
-                heads_up += 1
+    splits = [itemgetter(*split) for split in
+              combinations(range(needed + 2), needed)]
+    counts = dict.fromkeys(player_ranks, 0)
 
-    probability = ((player_wins_ties / heads_up) ** num_opponents) * 100
+    for unseen in combinations(deck, needed + 2):
+        opponent_rank = evaluate_partial(board_state, unseen)
 
-    return round(probability, 3)
+        for split in splits:
+            key = split(unseen)
 
-def post_turn(deck: list, current_board: list, player: list, num_opponents: int) -> float:
-    """Returns the probabilty of the player winning or tying after the flop."""
-    player_wins_ties = 0
-    heads_up = 0
+            if player_ranks[key] >= opponent_rank:
+                counts[key] += 1
 
-    for card in deck:
-        edited_deck = copy.deepcopy(deck)
-        edited_deck.remove(card)
-        board = current_board + [card]
+    return {(key,) if needed == 1 else key: count
+            for key, count in counts.items()}
 
-        player_cards = player + board
-        player_hands_list = list(combinations(player_cards, 5))
-        player_hands = []
+def cached_wins_ties(
+        deck: list[int],
+        board: list[int],
+        player: list[int],
+        cache: Optional[EquityCache] = None) -> tuple:
+    """Counts the heads up matchups the player wins or ties, with caching.
 
-        for hand in player_hands_list:
-            new_hand = Hand(hand[0], hand[1], hand[2], hand[3], hand[4])
-            hand_hierarchy(new_hand)
-            player_hands.append(new_hand)
+    Results are cached under 'solo:' and the suit canonical key of the
+    spot, so spots that only differ by suits share an entry. Only spots
+    whose deck is every card not in the player's hand or on the board are
+    cached.
 
-        best_player_hand = best_hand(player_hands)
-        opponent_cards_list = list(combinations(edited_deck, 2))
+    Returns the number of wins or ties and the number of matchups.
+    """
+    if cache is None or len(deck) + len(board) + len(player) != 52:
+        return wins_ties(deck, board, player)
 
-        for opponent_cards in opponent_cards_list:
-            opponent_cards = list(opponent_cards) + board
-            opponent_hands_list = list(combinations(opponent_cards, 5))
-            opponent_hands = []
+    key = 'solo:' + canonical_key(player, board)
+    counts = cache.get(key)
 
-            for hand in opponent_hands_list:
-                new_hand = Hand(hand[0], hand[1], hand[2], hand[3], hand[4])
-                hand_hierarchy(new_hand)
-                opponent_hands.append(new_hand)
+    if counts is None:
+        counts = wins_ties(deck, board, player)
+        cache.put(key, counts)
 
-            best_opponent_hand = best_hand(opponent_hands)
-            best_overall_hand = best_hand([best_player_hand, best_opponent_hand])
+    return tuple(counts)
 
-            if best_player_hand == best_overall_hand:
-                player_wins_ties += 1
-                heads_up += 1
+def post_flop(
+        deck: list,
+        current_board: list,
+        player: list,
+        num_opponents: int,
+        cache: Optional[EquityCache] = None) -> float:
+    """Returns the probabilty of the player winning or tying after the flop."""
+    player_wins_ties, heads_up = cached_wins_ties(cards_to_ints(deck),
+                                                  cards_to_ints(current_board),
+                                                  cards_to_ints(player), cache)
+    probability = ((player_wins_ties / heads_up) ** num_opponents) * 100
 
-            else:
-                heads_up += 1
+    return round(probability, 3)
 
+def post_turn(
+        deck: list,
+        current_board: list,
+        player: list,
+        num_opponents: int,
+        cache: Optional[EquityCache] = None) -> float:
+    """Returns the probabilty of the player winning or tying after the flop."""
+    player_wins_ties, heads_up = cached_wins_ties(cards_to_ints(deck),
+                                                  cards_to_ints(current_board),
+                                                  cards_to_ints(player), cache)
     probability = ((player_wins_ties / heads_up) ** num_opponents) * 100
 
     return round(probability, 3)
 
-def post_river(deck: list, board: list, player: list, num_opponents: int) -> float:
+def post_river(
+        deck: list,
+        board: list,
+        player: list,
+        num_opponents: int,
+        cache: Optional[EquityCache] = None) -> float:
     """Returns the probabilty of the player winning or tying after the flop."""
-    player_wins_ties = 0
-    heads_up = 0
+    player_wins_ties, heads_up = cached_wins_ties(cards_to_ints(deck),
+                                                  cards_to_ints(board),
+                                                  cards_to_ints(player), cache)
+    probability = ((player_wins_ties / heads_up) ** num_opponents) * 100
+
+    return round(probability, 3)
 
-    player_cards = player + board
-    player_hands_list = list(combinations(player_cards, 5))
-    player_hands = []
+class SoloSession:
+    """Represents the player's hand followed from street to street.
+
+    The matchups of every runout are counted once, the first time a street
+    is not in the cache. Dealing the turn or river keeps the runouts that
+    contain the card, so later streets only add up counts instead of
+    enumerating again. Each street's counts are cached like
+    cached_wins_ties caches them.
+
+    Attributes:
+        deck: Cards not in the player's hand or on the board, as codes.
+        board: Board cards as codes.
+        player: The player's hole cards as codes.
+        cache: EquityCache of each street's counts, or None.
+        runouts: Dict of the remaining runouts to their win or tie counts,
+            or None until they are first needed.
+    """
+    def __init__(self, deck: list[int], board: list[int], player: list[int],
+                 cache: Optional[EquityCache] = None):
+        self.deck = list(deck)
+        self.board = list(board)
+        self.player = list(player)
+        self.cache = cache
+        self.runouts = None
 
-    for hand in player_hands_list:
-        new_hand = Hand(hand[0], hand[1], hand[2], hand[3], hand[4])
-        hand_hierarchy(new_hand)
-        player_hands.append(new_hand)
+    def deal(self, card: int) -> None:
+        """Adds a card to the board, keeping the runouts that contain it."""
+        self.board.append(card)
+        self.deck.remove(card)
 
-    best_player_hand = best_hand(player_hands)
-    opponent_cards_list = list(combinations(deck, 2))
+        if self.runouts is not None:
+            self.runouts = {tuple(other for other in runout if other != card):
+                            count for runout, count in self.runouts.items()
+                            if card in runout}
 
-    for opponent_cards in opponent_cards_list:
-        opponent_cards = list(opponent_cards) + board
-        opponent_hands_list = list(combinations(opponent_cards, 5))
-        opponent_hands = []
+    def wins_ties(self) -> tuple:
+        """Returns the number of wins or ties and the number of matchups,
+        as wins_ties does for the current board."""
+        cached = (self.cache is not None and
+                  len(self.deck) + len(self.board) + len(self.player) == 52)
+        key = 'solo:' + canonical_key(self.player, self.board)
+        counts = self.cache.get(key) if cached else None
 
-        for hand in opponent_hands_list:
-            new_hand = Hand(hand[0], hand[1], hand[2], hand[3], hand[4])
-            hand_hierarchy(new_hand)
-            opponent_hands.append(new_hand)
+        if counts is not None:
+            return tuple(counts)
 
-        best_opponent_hand = best_hand(opponent_hands)
-        best_overall_hand = best_hand([best_player_hand, best_opponent_hand])
+        if self.runouts is None:
+            self.runouts = runout_wins_ties(self.deck, self.board,
+                                            self.player)
 
-        if best_player_hand == best_overall_hand:
-            player_wins_ties += 1
-            heads_up += 1
+        opponents = comb(len(self.deck) - (5 - len(self.board)), 2)
+        counts = sum(self.runouts.values()), len(self.runouts) * opponents
 
-        else:
-            heads_up += 1
+        if cached:
+            self.cache.put(key, counts)
 
-    probability = ((player_wins_ties / heads_up) ** num_opponents) * 100
+        return counts
 
-    return round(probability, 3)
+    def probability(self, num_opponents: int) -> float:
+        """Returns the probabilty of the player winning or tying."""
+        player_wins_ties, heads_up = self.wins_ties()
+        probability = ((player_wins_ties / heads_up) ** num_opponents) * 100
 
+        return round(probability, 3)
+
+def read_card(prompt: str) -> Card:
+    """Reads a card such as 'A S' from the user."""
+    card_list = input(prompt).split()
+
+    return Card(card_list[0], card_list[1])
 
 def main():
     """Main function that returns the probability of the player winning."""
@@ -164,42 +226,26 @@ def main():
     player = []
 
     for i in range (1, 3):
-        card_str = input(f'Enter card {i} dealt to you: ')
-        card_list = card_str.split()
-        card = Card(card_list[0], card_list[1])
+        card = read_card(f'Enter card {i} dealt to you: ')
         player.append(card)
         deck.remove(card)
 
     for i in range(1, 4):
-        card_str = input(f'Enter card {i} from the flop: ')
-        card_list = card_str.split()
-        card = Card(card_list[0], card_list[1])
+        card = read_card(f'Enter card {i} from the flop: ')
         board.append(card)
         deck.remove(card)
 
-    num_opponents = int(input('Enter number of opponents left in the hand: '))
-
-    print(f'{post_flop(deck, board, player, num_opponents)}%')
-
-    card_str = input(f'Enter card turn card: ')
-    card_list = card_str.split()
-    card = Card(card_list[0], card_list[1])
-    board.append(card)
-    deck.remove(card)
-
-    num_opponents = int(input('Enter number of opponents left in the hand: '))
-
-    print(f'{post_turn(deck, board, player, num_opponents)}%')
+    session = SoloSession(cards_to_ints(deck), cards_to_ints(board),
+                          cards_to_ints(player), EquityCache())
 
-    card_str = input(f'Enter card river card: ')
-    card_list = card_str.split()
-    card = Card(card_list[0], card_list[1])
-    board.append(card)
-    deck.remove(card)
+    for prompt in [None, 'Enter card turn card: ', 'Enter card river card: ']:
+        if prompt is not None:
+            session.deal(card_to_int(read_card(prompt)))
 
-    num_opponents = int(input('Enter number of opponents left in the hand: '))
+        num_opponents = int(input('Enter number of opponents left in the '
+                                  'hand: '))
 
-    print(f'{post_river(deck, board, player, num_opponents)}%')
+        print(f'{session.probability(num_opponents)}%')
 
 if __name__ == '__main__':
     main()
@@ -1,366 +1,423 @@
 from collections import defaultdict
-from itertools import combinations
-from poker_basics import Card, hand_hierarchy
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice
+from math import comb
+from equity_cache import EquityCache, canonical_spot
+from evaluator import card_to_int, cards_to_ints, evaluate
+from poker_basics import Card
 from typing import Optional
+import os
 
-class Hand:
-    """Represents a poker hand.
+# Runouts times hands to score, below which counting stays on one core.
+# A hand takes about 2 us to score and a pool task about 0.25 ms to send
+# and collect, so smaller spots (about 20 ms of work) gain little. No flop
+# or turn spot gets there: a flop is at most 990 x 3 (heads up) or
+# 465 x 10 (nine players) hands, about 7 ms, so flop and turn spots and
+# EquitySession stay serial, and preflop spots and batches use the pool.
+MIN_PARALLEL_WORK = 10000
 
-    Attributes:
-        player: Player number which the hand belongs to. Board is player 0.
-        card1: First Card object in the hand.
-        card2: Second Card object in the hand.
-        card3: Third Card object in the hand.
-        card4: Fourth Card object in the hand.
-        card5: Fifth Card object in the hand.
-        hierarchy: The hierarchy of the hand.
+# Slices of the runouts per worker. A few each keep the workers evenly
+# loaded without paying for many tasks.
+CHUNKS_PER_WORKER = 4
+
+_pool = None
+_pool_workers = None
+
+def best_hands(hands: list[tuple]) -> list[tuple]:
+    """Identifies the best hands from a list of (player, rank) pairs.
+
+    Returns every pair tied for the best rank, in their original order.
     """
-    def __init__(
-            self,
-            player: int,
-            card1: Card,
-            card2: Card,
-            card3: Card,
-            card4: Card,
-            card5: Card,
-            hierarchy: Optional[list] = None):
-        self.player = player
-        self.card1 = card1
-        self.card2 = card2
-        self.card3 = card3
-        self.card4 = card4
-        self.card5 = card5
-        self.hierarchy = hierarchy
-
-    def __eq__(self, other) -> bool:
-        """Returns True if and only if self and other are equal."""
-        return (
-            isinstance(other, Hand) and
-            self.hierarchy == other.hierarchy
-        )
-
-    def __lt__(self, other) -> bool:
-        """Returns True if and only if self < other."""
-        if (isinstance(other, Hand) and
-                (self.hierarchy[1] < other.hierarchy[1] or
-                 (self.hierarchy[1] == other.hierarchy[1] and
-                  self.hierarchy[2] < other.hierarchy[2]))):
-            return True
+    best = max(rank for _, rank in hands)
 
-        else:
-            return False
+    return [hand for hand in hands if hand[1] == best]
+
+def count_winners(board: list[int], player_codes: dict, runouts) -> dict:
+    """Counts how often each player wins over the given runouts.
+
+    The board alone is scored as player 0, so a split pot including 0
+    means everyone plays the board.
+
+    Returns a dict of player number to wins, with split pots keyed by the
+    tuple of the tied player numbers.
+    """
+    player_count = defaultdict(int)
+
+    for runout in runouts:
+        runout_board = board + list(runout)
+        hands = [(0, evaluate(runout_board))]
+
+        for key in player_codes:
+            hands.append((key, evaluate(runout_board + player_codes[key])))
+
+        _count_best(player_count, hands)
+
+    return dict(player_count)
+
+def _count_best(player_count: dict, hands: list[tuple]) -> None:
+    """Counts the winner, or the tuple of tied players, of one runout."""
+    best = best_hands(hands)
+
+    if len(best) > 1:
+        player_count[tuple(player for player, _ in best)] += 1
+
+    else:
+        player_count[best[0][0]] += 1
+
+def _count_shard(args: tuple) -> dict:
+    """Counts the winners of a contiguous slice of the runouts."""
+    deck, board, player_codes, needed, start, stop = args
+    runouts = islice(combinations(deck, needed), start, stop)
+
+    return count_winners(board, player_codes, runouts)
+
+def get_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Returns the shared worker pool, starting it on first use.
+
+    The pool is kept for later calls so its start up cost is paid once, and
+    is only restarted if a different number of workers is asked for.
+    """
+    global _pool, _pool_workers
+
+    if _pool is None or workers != _pool_workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(workers)
+        _pool_workers = workers
+
+    return _pool
+
+def shutdown_pool() -> None:
+    """Stops the shared worker pool if it is running."""
+    global _pool
+
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+def parallel_count_winners(
+        deck: list[int],
+        board: list[int],
+        player_codes: dict,
+        workers: Optional[int] = None,
+        min_work: int = MIN_PARALLEL_WORK) -> dict:
+    """Counts how often each player wins over every runout of the board.
+
+    The runouts are split into CHUNKS_PER_WORKER slices of equal size per
+    worker and counted across the shared worker pool, and the slice counts
+    are merged in runout order, so the result (including key order) is the
+    same as counting serially. Spots with less than min_work hands to
+    score, or workers=1, stay serial.
+
+    Returns a dict like count_winners.
+    """
+    needed = 5 - len(board)
+    runouts = comb(len(deck), needed)
+    work = runouts * (len(player_codes) + 1)
+
+    if workers == 1 or work < min_work:
+        return count_winners(board, player_codes,
+                             combinations(deck, needed))
+
+    chunks = min(runouts, (workers or os.cpu_count() or 1) *
+                 CHUNKS_PER_WORKER)
+    bounds = [runouts * i // chunks for i in range(chunks + 1)]
+    shards = [(deck, board, player_codes, needed, start, stop)
+              for start, stop in zip(bounds, bounds[1:])]
+    player_count = {}
+
+    for shard_count in get_pool(workers).map(_count_shard, shards):
+        for key, count in shard_count.items():
+            player_count[key] = player_count.get(key, 0) + count
+
+    return player_count
+
+class Equities:
+    """Represents each live player's chances of winning a spot.
+
+    Attributes:
+        win: Percent of runouts each player wins alone, by player number.
+        split: Percent of runouts each split pot happens, by the tuple of
+            the tied player numbers. A tuple starting with 0 means everyone
+            plays the board.
+        equity: Percent of the pot each player wins, by player number.
+        runouts: Number of runouts of the board.
+    """
+    def __init__(self, win: dict, split: dict, equity: dict, runouts: int):
+        self.win = win
+        self.split = split
+        self.equity = equity
+        self.runouts = runouts
 
     def __repr__(self):
-        return '%r %r %r %r %r' % (self.card1, self.card2, self.card3,
-                                   self.card4, self.card5)
+        return 'Equities(win=%r, split=%r)' % (self.win, self.split)
 
-def card_nums_sort(hand: Hand) -> list:
-    """Coverts a hand to a list of card values in sorted numeric form.
+def _spot(
+        player_cards: dict,
+        board: list[int],
+        live: Optional[list[int]] = None) -> tuple:
+    """Splits a spot into its live hands, dead cards and deck.
 
-    Returns a list of the card values from the hand in sorted numeric form.
+    Returns the live player numbers, their hands, the dead cards (hands of
+    folded players) and the deck.
     """
-    card_vals = [hand.card1.val, hand.card2.val, hand.card3.val,
-                 hand.card4.val, hand.card5.val]
-    card_nums = []
+    if live is None:
+        live = list(player_cards)
 
-    for card_val in card_vals:
-        if card_val == '10':
-            card_nums.append(10)
+    hands = [player_cards[player] for player in live]
+    dead = [card for player in player_cards if player not in live
+            for card in player_cards[player]]
+    used = set(board).union(dead, *hands)
+    deck = [card for card in range(52) if card not in used]
 
-        elif ord(card_val) >= 65:
-            if card_val == 'J':
-                card_nums.append(11)
+    return live, hands, dead, deck
 
-            elif card_val == 'Q':
-                card_nums.append(12)
+def _to_equities(live: list[int], counts: dict) -> Equities:
+    """Converts winner counts keyed by hand position to Equities."""
+    runouts = sum(counts.values())
+    win = {player: 0.0 for player in live}
+    split = {}
+    equity = {player: 0.0 for player in live}
 
-            elif card_val == 'K':
-                card_nums.append(13)
+    for key, count in counts.items():
+        percent = count / runouts * 100
 
-            elif card_val == 'A':
-                card_nums.append(14)
+        if isinstance(key, int):
+            win[live[key - 1]] = percent
+            equity[live[key - 1]] += percent
 
         else:
-            card_nums.append(int(card_val))
+            players = tuple(live[i - 1] if i else 0 for i in key)
+            split[players] = percent
+
+            for player in players:
+                if player:
+                    equity[player] += percent / (len(key) - (key[0] == 0))
 
-    card_nums.sort()
+    return Equities(win, split, equity, runouts)
 
-    return card_nums
+def equities(
+        player_cards: dict,
+        board: list[int],
+        live: Optional[list[int]] = None,
+        workers: Optional[int] = None,
+        cache: Optional[EquityCache] = None) -> Equities:
+    """Computes each live player's chances of winning a spot.
 
-def best_hands(hands: list[Hand]) -> list[Hand]:
-    """Identifies the best hand from a list of hands.
+    player_cards maps every player number to their hole cards as integer
+    codes, including players that folded (their cards are dead). live is
+    the players still in the hand, all of them by default. Every runout of
+    the board is enumerated, in parallel for big spots.
 
-    Returns the best hand.
+    Returns the spot's Equities.
     """
-    best = max(hands)
-    best_hands = []
+    live, hands, dead, deck = _spot(player_cards, board, live)
+    key = 'total:' + canonical_spot(hands, board, dead)
+    counts = None if cache is None else cache.get(key)
 
-    indices = [i for i, value in enumerate(hands) if value == best]
-    for i in indices:
-        best_hands.append(hands[i])
+    if counts is None:
+        codes = {i: hand for i, hand in enumerate(hands, 1)}
+        counts = parallel_count_winners(deck, board, codes, workers)
 
-    return best_hands
+        if cache is not None:
+            cache.put(key, _counts_to_json(counts))
 
-def main():
-    """Main function that returns the winning probabilitis for each player."""
-    deck = [Card('2', 'S'), Card('2', 'D'), Card('2', 'C'), Card('2', 'H'),
-            Card('3', 'S'), Card('3', 'D'), Card('3', 'C'), Card('3', 'H'),
-            Card('4', 'S'), Card('4', 'D'), Card('4', 'C'), Card('4', 'H'),
-            Card('5', 'S'), Card('5', 'D'), Card('5', 'C'), Card('5', 'H'),
-            Card('6', 'S'), Card('6', 'D'), Card('6', 'C'), Card('6', 'H'), 
-            Card('7', 'S'), Card('7', 'D'), Card('7', 'C'), Card('7', 'H'),
-            Card('8', 'S'), Card('8', 'D'), Card('8', 'C'), Card('8', 'H'),
-            Card('9', 'S'), Card('9', 'D'), Card('9', 'C'), Card('9', 'H'),
-            Card('10', 'S'), Card('10', 'D'), Card('10', 'C'), Card('10', 'H'),
-            Card('J', 'S'), Card('J', 'D'), Card('J', 'C'), Card('J', 'H'),
-            Card('Q', 'S'), Card('Q', 'D'), Card('Q', 'C'), Card('Q', 'H'),
-            Card('K', 'S'), Card('K', 'D'), Card('K', 'C'), Card('K', 'H'),
-            Card('A', 'S'), Card('A', 'D'), Card('A', 'C'), Card('A', 'H')]
-    player_cards = defaultdict(list)
-    board = []
+    else:
+        counts = _counts_from_json(counts)
 
-    num_players = int(input('Enter number of players (9 max): '))
+    return _to_equities(live, counts)
 
-    for i in range(1, num_players + 1):
-        card1_str = input(f'Enter card 1 for player {i}: ')
-        card2_str = input(f'Enter card 2 for player {i}: ')
-        card1_list = card1_str.split()
-        card1 = Card(card1_list[0], card1_list[1])
-        card2_list = card2_str.split()
-        card2 = Card(card2_list[0], card2_list[1])
-        player_cards[i] = [card1, card2]
-        deck.remove(card1)
-        deck.remove(card2)
+def _counts_to_json(counts: dict) -> list:
+    """Converts winner counts to a JSON friendly list of pairs."""
+    return [[key, count] for key, count in counts.items()]
 
-    for i in range(1, 4):
-        card_str = input(f'Enter card {i} from the flop: ')
-        card_list = card_str.split()
-        card = Card(card_list[0], card_list[1])
-        board.append(card)
-        deck.remove(card)
+def _counts_from_json(pairs: list) -> dict:
+    """Converts a list made by _counts_to_json back to winner counts."""
+    return {key if isinstance(key, int) else tuple(key): count
+            for key, count in pairs}
 
-    players_str = input('Enter each player left in the game: ')
-    players_list = players_str.split()
-    players_list = [int(i) for i in players_list]
-    folds = []
+def _spot_counts(args: tuple) -> dict:
+    """Counts the winners of one spot serially, for the batch workers."""
+    board, hands, deck = args
+    codes = {i: hand for i, hand in enumerate(hands, 1)}
 
-    for i in range(1, num_players + 1):
-        if i not in players_list and i not in folds:
-            player_cards.pop(i)
-            folds.append(i)
+    return count_winners(board, codes, combinations(deck, 5 - len(board)))
 
-    total_count = 0
-    player_count = defaultdict(int)
-    player_percent = defaultdict(float)
-    turn_river = list(combinations(deck, 2))
-    for key in players_list:
-        player_count[key] = 0
-
-    for cards in turn_river:
-        hands = []
-        board_hand = Hand(0, board[0], board[1], board[2], cards[0], cards[1])
-        hand_hierarchy(board_hand)
-        hands.append(board_hand)
-
-        for key in player_cards:
-            all_cards = [board[0], board[1], board[2], cards[0], cards[1],
-                         player_cards[key][0], player_cards[key][1]]
-            player_hands_list = list(combinations(all_cards, 5))
-            player_hands = []
-
-            for card_list in player_hands_list:
-                if card_list != [board[0], board[1], board[2], cards[0],
-                                 cards[1]]:
-                    hand = Hand(key, card_list[0], card_list[1], card_list[2],
-                                card_list[3], card_list[4])
-                    hand_hierarchy(hand)
-                    player_hands.append(hand)
-
-            best = best_hands(player_hands)
-            hands.append(best[0])
-
-        best = best_hands(hands)
-        total_count += 1
-
-        str_key = ''
-        if len(best) > 1:
-            for i in range(len(best)):
-                str_key += str(best[i].player)
-            player_count[str_key] += 1
+def batch_equities(
+        spots: list[tuple],
+        workers: Optional[int] = None,
+        cache: Optional[EquityCache] = None) -> list[Equities]:
+    """Computes the Equities of many spots in one call.
 
-        else:
-            player_count[best[0].player] += 1
+    Each spot is a (player_cards, board, live) tuple as taken by equities.
+    Spots are deduplicated through their suit canonical keys and a shared
+    cache (in memory for this call if none is given), and the remaining
+    spots are spread whole across the shared worker pool.
 
-    for key in player_count:
-        player_percent[key] = (player_count[key] / total_count) * 100
-        if isinstance(key, str):
-            lst = [*key]
+    Returns the Equities of each spot, in order.
+    """
+    if cache is None:
+        cache = EquityCache(None)
 
-            if lst[0] == '0':
-                print(f'Split Pot Between Everyone: {round(player_percent[key], 3)}%')
+    parsed = [_spot(*spot) for spot in spots]
+    keys = ['total:' + canonical_spot(hands, spot[1], dead)
+            for (live, hands, dead, deck), spot in zip(parsed, spots)]
+    # Counts are kept here as well as in the cache, which may evict some of
+    # them before the end of a large batch.
+    found = {}
+    todo = {}
 
-            elif len(lst) == 2:
-                print(f'Split Pot between Players {lst[0]} & {lst[1]}: {round(player_percent[key], 3)}%')
+    for key, (live, hands, dead, deck), spot in zip(keys, parsed, spots):
+        if key in found or key in todo:
+            continue
 
-            elif len(lst) == 3:
-                print(f'Split Pot between Players {lst[0]}, {lst[1]}, & {lst[2]}: {round(player_percent[key], 3)}%')
+        counts = cache.get(key)
 
-            elif len(lst) == 4:
-                print(f'Split Pot between Players {lst[0]}, {lst[1]}, {lst[2]}, & {lst[3]}: {round(player_percent[key], 3)}%')
+        if counts is None:
+            todo[key] = (spot[1], hands, deck)
 
         else:
-            print(f'Player {key}: {round(player_percent[key], 3)}%')
+            found[key] = _counts_from_json(counts)
 
-    turn_str = input('Enter turn card: ')
-    turn_list = turn_str.split()
-    turn = Card(turn_list[0], turn_list[1])
-    board.append(turn)
-    deck.remove(turn)
+    jobs = list(todo.values())
+    work = sum(comb(len(deck), 5 - len(board)) * (len(hands) + 1)
+               for board, hands, deck in jobs)
 
-    players_str = input('Enter each player left in the game: ')
-    players_list = players_str.split()
-    players_list = [int(i) for i in players_list]
+    if workers == 1 or work < MIN_PARALLEL_WORK:
+        results = map(_spot_counts, jobs)
 
-    for i in range(1, num_players + 1):
-        if i not in players_list and i not in folds:
-            player_cards.pop(i)
-            folds.append(i)
+    else:
+        results = get_pool(workers).map(_spot_counts, jobs, chunksize=16)
 
-    total_count = 0
-    player_count = defaultdict(int)
-    player_percent = defaultdict(float)
-    for key in players_list:
-        player_count[key] = 0
-
-    for card in deck:
-        hands = []
-        board_hand = Hand(0, board[0], board[1], board[2], board[3], card)
-        hand_hierarchy(board_hand)
-        hands.append(board_hand)
-
-        for key in player_cards:
-            all_cards = [board[0], board[1], board[2], board[3], card,
-                         player_cards[key][0], player_cards[key][1]]
-            player_hands_list = list(combinations(all_cards, 5))
-            player_hands = []
-
-            for card_list in player_hands_list:
-                if card_list != [board[0], board[1], board[2], board[3],
-                                 card]:
-                    hand = Hand(key, card_list[0], card_list[1], card_list[2],
-                                card_list[3], card_list[4])
-                    hand_hierarchy(hand)
-                    player_hands.append(hand)
-
-            best = best_hands(player_hands)
-            hands.append(best[0])
-
-        best = best_hands(hands)
-        total_count += 1
-
-        str_key = ''
-        if len(best) > 1:
-            for i in range(len(best)):
-                str_key += str(best[i].player)
-            player_count[str_key] += 1
+    for key, counts in zip(todo, results):
+        cache.put(key, _counts_to_json(counts))
+        found[key] = counts
 
-        else:
-            player_count[best[0].player] += 1
+    return [_to_equities(live, found[key])
+            for key, (live, *_) in zip(keys, parsed)]
 
-    for key in player_count:
-        player_percent[key] = (player_count[key] / total_count) * 100
-        if isinstance(key, str):
-            lst = [*key]
+class EquitySession:
+    """Represents a hand followed street by street from the flop.
 
-            if lst[0] == '0':
-                print(f'Split Pot Between Everyone: {round(player_percent[key], 3)}%')
+    Every runout is scored for the board and each player once, when the
+    session starts. Dealing the turn or river keeps the runouts that
+    contain the card and a fold removes the player from live, so the
+    Equities of later streets and folds are counted from the stored ranks
+    without scoring any hands.
 
-            elif len(lst) == 2:
-                print(f'Split Pot between Players {lst[0]} & {lst[1]}: {round(player_percent[key], 3)}%')
+    Attributes:
+        player_cards: Dict of player number to hole cards as codes.
+        board: Board cards as codes.
+        live: Player numbers still in the hand.
+        runouts: List of (runout, ranks) pairs, where ranks has the board's
+            rank first and then each player's, in player_cards order.
+    """
+    def __init__(
+            self,
+            player_cards: dict,
+            board: list[int],
+            live: Optional[list[int]] = None):
+        self.player_cards = player_cards
+        self.board = list(board)
+        self.live = list(player_cards) if live is None else list(live)
+        used = set(board).union(*player_cards.values())
+        deck = [card for card in range(52) if card not in used]
+        hands = list(player_cards.values())
+        self.runouts = []
+
+        for runout in combinations(deck, 5 - len(board)):
+            runout_board = self.board + list(runout)
+            ranks = [evaluate(runout_board)]
+            ranks += [evaluate(runout_board + hand) for hand in hands]
+            self.runouts.append((runout, ranks))
+
+    def deal(self, card: int) -> None:
+        """Adds a card to the board, keeping the runouts that contain it."""
+        self.board.append(card)
+        self.runouts = [(tuple(other for other in runout if other != card),
+                         ranks) for runout, ranks in self.runouts
+                        if card in runout]
+
+    def fold(self, player: int) -> None:
+        """Removes a player from the hand, their cards staying dead."""
+        self.live.remove(player)
+
+    def equities(self) -> Equities:
+        """Returns the Equities of the live players on the current board,
+        the same as equities gives."""
+        positions = list(self.player_cards)
+        columns = [positions.index(player) + 1 for player in self.live]
+        player_count = defaultdict(int)
+
+        for _, ranks in self.runouts:
+            hands = [(0, ranks[0])]
+            hands += [(i, ranks[column])
+                      for i, column in enumerate(columns, 1)]
+            _count_best(player_count, hands)
+
+        return _to_equities(self.live, dict(player_count))
+
+def print_equities(equities: Equities) -> None:
+    """Prints each player's and split pot's chance of winning."""
+    for key, percent in (list(equities.win.items()) +
+                         list(equities.split.items())):
+        if equities.runouts == 1:
+            text = f'{int(percent)}%'
+
+        else:
+            text = f'{round(percent, 3)}%'
 
-            elif len(lst) == 3:
-                print(f'Split Pot between Players {lst[0]}, {lst[1]}, & {lst[2]}: {round(player_percent[key], 3)}%')
+        if isinstance(key, int):
+            print(f'Player {key}: {text}')
 
-            elif len(lst) == 4:
-                print(f'Split Pot between Players {lst[0]}, {lst[1]}, {lst[2]}, & {lst[3]}: {round(player_percent[key], 3)}%')
+        elif key[0] == 0:
+            print(f'Split Pot Between Everyone: {text}')
 
         else:
-            print(f'Player {key}: {round(player_percent[key], 3)}%')
+            players = [str(player) for player in key]
 
-    river_str = input('Enter river card: ')
-    river_list = river_str.split()
-    river = Card(river_list[0], river_list[1])
-    board.append(river)
-    deck.remove(river)
+            if len(players) == 2:
+                names = f'{players[0]} & {players[1]}'
 
-    players_str = input('Enter each player left in the game: ')
-    players_list = players_str.split()
-    players_list = [int(i) for i in players_list]
+            else:
+                names = ', '.join(players[:-1]) + f', & {players[-1]}'
 
-    for i in range(1, num_players + 1):
-        if i not in players_list and i not in folds:
-            player_cards.pop(i)
-            folds.append(i)
-
-    hands = []
-    player_win = defaultdict(bool)
-    for key in players_list:
-        player_win[key] = False
-
-    board_hand = Hand(0, board[0], board[1], board[2], board[3], board[4])
-    hand_hierarchy(board_hand)
-    hands.append(board_hand)
-
-    for key in player_cards:
-        all_cards = [board[0], board[1], board[2], board[3], board[4],
-                     player_cards[key][0], player_cards[key][1]]
-        player_hands_list = list(combinations(all_cards, 5))
-        player_hands = []
-
-        for card_list in player_hands_list:
-            if card_list != [board[0], board[1], board[2], board[3],
-                             board[4]]:
-                hand = Hand(key, card_list[0], card_list[1], card_list[2],
-                            card_list[3], card_list[4])
-                hand_hierarchy(hand)
-                player_hands.append(hand)
-
-        best = best_hands(player_hands)
-        hands.append(best[0])
+            print(f'Split Pot between Players {names}: {text}')
 
-    best = best_hands(hands)
+def read_card(prompt: str) -> Card:
+    """Reads a card such as 'A S' from the user."""
+    card_list = input(prompt).split()
 
-    str_key = ''
-    if len(best) > 1:
-        for i in range(len(best)):
-            str_key += str(best[i].player)
-        player_win[str_key] = True
+    return Card(card_list[0], card_list[1])
 
-    else:
-        player_win[best[0].player] = True
+def main():
+    """Main function that returns the winning probabilitis for each player."""
+    player_cards = {}
+    board = []
+
+    num_players = int(input('Enter number of players (9 max): '))
 
-    for key in player_win:
-        if isinstance(key, str):
-            lst = [*key]
+    for i in range(1, num_players + 1):
+        card1 = read_card(f'Enter card 1 for player {i}: ')
+        card2 = read_card(f'Enter card 2 for player {i}: ')
+        player_cards[i] = cards_to_ints([card1, card2])
 
-            if lst[0] == '0':
-                print(f'Split Pot Between Everyone: {round(player_percent[key], 3)}%')
+    for i in range(1, 4):
+        board.append(card_to_int(read_card(f'Enter card {i} from the flop: ')))
 
-            elif len(lst) == 2:
-                print(f'Split Pot between Players {lst[0]} & {lst[1]}: 100%')
+    session = EquitySession(player_cards, board)
 
-            elif len(lst) == 3:
-                print(f'Split Pot between Players {lst[0]}, {lst[1]}, & {lst[2]}: 100%')
+    for prompt in [None, 'Enter turn card: ', 'Enter river card: ']:
+        if prompt is not None:
+            session.deal(card_to_int(read_card(prompt)))
 
-            elif len(lst) == 4:
-                print(f'Split Pot between Players {lst[0]}, {lst[1]}, {lst[2]}, & {lst[3]}: 100%')
+        players_str = input('Enter each player left in the game: ')
+        live = [int(i) for i in players_str.split()]
 
-        else:
-            if player_win[key] == False:
-                print(f'Player {key}: 0%')
+        for player in list(session.live):
+            if player not in live:
+                session.fold(player)
 
-            elif player_win[key] == True:
-                print(f'Player {key}: 100%')
+        print_equities(session.equities())
 
 if __name__ == '__main__':
     main()